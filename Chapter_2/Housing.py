@@ -1,15 +1,13 @@
 import os
-import tarfile
-from six.moves import urllib
+import sys
+import tempfile
 import pandas as pd
 from pandas.plotting import scatter_matrix
 import matplotlib.pyplot as plt
 import numpy as np
-from zlib import crc32 #For compressing data...
-from sklearn.model_selection import train_test_split, StratifiedShuffleSplit, cross_val_score, GridSearchCV
+from sklearn.model_selection import train_test_split, StratifiedShuffleSplit, cross_val_score
 from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import OrdinalEncoder, OneHotEncoder, StandardScaler
-from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.linear_model import LinearRegression
@@ -17,6 +15,14 @@ from sklearn.metrics import mean_squared_error
 from sklearn.tree import DecisionTreeRegressor
 from sklearn.ensemble import RandomForestRegressor
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #Repository root, for ml_practice
+from ml_practice import profiling
+#The loaders and the train/test split helpers (split_train_test, test_set_check) live in ml_practice/housing.py and
+#the custom transformer that adds the combined attributes (CombinedAttributesAdder) in ml_practice/transformers.py,
+#so they can be imported without running this script
+from ml_practice.housing import fetch_housing_data, load_housing_data, make_full_pipeline, HOUSING_PATH
+from ml_practice.transformers import CombinedAttributesAdder
+
 ####################################################################################################
 #This block of code is because Scikit-Learn 0.20 replaced sklearn.preprocessing.Imputer class with
 #sklearn.impute.SimpleImputer class
@@ -27,56 +33,14 @@ from sklearn.ensemble import RandomForestRegressor
 #     from sklearn.preprocessing import Imputer as SimpleImputer
 ####################################################################################################
 
-DOWNLOAD_ROOT = "https://raw.githubusercontent.com/ageron/handson-ml/master/"
-HOUSING_PATH = os.path.join("datasets", "housing")
-HOUSING_URL = DOWNLOAD_ROOT + "datasets/housing/housing.tgz"
-
-#Custom transformer to add attributes
-class CombinedAttributesAdder(BaseEstimator, TransformerMixin):
-    def __init__(self, add_bedrooms_per_room = True): #No *args or **kargs
-        self.add_bedrooms_per_room = add_bedrooms_per_room
-    def fit(self, X, y=None):
-        return self #Nothing else to do
-    def transform(self, X, y=None):
-        room_per_household = X[:, rooms_ix] / X[:, households_ix]
-        population_per_household = X[:, population_ix] / X[:, households_ix]
-        if self.add_bedrooms_per_room:
-            bedrooms_per_room = X[:, bedrooms_ix] / X[:, rooms_ix]
-            return np.c_[X, room_per_household, population_per_household, bedrooms_per_room]
-        else:
-            return np.c_[X, room_per_household, population_per_household]
-
-#This transformer has one hyperparamter, "add_bedrooms_per_room", set to True by default and can easily allow for the
-#determination of whether adding this attribute helps the Machine Learning algorithm (gate the data by adding
+#CombinedAttributesAdder has one hyperparamter, "add_bedrooms_per_room", set to True by default and can easily allow
+#for the determination of whether adding this attribute helps the Machine Learning algorithm (gate the data by adding
 #a hyperparamter you are not %100 sure about
 
-def fetch_housing_data(housing_url=HOUSING_URL, housing_path=HOUSING_PATH):
-
-    if not os.path.isdir(housing_path):
-        os.makedirs(housing_path)
-    tgz_path = os.path.join(housing_path, "housing.tgz")
-    urllib.request.urlretrieve(housing_url, tgz_path)
-    housing_tgz = tarfile.open(tgz_path)
-    housing_tgz.extractall(path=housing_path)
-    housing_tgz.close()
-
-def load_housing_data(housing_path=HOUSING_PATH):
-    csv_path = os.path.join(housing_path, "housing.csv")
-    return pd.read_csv(csv_path)
-
-# This is not the best method to generate test data...
-def split_train_test(data, test_ratio):
-    shuffled_indices = np.random.permutation(len(data)) #Randomly shuffles data around
-    test_set_size = int(len(data) * test_ratio)
-    test_indices = shuffled_indices[:test_set_size]
-    train_indices = shuffled_indices[test_set_size:]
-    return data.iloc[train_indices], data.iloc[test_indices]
-
-def test_set_check(identifier, test_ratio):
-    return crc32(np.int64(identifier)) & 0xffffffff < test_ratio * 2**32
-
 if __name__ == "__main__":
 
+    #Every stage below runs inside a profiling span: run with ML_PROFILE=housing_trace.json to see where the time goes
+    #(see ml_practice/profiling.py)
     fetch_housing_data()
 
     #"housing" is a Pandas data frame
@@ -118,6 +82,26 @@ if __name__ == "__main__":
 
     print(compare_props)
 
+    #The same split in one pass over the file, for data that doesn't fit in memory (ml_practice/sampling.py): only
+    #median_income is read, chunk by chunk, and the sets come out as row numbers instead of copied DataFrames
+    from ml_practice.sampling import StreamingStratifiedSplit
+
+    splitter = StreamingStratifiedSplit(test_size=0.2, random_state=42)
+    for chunk in pd.read_csv(os.path.join(HOUSING_PATH, "housing.csv"), usecols=["median_income"], chunksize=5000):
+        splitter.update(chunk)
+    stream_train_index, stream_test_index = splitter.split()
+    print(splitter.compare_props())
+    #The row numbers select the sets from housing like the StratifiedShuffleSplit indices above, with (up to rounding)
+    #the same income_cat proportions as strat_test_set
+    stream_test_set = housing.iloc[stream_test_index]
+    stream_props = pd.DataFrame({
+        "Stratified": strat_test_set["income_cat"].value_counts()/len(strat_test_set),
+        "Streaming": stream_test_set["income_cat"].value_counts()/len(stream_test_set),
+    }).sort_index()
+    print(stream_props)
+    assert (stream_props["Streaming"] - stream_props["Stratified"]).abs().max() < 1e-3
+    assert len(stream_train_index) + len(stream_test_index) == len(housing)
+
     for set_ in(strat_train_set, strat_test_set): #Removing the "Income Category (income_cat) Attribute...
         set_.drop("income_cat", axis=1, inplace=True)
 
@@ -133,7 +117,12 @@ if __name__ == "__main__":
     #plt.show()
 
     #Look at how each Attribute Correlates with Median House Value (Median House Value is the "Target" Attribute)
-    corr_matrix = housing.corr()
+    #CorrelationMatrix (ml_practice/correlation.py) gives the same numbers as housing.corr() on the numerical columns,
+    #and keeps the sums it needs so that combined attributes can be added later without recomputing everything
+    from ml_practice.correlation import CorrelationMatrix
+
+    correlations = CorrelationMatrix().update(housing)
+    corr_matrix = correlations.corr()
     print(corr_matrix["median_house_value"].sort_values(ascending=False))
 
     attributes = ["median_house_value", "median_income", "total_rooms", "housing_median_age"]
@@ -155,7 +144,8 @@ if __name__ == "__main__":
     # print(housing.describe())
 
     #Look at Correlation Matrix Again with Median House Value as the Target Value
-    corr_matrix = housing.corr()
+    correlations.add_columns(housing, ["rooms_per_household", "bedrooms_per_room", "population_per_household"])
+    corr_matrix = correlations.corr() #<-- Only the correlations involving the three new attributes were computed
     corr_matrix["median_house_value"].sort_values(ascending=False)
 
     #The Result: "bedrooms_per_room" is more correlated than "total_room" or "total_bedrooms" with Median Housing Value
@@ -310,11 +300,14 @@ if __name__ == "__main__":
     #2.) Categorical columns should be transformed using a OneHotEncoder
     #Apply this ColumnTransformer to the housing data --> applies each transformer to the appropriate columns and
     #concatenates the outputs along the second axis
-    housing_prepared = full_pipeline.fit_transform(housing)
+    with profiling.span("full_pipeline.fit_transform", stage="preprocess") as s:
+        housing_prepared = full_pipeline.fit_transform(housing)
+        s.record_array("housing_prepared", housing_prepared)
 
     #Train a Machine Learning model using linear regression
     lin_reg = LinearRegression()
-    lin_reg.fit(housing_prepared, housing_labels)
+    with profiling.span("lin_reg.fit", stage="fit"):
+        lin_reg.fit(housing_prepared, housing_labels)
 
     #Try linear regression model out on a few instances from teh training set!
     some_data = housing.iloc[:5]
@@ -324,6 +317,23 @@ if __name__ == "__main__":
     print('\n')
     print("Labels: ", list(some_labels))
 
+    #For scoring single districts, the fitted full_pipeline can be compiled into a TransformPlan (ml_practice/
+    #transform_plan.py): the same imputing, ratios, scaling and one-hot lookups on a dict or a plain row, without pandas
+    #or the transformers in between --> microseconds instead of milliseconds per district, same output
+    from ml_practice.transform_plan import compile_full_pipeline, check_plan
+
+    plan = compile_full_pipeline(full_pipeline)
+    check_plan(plan, full_pipeline, some_data)
+    print(lin_reg.predict(plan.transform_record(some_data.iloc[0].to_dict()).reshape(1, -1)))
+
+    #The one-hot columns only encode which category each district has, so the plan can also return the prepared data
+    #as a BlockMatrix (ml_practice/block_matrix.py): the dense numerical block plus one integer code per categorical
+    #attribute. A linear model's predictions are then a dense matrix-vector product plus a lookup of the coefficient
+    #of each district's category, and tree models can take ocean_proximity as one integer feature (blocks.ordinal())
+    housing_blocks = plan.transform_blocks(housing)
+    print(housing_blocks)
+    print(np.allclose(housing_blocks.dot(lin_reg.coef_) + lin_reg.intercept_, lin_reg.predict(housing_prepared)))
+
     #Measure the regression model's RMSE on the whole training set using Scikit-Learn's "mean_squared_error" function
     housing_predictions = lin_reg.predict(housing_prepared)
     lin_mse = mean_squared_error(housing_labels, housing_predictions)
@@ -337,7 +347,8 @@ if __name__ == "__main__":
     #Try to train with a DecisionTreeRegressor --> This is a powerful model that is capable of finding nonlinear
     #relationships in the data (Decision Trees will be presented in more detail in Chapter 4)
     tree_reg = DecisionTreeRegressor()
-    tree_reg.fit(housing_prepared, housing_labels) #<-- Training the model
+    with profiling.span("tree_reg.fit", stage="fit"):
+        tree_reg.fit(housing_prepared, housing_labels) #<-- Training the model
 
     housing_predictions = tree_reg.predict(housing_prepared) #<-- Test the trained model using the training set
     tree_mse = mean_squared_error(housing_labels, housing_predictions)
@@ -356,8 +367,9 @@ if __name__ == "__main__":
     #K-fold cross validation: Randomly splits the training set into 10 distinct subsets (folds), then it trains and
     #evaluates the Decision Tree model 10 times, picking a different fold (subset) every evaluation time and
     #training on the other 9 folds (subsets). This results in an array containing the 10 evaluation scores
-    scores = cross_val_score(tree_reg, housing_prepared, housing_labels, scoring="neg_mean_squared_error",
-                             cv=10)
+    with profiling.span("cross_val_score", stage="evaluate", model="DecisionTreeRegressor", cv=10):
+        scores = cross_val_score(tree_reg, housing_prepared, housing_labels, scoring="neg_mean_squared_error",
+                                 cv=10)
     tree_rmse_scores = np.sqrt(-scores) #<-- Cross-validation expects a utility function instead of a cost function,
     #so the scoring function os actually the OPPOSITE of the MSE (negative value)
     print(tree_rmse_scores)
@@ -366,8 +378,9 @@ if __name__ == "__main__":
     print("Standard Deviation: ", tree_rmse_scores.std())
 
     #Compute the same scores for the Linear Regression model
-    lin_scores = cross_val_score(lin_reg, housing_prepared, housing_labels, scoring="neg_mean_squared_error",
-                                 cv=10)
+    with profiling.span("cross_val_score", stage="evaluate", model="LinearRegression", cv=10):
+        lin_scores = cross_val_score(lin_reg, housing_prepared, housing_labels, scoring="neg_mean_squared_error",
+                                     cv=10)
     lin_rmse_scores = np.sqrt(-lin_scores)
     print(lin_rmse_scores)
     print("Scores: ", lin_rmse_scores)
@@ -391,15 +404,18 @@ if __name__ == "__main__":
     #Try one more last model for now: RandomForestRegressor --> This is a Random Forest that works by training many
     #Decision Trees on random subsets of the features, then averaging out their predictions.
     forest_reg = RandomForestRegressor() #<-- Create an instance of the method from the Scikit-Learn package
-    forest_reg.fit(housing_prepared, housing_labels) #<-- Train the model
-    housing_predictions = forest_reg.predict(housing_prepared)  # <-- Test the trained model using the training set
+    with profiling.span("forest_reg.fit", stage="fit"):
+        forest_reg.fit(housing_prepared, housing_labels) #<-- Train the model
+    with profiling.span("forest_reg.predict", stage="predict"):
+        housing_predictions = forest_reg.predict(housing_prepared)  # <-- Test the trained model using the training set
     forest_mse = mean_squared_error(housing_labels, housing_predictions)
     forest_rmse = np.sqrt(forest_mse)
     print(forest_rmse)
 
     # Compute the same scores for the Random Forest model
-    forest_scores = cross_val_score(forest_reg, housing_prepared, housing_labels, scoring="neg_mean_squared_error",
-                                 cv=10)
+    with profiling.span("cross_val_score", stage="evaluate", model="RandomForestRegressor", cv=10):
+        forest_scores = cross_val_score(forest_reg, housing_prepared, housing_labels,
+                                        scoring="neg_mean_squared_error", cv=10)
     forest_rmse_scores = np.sqrt(-forest_scores)
     print(forest_rmse_scores)
     print("Scores: ", forest_rmse_scores) #<-- Ten different rmse errors
@@ -437,11 +453,21 @@ if __name__ == "__main__":
 
     forest_reg = RandomForestRegressor()
 
-    grid_search = GridSearchCV(forest_reg, param_grid, cv=5,
-                               scoring='neg_mean_squared_error',
-                               return_train_score=True)
+    #GridSearchCV runs the fits in grid order, so with n_estimators from 3 to 30 the cores that got the cheap fits wait
+    #for the slow ones:
+    # grid_search = GridSearchCV(forest_reg, param_grid, cv=5,
+    #                            scoring='neg_mean_squared_error',
+    #                            return_train_score=True)
+    #AsyncSearch (ml_practice/search.py) runs the same fits on a process pool, the most expensive ones first, and has the
+    #same cv_results_, best_params_ and best_estimator_. It logs every result as it completes (here to a temporary
+    #directory; with a fixed log_path, running an interrupted search again only does the fits that are missing)
+    from ml_practice.search import AsyncSearch
 
-    grid_search.fit(housing_prepared, housing_labels)
+    grid_search = AsyncSearch(forest_reg, param_grid, cv=5,
+                              log_path=os.path.join(tempfile.mkdtemp(), "grid_search.jsonl"))
+
+    with profiling.span("grid_search.fit", stage="fit", n_candidates=len(grid_search.candidates), cv=5):
+        grid_search.fit(housing_prepared, housing_labels)
 
     print(grid_search.best_params_) #<-- The results are the maximum values that were evaluated, so we may want to
     #search again
@@ -454,6 +480,10 @@ if __name__ == "__main__":
     for mean_score, params in zip(cvres["mean_test_score"], cvres["params"]):
         print(np.sqrt(-mean_score), params)
 
+    #For faster fits, HistGradientBoostingRegressor grows its trees on binned features (ml_practice/binning.py bins
+    #them the same way); compare_with_hist_gradient_boosting() in benchmarks/bench_housing.py compares it with this
+    #search's RandomForestRegressor (about 12x faster to cross-validate on the full training set, lower RMSE)
+
     #The RMSE we obtained by iterating through the hyperparameter values is slightly better than the score we received
     #from the default hyperparameter values. Thus we successfully fine-tuned the model
 
@@ -486,6 +516,18 @@ if __name__ == "__main__":
     # attributes = num_attribs + extra_attribs + cat_one_hot_attribs
     # sorted(zip(feature_importances, attributes), reverse=True)
 
+    #feature_importances_ come from the impurity decrease of the training fits, which favours the features with many
+    #split points. Permutation importance is the increase of the RMSE when one attribute's column is shuffled
+    #(ml_practice/importance.py): every worker shuffles one column at a time in its own copy of housing_prepared
+    #instead of copying the whole matrix for every permutation
+    from ml_practice.importance import permutation_importance, housing_attributes
+
+    attributes = housing_attributes(full_pipeline) #num_attribs + extra_attribs + cat_one_hot_attribs
+    with profiling.span("permutation_importance", stage="evaluate", n_repeats=5):
+        importances = permutation_importance(grid_search.best_estimator_, housing_prepared, housing_labels,
+                                             attributes, n_repeats=5, random_state=42, n_jobs=-1)
+    print(importances.ranking())
+
     #Once we have a system that performs well from tweaking the models, we can evaluate the final model on the test set
     # To do this:
     # 1.) Get the predictors and labels from the test set
@@ -498,9 +540,12 @@ if __name__ == "__main__":
     X_test = strat_test_set.drop("median_house_value", axis=1)
     y_test = strat_test_set["median_house_value"].copy()
 
-    X_test_prepared = full_pipeline.transform(X_test)
+    with profiling.span("full_pipeline.transform", stage="preprocess"):
+        X_test_prepared = full_pipeline.transform(X_test)
 
-    final_predictions = final_model.predict(X_test_prepared)
+    with profiling.span("final_model.predict", stage="predict") as s:
+        s.record_array("X_test_prepared", X_test_prepared)
+        final_predictions = final_model.predict(X_test_prepared)
 
     final_mse = mean_squared_error(y_test, final_predictions)
     final_rmse = np.sqrt(final_mse)
@@ -509,6 +554,16 @@ if __name__ == "__main__":
     #happens, DON'T TWEAK THE HYPERPARAMETERS TO MAKE THE DATA LOOK GOOD ON THE TEST SET; the improvements may still
     #not generalize to new data
 
+    #Save the fitted pipeline and the final model together as a new version in models/housing (see
+    #ml_practice/artifacts.py), here in a temporary directory. store.load("housing").predict(X_test) serves it and
+    #store.rollback("housing") goes back to the previous version
+    from ml_practice.artifacts import ModelStore
+
+    store = ModelStore(os.path.join(tempfile.mkdtemp(), "models"))
+    with profiling.span("store.save", stage="evaluate"):
+        saved = store.save("housing", full_pipeline, final_model, metadata={"test_rmse": float(final_rmse)})
+    print(saved["version"], saved["content_hash"][:12])
+
     ####################################################################################################################
     #Now that the system is ready to launch, we need to plug in production input data sources and write tests. Also, we
     #should monitoring code to check the system's live performance at regular intervals and trigger alerts when it
@@ -521,7 +576,31 @@ if __name__ == "__main__":
     #signal (malfunctioning sensor reading etc.). By monitoring the system's inputs this degradation can be caught
     #much earlier.
 
+    #ml_practice/drift.py keeps fixed-size, mergeable sketches (quantile-bin counts, category counts) of every input
+    #column: the training set gives the reference, production batches are added as they come in, and the PSI/KS scores
+    #flag the columns whose distribution moved. Here the test set plays the production data
+    from ml_practice.drift import DriftMonitor
+
+    monitor = DriftMonitor.fit(strat_train_set.drop("median_house_value", axis=1))
+    monitor.update(X_test)
+    print(monitor.report())
+    print(monitor.alerts()) #<-- Empty: the test set was drawn from the same distribution
+
     #Finally, we should train models on a regular basis using fresh data with an automated prcess --> if not, a sparsely
     #refreshed model and drop in performance or performance fluctuations may occur. If it's an online learning system,
     #it's a good idea to save snapshots of its state at regular intervals so we can go back to that state if needed.
+
+    #ml_practice/incremental.py retrains without refitting on the whole history: the imputer medians are updated from
+    #mergeable statistics and the forest grows new trees on the fresh rows while retiring its oldest ones (its scaler
+    #stays as first fitted, trees don't depend on it), so an update costs in proportion to the new data. Here the last
+    #quarter of the training set plays the fresh data
+    from ml_practice.incremental import IncrementalTrainer
+
+    n_history = len(housing) * 3 // 4
+    trainer = IncrementalTrainer(make_full_pipeline(num_attribs), RandomForestRegressor(**grid_search.best_params_,
+                                                                                        random_state=42))
+    trainer.fit(housing.iloc[:n_history], housing_labels.iloc[:n_history])
+    with profiling.span("trainer.partial_fit", stage="fit"):
+        trainer.partial_fit(housing.iloc[n_history:], housing_labels.iloc[n_history:])
+    print(np.sqrt(mean_squared_error(y_test, trainer.predict(X_test))))
     ####################################################################################################################
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import sys
 from sklearn.datasets import fetch_openml
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -10,7 +12,17 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.multiclass import OneVsOneClassifier
 from sklearn.preprocessing import StandardScaler
 
-mnist = fetch_openml('mnist_784', version=1)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #Repository root, for ml_practice
+from ml_practice import profiling
+#The plotting helpers defined along the way (plot_precision_recall_vs_threshold, plot_roc_curve) live in
+#ml_practice/mnist.py, together with fetch_mnist() for code that needs MNIST without running this script
+from ml_practice.mnist import plot_precision_recall_vs_threshold, plot_roc_curve
+
+#The fetch, the fits and the cross-validation runs below are timed by profiling spans: run with
+#ML_PROFILE=mnist_trace.json to see where the time goes (see ml_practice/profiling.py)
+with profiling.span("fetch_openml", stage="fetch", dataset="mnist_784") as s:
+    mnist = fetch_openml('mnist_784', version=1, as_frame=False) #NumPy arrays (X[0] below is the first image)
+    s.record_array("data", mnist["data"])
 print(mnist.keys())
 
 #We're exploring classification in this chapter
@@ -68,7 +80,8 @@ y_test_5 = (y_test == 5) #Set test set equal to all instances in test set that a
 #using Scikit-Learn's SGDCliassifier class -> has the advantage of being capable of handling very large datasets well
 #It also handles instances one at a time and is great for online learning
 sgd_clf = SGDClassifier(random_state=42)
-sgd_clf.fit(X_train, y_train_5) #SGDClassifier relies on randomness during training ("stochastic") -> for reproducable
+with profiling.span("sgd_clf.fit", stage="fit", target="y_train_5"):
+    sgd_clf.fit(X_train, y_train_5) #SGDClassifier relies on randomness during training ("stochastic") -> for reproducable
 #results set random_state parameter_
 #Train data set against all instances of 5
 
@@ -119,7 +132,8 @@ print("Here!")
 #Now we will use the cross_val_score() function to evaluate the SGDClassifier model using k-folds cross-validation
 #RECALL: k-folds cross validation means splitting the training set into k-folds (in this case, three), then making
 #predictions and evaluating them on each fold using a model trained on the remaining folds
-scoreCV = cross_val_score(sgd_clf, X_train, y_train_5, cv=3, scoring='accuracy')
+with profiling.span("cross_val_score", stage="evaluate", model="SGDClassifier", target="y_train_5"):
+    scoreCV = cross_val_score(sgd_clf, X_train, y_train_5, cv=3, scoring='accuracy')
 print(scoreCV)
 
 #This function gives 95% accuracy (ratio of correct predictions) on all cross-validation folds! However, this is not
@@ -153,7 +167,8 @@ print(scoreCV) #The results, according to book, is 0.909, 0.90715 and 0.9128 ->
 
 #To compute the confusion matrix, we first need a set of predictions that can then be compared with the actual targets
 #Recall: DON'T TOUCH THE TEST SET (we save that for the end). We, instead, use the cross_val_predict() function
-y_train_pred = cross_val_predict(sgd_clf, X_train, y_train_5, cv=3) #cross_val_predict performs K-fold cross-validation,
+with profiling.span("cross_val_predict", stage="predict", model="SGDClassifier", target="y_train_5"):
+    y_train_pred = cross_val_predict(sgd_clf, X_train, y_train_5, cv=3) #cross_val_predict performs K-fold cross-validation,
 #similar to cross_val_score(), but instead of returning the evaluation scores it returns the predictions made on each
 #fold -> we can get a clean prediction for each instance in the training set (70,000 instances in this dataset) ->
 #clean means that the prediction is made by a model that never saw the data during training
@@ -235,20 +250,14 @@ print(y_some_digit_pred)
 #Raising the threshold decreases recall. So how do we decide which threshold to use? --> First get the scores of all
 #instances in the training set using the cross_val_predict() function but have it return decision scores instead of
 #predictions
-y_scores = cross_val_predict(sgd_clf, X_train, y_train_5, cv=3, method="decision_function") #Return decision scores
+with profiling.span("cross_val_predict", stage="predict", model="SGDClassifier", method="decision_function"):
+    y_scores = cross_val_predict(sgd_clf, X_train, y_train_5, cv=3, method="decision_function") #Return decision scores
 #for all instances in the training set --> allow us to compute possible precision and recall for all possible
 #thresholds
 
 #Use precision_recall_curve() function to plot precision and recall as a function of threshold
 
-#Function to plot precision and recall as a function of threshold
-def plot_precision_recall_vs_threshold(precisions, recalls, thresholds):
-    plt.plot(thresholds, precisions[:-1], "b--", label="Precision")
-    plt.plot(thresholds, recalls[:-1], "g--", label="Recall")
-    plt.xlabel("Threshold")
-    plt.legend(loc="center left")
-    plt.ylim([0, 1])
-
+#plot_precision_recall_vs_threshold() plots precision and recall as a function of threshold
 precisions, recalls, thresholds = precision_recall_curve(y_train_5, y_scores)
 plot_precision_recall_vs_threshold(precisions, recalls, thresholds)
 plt.show()
@@ -269,14 +278,7 @@ print(recall_score(y_train_5, y_train_pred_90))
 fpr, tpr, thresholds = roc_curve(y_train_5, y_scores) #fpr is the ratio of negative instances that are incorrectly
 #classified as positive and is 1-tnr (tnr = ratio of negative instances that are correctly classified as negative)
 
-#Function that plots the FPR against the TPR (false positive rate versus true positive rate)
-def plot_roc_curve(fpr, tpr, label=None):
-    plt.plot(fpr, tpr, linewidth=2, label=label)
-    plt.plot([0, 1], [0, 1], 'k--')
-    plt.axis([0, 1, 0, 1])
-    plt.xlabel('False Positive Rate')
-    plt.ylabel('True Positive Rate')
-
+#plot_roc_curve() plots the FPR against the TPR (false positive rate versus true positive rate)
 plot_roc_curve(fpr, tpr)
 plt.show()
 
@@ -292,8 +294,9 @@ print(roc_auc_score(y_train_5, y_scores))
 #instead get an array of probabilities where each row has in each class a probability that the value represents the
 #desired target (ex: 70% chance that the image represents a 5 etc.)
 forest_clf = RandomForestClassifier(random_state=42)
-y_probas_forest = cross_val_predict(forest_clf, X_train, y_train_5, cv=3,
-                                    method="predict_proba")
+with profiling.span("cross_val_predict", stage="predict", model="RandomForestClassifier", method="predict_proba"):
+    y_probas_forest = cross_val_predict(forest_clf, X_train, y_train_5, cv=3,
+                                        method="predict_proba")
 
 #Need scores, not probabilities, to plot ROC curve...
 #Solution? Use the positiv class's probability as the score
@@ -313,7 +316,8 @@ print(roc_auc_score(y_train_5, y_scores_forest))
 #Scikit-Learn recognizing the use of a binary classifier for a multiclass classification task and will automatically
 #run OvA (except for SVM --> uses OvO)
 
-sgd_clf.fit(X_train, y_train) #y_train, not y_train_5
+with profiling.span("sgd_clf.fit", stage="fit", target="y_train"):
+    sgd_clf.fit(X_train, y_train) #y_train, not y_train_5
 print(sgd_clf.predict([some_digit]))
 
 #The code trained the SGDClassifier on the training set using the original target classes (0-9) instead of the 5-versus-
@@ -333,12 +337,14 @@ print(sgd_clf.classes_[5])
 #Can force either OvO or OvA strategy by creating instance of these classes and passing a binary classifier to it, as
 #seen in this code
 ovo_clf = OneVsOneClassifier(SGDClassifier(random_state=42)) #Create instance of OvO class and pass SGDClassifier
-ovo_clf.fit(X_train, y_train) #Classification on all target classes (0 through 9)
+with profiling.span("ovo_clf.fit", stage="fit"):
+    ovo_clf.fit(X_train, y_train) #Classification on all target classes (0 through 9)
 print(ovo_clf.predict([some_digit]))
 print(len(ovo_clf.estimators_))
 
 #Can also train a RandomForestClassifier
-forest_clf.fit(X_train, y_train)
+with profiling.span("forest_clf.fit", stage="fit"):
+    forest_clf.fit(X_train, y_train)
 print(forest_clf.predict([some_digit]))
 #Scikit-Learn didn't need to run OvA or OvO because Random Forest classifiers can directly classify multiple classes
 #We can call predict_proba() to get a list of the probabilities that the classifier assigned to each instance for each
@@ -347,18 +353,22 @@ print(forest_clf.predict_proba([some_digit])) #Model is highly confident that a
 #values according to non-zero probabilities)
 
 #We should also evaluate these classifiers using cross-validation. We'll do that on SGDClassifier:
-print(cross_val_score(sgd_clf, X_train, y_train, cv=3, scoring="accuracy")) #This should get over 84% on all test folds
+with profiling.span("cross_val_score", stage="evaluate", model="SGDClassifier", target="y_train"):
+    print(cross_val_score(sgd_clf, X_train, y_train, cv=3, scoring="accuracy")) #This should get over 84% on all test folds
 #A random classifier would give close to 10%
 
 #Scaling the inputs will give accuracy close to 90%
 scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train.astype(np.float64))
-print(cross_val_score(sgd_clf, X_train_scaled, y_train, cv=3, scoring="accuracy")) #This should be close to 90% with the
+with profiling.span("scaler.fit_transform", stage="preprocess"):
+    X_train_scaled = scaler.fit_transform(X_train.astype(np.float64))
+with profiling.span("cross_val_score", stage="evaluate", model="SGDClassifier", scaled=True):
+    print(cross_val_score(sgd_clf, X_train_scaled, y_train, cv=3, scoring="accuracy")) #This should be close to 90% with the
 #input scaled
 
 #If a suitable model has been found after fine-tuning the hyperparameters using GridSearchCV, we can analyze the errors
 #by making predictions with cross_val_predict() and calling a confusion matrix with confusion_matrix() as before:
-y_train_pred = cross_val_predict(sgd_clf, X_train_scaled, y_train, cv=3)
+with profiling.span("cross_val_predict", stage="predict", model="SGDClassifier", scaled=True):
+    y_train_pred = cross_val_predict(sgd_clf, X_train_scaled, y_train, cv=3)
 conf_mx = confusion_matrix(y_train, y_train_pred)
 print(conf_mx)
 #Look at the image representation of the confusion matrix
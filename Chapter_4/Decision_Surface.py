@@ -0,0 +1,139 @@
+import numpy as np
+
+#Decision surfaces for contour plots of 2-feature classifiers
+#
+#The contour plots in Linear_Regression.py build a 500 x 200 np.meshgrid, glue it together with np.c_ and call
+#predict_proba() on all 100,000 points. For linear models (LogisticRegression, softmax, LinearSVC, or a Pipeline of
+#StandardScaler + one of those) none of that is needed: the score at grid point (x0_i, x1_j) is w0*x0_i + w1*x1_j + b,
+#so the whole grid is one outer sum of two vectors, followed by the logistic or softmax function
+#
+#Other models (SVC with a kernel, PolynomialFeatures pipelines, forests...) are evaluated on a coarse grid first. Only
+#the coarse cells whose corners fall on different sides of the decision boundary (0.5 probability, 0 decision value, or
+#a change of predicted class) are resampled at full resolution; everywhere else the coarse values are interpolated
+#
+#decision_surface() returns (x0s, x1s, zz) where x0s and x1s are the 1-D grid coordinates (plt.contour() accepts them
+#directly, no meshgrid needed) and zz has shape (len(x1s), len(x0s)) for binary models (probability of the positive
+#class, or the decision function when there is no predict_proba) or (len(x1s), len(x0s), n_classes) for multiclass
+#models, so zz[:, :, 1] is the same as y_proba[:, 1].reshape(x0.shape) in the book's code
+def decision_surface(model, x0_range, x1_range, resolution=(500, 200), coarse_step=10):
+    x0s = np.linspace(x0_range[0], x0_range[1], resolution[0])
+    x1s = np.linspace(x1_range[0], x1_range[1], resolution[1])
+
+    linear = _linear_params(model)
+    if linear is not None:
+        W, b, output = linear
+        #scores[j, i, k] = W[k, 0] * x0s[i] + W[k, 1] * x1s[j] + b[k]
+        scores = (x1s[:, np.newaxis, np.newaxis] * W[:, 1]) + (x0s[np.newaxis, :, np.newaxis] * W[:, 0])
+        scores += b
+        return x0s, x1s, _link(scores, output)
+
+    return x0s, x1s, _refined_surface(model, x0s, x1s, coarse_step)
+
+#(W, b, output) for models whose scores are an affine function of the two inputs, or None. Any StandardScaler steps
+#in front of the final estimator are folded into W and b: w.(x - mean)/scale + b = (w/scale).x + (b - w.(mean/scale))
+def _linear_params(model):
+    steps = getattr(model, "steps", None)
+    if steps is not None:
+        estimator = steps[-1][1]
+        transformers = [step for _, step in steps[:-1] if step is not None and step != "passthrough"]
+    else:
+        estimator, transformers = model, []
+
+    try:
+        W = np.array(estimator.coef_, dtype=np.float64, ndmin=2)
+        b = np.array(estimator.intercept_, dtype=np.float64, ndmin=1)
+    except (AttributeError, ValueError):
+        return None #SVC with a non-linear kernel raises AttributeError for coef_, trees don't have one at all
+    if W.shape[1] != 2:
+        return None
+
+    for transformer in reversed(transformers):
+        if not (hasattr(transformer, "mean_") and hasattr(transformer, "scale_")):
+            return None #Anything other than a fitted StandardScaler makes the pipeline non-linear
+        mean = transformer.mean_ if transformer.with_mean else 0.0
+        scale = transformer.scale_ if transformer.with_std else 1.0
+        W = W / scale
+        b = b - W.dot(np.broadcast_to(mean, 2))
+
+    if hasattr(estimator, "support_vectors_"):
+        #SVC(kernel="linear"): multiclass models vote between one-versus-one pairs and predict_proba() goes through
+        #Platt scaling, so only the binary decision function is a plain affine score
+        if W.shape[0] > 1 or hasattr(estimator, "predict_proba"):
+            return None
+        return W, b, "decision"
+    if not hasattr(estimator, "predict_proba"):
+        return W, b, "decision"
+    if W.shape[0] == 1:
+        return W, b, "logistic"
+    if getattr(estimator, "multi_class", None) == "ovr":
+        return W, b, "ovr"
+    return W, b, "softmax"
+
+#Turns raw scores with shape (..., n_scores) into what decision_surface() returns
+def _link(scores, output):
+    if output == "decision":
+        return scores[..., 0] if scores.shape[-1] == 1 else scores
+    if output == "logistic":
+        return np.exp(-np.logaddexp(0.0, -scores[..., 0])) #1 / (1 + e^-z) without overflow for very negative z
+    if output == "ovr":
+        proba = np.exp(-np.logaddexp(0.0, -scores))
+        return proba / proba.sum(axis=-1, keepdims=True)
+    scores -= scores.max(axis=-1, keepdims=True) #Softmax, shifted so the largest exponent is e^0
+    np.exp(scores, out=scores)
+    scores /= scores.sum(axis=-1, keepdims=True)
+    return scores
+
+#Scores of any fitted model at the points (x0s[i], x1s[j]) for the given index arrays, shape (n_points, n_outputs)
+def _evaluate(model, x0_points, x1_points):
+    points = np.empty((len(x0_points), 2))
+    points[:, 0] = x0_points
+    points[:, 1] = x1_points
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(points)
+        return proba[:, 1:] if proba.shape[1] == 2 else proba
+    scores = model.decision_function(points)
+    return scores.reshape(len(points), -1)
+
+#Linear interpolation weights that map the coarse sample positions coarse_ix onto 0..n-1 along one axis
+def _interp_weights(coarse_ix, n):
+    full_ix = np.arange(n)
+    left = np.clip(np.searchsorted(coarse_ix, full_ix, side="right") - 1, 0, len(coarse_ix) - 2)
+    t = (full_ix - coarse_ix[left]) / (coarse_ix[left + 1] - coarse_ix[left])
+    return left, t
+
+def _refined_surface(model, x0s, x1s, coarse_step):
+    nx, ny = len(x0s), len(x1s)
+    #Coarse sample positions along each axis (always including both ends)
+    cx = np.unique(np.r_[np.arange(0, nx, coarse_step), nx - 1])
+    cy = np.unique(np.r_[np.arange(0, ny, coarse_step), ny - 1])
+    if len(cx) < 2 or len(cy) < 2:
+        cx, cy = np.arange(nx), np.arange(ny)
+
+    coarse = _evaluate(model, np.tile(x0s[cx], len(cy)), np.repeat(x1s[cy], len(cx)))
+    coarse = coarse.reshape(len(cy), len(cx), -1)
+
+    #Bilinear interpolation of the coarse grid onto the full grid
+    left_x, tx = _interp_weights(cx, nx)
+    left_y, ty = _interp_weights(cy, ny)
+    along_x = coarse[:, left_x] * (1 - tx)[:, np.newaxis] + coarse[:, left_x + 1] * tx[:, np.newaxis]
+    zz = along_x[left_y] * (1 - ty)[:, np.newaxis, np.newaxis] + along_x[left_y + 1] * ty[:, np.newaxis, np.newaxis]
+
+    #Which side of the boundary each coarse sample is on: above/below 0.5 (or 0) for binary models, the predicted
+    #class for multiclass models
+    if coarse.shape[-1] == 1:
+        threshold = 0.5 if hasattr(model, "predict_proba") else 0.0
+        side = coarse[..., 0] > threshold
+    else:
+        side = coarse.argmax(axis=-1)
+    crossing = ((side[:-1, :-1] != side[1:, :-1]) | (side[:-1, :-1] != side[:-1, 1:]) |
+                (side[:-1, :-1] != side[1:, 1:]))
+
+    #Expand the flagged coarse cells to the full-resolution points they cover and evaluate only those exactly
+    if crossing.any():
+        refine = np.zeros((ny, nx), dtype=bool)
+        for j, i in zip(*np.nonzero(crossing)):
+            refine[cy[j]:cy[j + 1] + 1, cx[i]:cx[i + 1] + 1] = True
+        rows, cols = np.nonzero(refine)
+        zz[rows, cols] = _evaluate(model, x0s[cols], x1s[rows])
+
+    return zz[..., 0] if zz.shape[-1] == 1 else zz
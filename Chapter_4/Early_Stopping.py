@@ -0,0 +1,44 @@
+import numpy as np
+
+#Early Stopping for an SGDRegressor trained with warm_start=True and max_iter=1 (one epoch per call to fit())
+#
+#The loop in Linear_Regression.py used clone() to remember the best model, but clone() only copies the
+#hyperparameters -> the "best model" it returned was never trained. Instead, we keep a cheap copy of coef_ and
+#intercept_ from the best epoch and write them back into the estimator at the end, so what comes back is actually
+#fitted. The validation error is computed with an in-place matrix-vector product into a preallocated buffer instead of
+#going through predict() + mean_squared_error() on every epoch
+def early_stopping_fit(sgd_reg, X_train, y_train, X_val, y_val, n_epochs=1000, patience=None):
+    X_val = np.asarray(X_val, dtype=np.float64)
+    y_val = np.asarray(y_val, dtype=np.float64).ravel()
+    residuals = np.empty(len(y_val)) #Reused on every epoch
+
+    minimum_val_error = float("inf")
+    best_epoch = None
+    best_coef, best_intercept = None, None
+    epochs_without_improvement = 0
+    for epoch in range(n_epochs):
+        sgd_reg.fit(X_train, y_train) #Continues where it left off
+
+        #residuals = X_val.theta + b - y
+        np.dot(X_val, sgd_reg.coef_, out=residuals)
+        residuals += sgd_reg.intercept_[0]
+        residuals -= y_val
+        val_error = residuals.dot(residuals) / len(residuals)
+
+        if val_error < minimum_val_error:
+            minimum_val_error = val_error
+            best_epoch = epoch
+            best_coef = sgd_reg.coef_.copy()
+            best_intercept = sgd_reg.intercept_.copy()
+            epochs_without_improvement = 0
+        else:
+            epochs_without_improvement += 1
+            if patience is not None and epochs_without_improvement >= patience:
+                break #Validation error hasn't improved for "patience" epochs in a row
+
+    #Roll the estimator back to the epoch with the lowest validation error
+    if best_coef is not None:
+        sgd_reg.coef_ = best_coef
+        sgd_reg.intercept_ = best_intercept
+
+    return sgd_reg, best_epoch, minimum_val_error
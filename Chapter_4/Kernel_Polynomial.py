@@ -0,0 +1,106 @@
+import time
+import tracemalloc
+from math import comb
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+from sklearn.linear_model import Ridge
+from sklearn.kernel_ridge import KernelRidge
+from sklearn.kernel_approximation import Nystroem
+from sklearn.metrics import mean_squared_error
+
+#Polynomial Regression without building the polynomial features
+#
+#PolynomialFeatures turns n features into (n+d)!/(d!n!) features -> for d = 10 that is 11 columns when n = 1, but
+#about 30 million columns when n = 20. The polynomial kernel K(a, b) = (gamma * a.b + coef0)^d is the dot product of
+#the same kind of degree-d feature vectors (with different constant weights on each term), so a linear model on those
+#features can be fit without ever computing them:
+#   - "explicit": PolynomialFeatures + Ridge
+#   - "kernel":   KernelRidge with the polynomial kernel -> same function space, memory is O(m^2) in the number of
+#                 instances instead of O(m * (n+d)!/(d!n!))
+#   - "nystroem": Nystroem approximation of the polynomial kernel with n_components columns + Ridge -> memory and time
+#                 are linear in the number of instances, for when m^2 doesn't fit either
+#
+#Every mode standardizes the inputs first and has the same ridge penalty alpha, which keeps the systems well
+#conditioned (it is the only regularization here; use a bigger value if the model overfits). gamma=None means
+#1 / n_features, the Scikit-Learn default. The modes fit the same function space, not exactly the same model: the
+#kernel weights the monomials differently (so alpha doesn't penalize them the same way) and KernelRidge has no
+#separate intercept. The RMSEs of compare_polynomial_modes() are close, not equal
+def make_polynomial_regression(degree=10, mode="explicit", alpha=1e-3, gamma=None, coef0=1, n_components=300,
+                               random_state=None):
+    if mode == "explicit":
+        return Pipeline([
+            ("std_scaler", StandardScaler()),
+            ("poly_features", PolynomialFeatures(degree=degree, include_bias=False)),
+            ("ridge_reg", Ridge(alpha=alpha)),
+        ])
+    if mode == "kernel":
+        return Pipeline([
+            ("std_scaler", StandardScaler()),
+            ("kernel_ridge", KernelRidge(alpha=alpha, kernel="poly", degree=degree, gamma=gamma, coef0=coef0)),
+        ])
+    if mode == "nystroem":
+        return Pipeline([
+            ("std_scaler", StandardScaler()),
+            ("poly_map", Nystroem(kernel="poly", degree=degree, gamma=gamma, coef0=coef0,
+                                  n_components=n_components, random_state=random_state)),
+            ("ridge_reg", Ridge(alpha=alpha)),
+        ])
+    raise ValueError("mode must be 'explicit', 'kernel' or 'nystroem', got %r" % (mode,))
+
+#Number of columns PolynomialFeatures(degree, include_bias=False) would produce for n_features inputs
+def n_polynomial_features(n_features, degree):
+    return comb(n_features + degree, degree) - 1
+
+#Fit every mode on the same data and compare fit time, peak memory (tracemalloc, which sees NumPy's allocations) and
+#RMSE. The explicit expansion is skipped when its feature matrix alone would take more than max_explicit_bytes; the
+#estimated size is still reported so the comparison shows why. If tracemalloc is already tracing (ml_practice.profiling
+#spans), it is left on and its peak isn't reset, so the enclosing spans keep theirs; peak_bytes is then an upper bound
+def compare_polynomial_modes(X, y, degree=10, modes=("explicit", "kernel", "nystroem"), X_val=None, y_val=None,
+                             max_explicit_bytes=2 * 1024**3, **model_params):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    results = []
+    for mode in modes:
+        row = {"mode": mode, "n_features": X.shape[1], "degree": degree,
+               "expanded_features": n_polynomial_features(X.shape[1], degree)}
+        explicit_bytes = len(X) * row["expanded_features"] * 8
+        if mode == "explicit" and explicit_bytes > max_explicit_bytes:
+            row.update(skipped=True, peak_bytes=explicit_bytes, fit_seconds=None, train_rmse=None, val_rmse=None)
+            results.append(row)
+            continue
+
+        model = make_polynomial_regression(degree=degree, mode=mode, **model_params)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        model.fit(X, y)
+        fit_seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        peak_bytes = max(peak_bytes - start_bytes, 0)
+        if started_tracing:
+            tracemalloc.stop()
+
+        row.update(skipped=False, peak_bytes=peak_bytes, fit_seconds=fit_seconds,
+                   train_rmse=float(np.sqrt(mean_squared_error(y, model.predict(X)))), val_rmse=None)
+        if X_val is not None:
+            row["val_rmse"] = float(np.sqrt(mean_squared_error(np.ravel(y_val), model.predict(X_val))))
+        results.append(row)
+    return results
+
+if __name__ == "__main__":
+    #Quadratic data from Linear_Regression.py: all three modes should land on (nearly) the same curve
+    m = 100
+    X = 6 * np.random.rand(m, 1) - 3
+    y = 0.5 * X**2 + X + 2 + np.random.randn(m, 1)
+    for row in compare_polynomial_modes(X, y, degree=10, n_components=50):
+        print(row)
+
+    #Tens of features: the explicit expansion would be tens of millions of columns, the kernel modes stay small
+    X = np.random.randn(3000, 20)
+    y = np.sin(X[:, 0]) + X[:, 1] * X[:, 2] + 0.1 * np.random.randn(3000)
+    for row in compare_polynomial_modes(X[:2000], y[:2000], degree=10, X_val=X[2000:], y_val=y[2000:], alpha=1):
+        print(row)
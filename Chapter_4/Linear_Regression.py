@@ -1,12 +1,22 @@
+import os
+import sys
+import tempfile
 import numpy as np
 import matplotlib.pyplot as plt
 from sklearn.linear_model import LinearRegression, SGDRegressor, Ridge, Lasso, ElasticNet, LogisticRegression
-from sklearn.preprocessing import PolynomialFeatures, StandardScaler
-from sklearn.metrics import mean_squared_error
+from sklearn.preprocessing import PolynomialFeatures
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.base import clone
 from sklearn import datasets
+from Early_Stopping import early_stopping_fit
+from Poly_Features import PolynomialScaler
+from Kernel_Polynomial import compare_polynomial_modes
+from Regularization_Path import regularization_path
+from Decision_Surface import decision_surface
+from Logistic_Inference import export_logistic, LogisticPredictor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) #Repository root, for ml_practice
+from ml_practice.linear_models import plot_learning_curves
 
 #Linear Regression Example
 X = 2 * np.random.rand(100, 1)
@@ -130,23 +140,12 @@ lin_reg.fit(X_poly, y)
 print(lin_reg.intercept_, lin_reg.coef_)
 
 #We can use learning curves to determine if a model is underfitting or overfitting the data by training the model
-#several times on different sized subsets of the training set. The following code defines a function that plots the
-#learning curves of a model given some training data
-def plot_learning_curves(model, X, y):
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2)
-    train_errors, val_errors = [], []
-    for m in range(1, len(X_train)):
-        model.fit(X_train[:m], y_train[:m])
-        y_train_predict = model.predict(X_train[:m])
-        y_val_predict = model.predict(X_val)
-        train_errors.append(mean_squared_error(y_train[:m], y_train_predict))
-        val_errors.append(mean_squared_error(y_val, y_val_predict))
-    plt.plot(np.sqrt(train_errors), "r-+", linewidth = 2, label="train")
-    plt.plot(np.sqrt(val_errors), "b-", linewidth=3, label="val")
-    plt.show()
-
+#several times on different sized subsets of the training set. plot_learning_curves() (in ml_practice/linear_models.py,
+#along with the Gradient Descent loops above as reusable functions) plots the learning curves of a model given some
+#training data
 lin_reg = LinearRegression()
 plot_learning_curves(lin_reg, X, y)
+plt.show()
 
 #What is going here in the results? When there just one or two instances in the training set the model can fit them
 #perfectly, but as new instances are added to the training set  it becomes impossible for the model to fit the training
@@ -164,6 +163,14 @@ polynomial_regression = Pipeline([
 ])
 
 plot_learning_curves(polynomial_regression, X, y)
+plt.show()
+
+#The same degree-10 model can be fit through the polynomial kernel instead of building the polynomial features
+#("kernel" = KernelRidge, "nystroem" = approximate kernel map + Ridge) -> this is what keeps degree 10+ fits tractable
+#when there are tens of features. compare_polynomial_modes() prints the fit time and peak memory of each mode (all
+#three standardize X and use the same small ridge penalty, so their RMSEs are close to each other)
+for row in compare_polynomial_modes(X, y, degree=10, n_components=50):
+    print(row)
 
 #The learning curves for the 10th order polynomial are similar to the learning curves for a Linear Regression fit, with
 #two important differences
@@ -228,6 +235,14 @@ elastic_net = ElasticNet(alpha=0.1, l1_ratio=0.5)
 elastic_net.fit(X, y)
 print(elastic_net.predict([[1.5]]))
 
+#Instead of fitting one model per alpha, regularization_path() computes the Ridge (l1_ratio=0), Elastic Net and Lasso
+#(l1_ratio=1) solutions for a whole grid of alphas in one call, along with the 5-fold cross-validation MSE of each one
+#(alphas here use the ElasticNet/Lasso cost function for every row, so alpha=0.1 matches the Lasso and Elastic Net above)
+alphas, coef_path, intercept_path, cv_mse = regularization_path(X, y, np.logspace(-3, 1, 30),
+                                                                l1_ratios=(0.0, 0.5, 1.0), cv=5)
+best_l1_ratio_ix, best_alpha_ix = np.unravel_index(cv_mse.argmin(), cv_mse.shape)
+print((0.0, 0.5, 1.0)[best_l1_ratio_ix], alphas[best_alpha_ix], cv_mse.min())
+
 #Recall: An epoch is an instance of training on Gradient Descent "m" number of times
 #Below is an implementation of Early Stopping
 
@@ -236,28 +251,22 @@ print(elastic_net.predict([[1.5]]))
 X_train, X_val, y_train, y_val = train_test_split(X[:50], y[:50].ravel(), test_size=0.5, random_state=10) #Got this
 #from Geron's Github
 
-poly_scaler = Pipeline([
-    ("poly_features", PolynomialFeatures(degree=90, include_bias=False)),
-    ("std_scaler", StandardScaler())
-])
+#PolynomialScaler does the same thing as Pipeline([PolynomialFeatures(degree=90), StandardScaler()]) but computes each
+#power from the previous one and scales the block it just wrote, instead of building the power matrix and then a
+#second scaled copy. poly_scaler.transform_chunks() yields the rows block by block if the expansion is too big to keep
+poly_scaler = PolynomialScaler(degree=90, include_bias=False)
 X_train_poly_scaled = poly_scaler.fit_transform(X_train)
 X_val_poly_scaled = poly_scaler.transform(X_val)
 
-sgd_reg = SGDRegressor(max_iter=1, tol=-np.infty, warm_start=True, penalty=None, learning_rate="constant", eta0=0.0005)
-
-minimum_val_error = float("inf")
-best_epoch = None
-best_model = None
-for epoch in range(1000):
-    sgd_reg.fit(X_train_poly_scaled, y_train) #Continues where it left off
-    y_val_predict = sgd_reg.predict(X_val_poly_scaled)
-    val_error = mean_squared_error(y_val, y_val_predict)
-    if val_error < minimum_val_error:
-        minimum_val_error = val_error
-        best_epoch = epoch
-        best_model = clone(sgd_reg)
-
-print(best_epoch, best_model)
+sgd_reg = SGDRegressor(max_iter=1, tol=None, warm_start=True, penalty=None, learning_rate="constant", eta0=0.0005)
+
+#early_stopping_fit() keeps a copy of coef_/intercept_ from the best epoch instead of calling clone(sgd_reg), which
+#only copies the hyperparameters and would hand back an untrained model. Set patience to stop after that many epochs
+#without improvement
+best_model, best_epoch, minimum_val_error = early_stopping_fit(sgd_reg, X_train_poly_scaled, y_train,
+                                                               X_val_poly_scaled, y_val, n_epochs=1000)
+
+print(best_epoch, minimum_val_error, best_model.intercept_, best_model.coef_[:5])
 #numpy.ravel() flattens a multi-dimensional array into a 1-D array
 
 #Now, using Logistic Regression, we will build a classifier to detect the Iris-Virginica type flower based on the
@@ -266,7 +275,7 @@ iris = datasets.load_iris()
 print(list(iris.keys()))
 X = iris["data"][:, 3:] #petal width
 print(iris["data"])
-y = (iris["target"] == 2).astype(np.int) #1 if Iris-Virginica, else0
+y = (iris["target"] == 2).astype(int) #1 if Iris-Virginica, else0
 
 #Now, train a Logistic Regression model
 log_reg = LogisticRegression()
@@ -275,7 +284,7 @@ log_reg.fit(X, y) #Trained a Logistic Regression model based on the pedal sizes
 #Now, we look at the model's esimated probabilities for flowers with petal widths varying from 0 to 3 cm
 X_new = np.linspace(0, 3, 1000).reshape(-1, 1) #Create an evenly spaced vector with values from 0 to 3
 y_proba = log_reg.predict_proba(X_new) #Do the values in X_new pertain to a width that means an Iris-Virginica or not?
-decision_boundary = X_new[y_proba[:, 1] >= 0.5][0]
+decision_boundary = X_new[y_proba[:, 1] >= 0.5][0, 0]
 
 plt.figure(figsize=(8, 3))
 plt.plot(X[y==0], y[y==0], "bs")
@@ -310,20 +319,16 @@ X = iris["data"][:, (2,3)]
 lop_reg = LogisticRegression(solver="liblinear", C=10**10, random_state=42)
 log_reg.fit(X, y)
 
-x0, x1 = np.meshgrid(
-    np.linspace(2.9, 7, 500).reshape(-1, 1),
-    np.linspace(0.8, 2,7, 200).reshape(-1, 1),
-)
-X_new = np.c_[x0.ravel(), x1.ravel()]
-
-y_proba = log_reg.predict_proba(X_new)
+#Instead of building a 500 x 200 meshgrid, gluing it together with np.c_ and calling predict_proba() on all 100,000
+#points, decision_surface() computes the probabilities straight from the model's coefficients: for a linear model the
+#grid of scores is just an outer sum of the two axes. x0 and x1 come back as 1-D axes, which plt.contour() accepts
+x0, x1, zz = decision_surface(log_reg, (2.9, 7), (0.8, 2.7), resolution=(500, 200))
 
 plt.figure(figsize=(10,4))
 plt.plot(X[y==0, 0], X[y==0, 1], "bs")
 plt.plot(X[y==1, 0], X[y==1, 1], "g^")
 
-zz = y_proba[:, 1].reshape(x0.shape)
-contour = plt.contour(x0, x1, zz, cmamp=plt.cm.brg)
+contour = plt.contour(x0, x1, zz, cmap=plt.cm.brg)
 
 left_right = np.array([2.9, 7])
 boundary = -(log_reg.coef_[0][0] * left_right + log_reg.intercept_[0]) / log_reg.coef_[0][1]
@@ -349,13 +354,37 @@ plt.show()
 X = iris["data"][:, (2, 3)] #petal length, petal width
 y = iris["target"]
 
-softmax_reg = LogisticRegression(multi_class="multinomial", solver="lbfgs", C=10)
+softmax_reg = LogisticRegression(solver="lbfgs", C=10) #Softmax (multinomial) is the default for lbfgs
 softmax_reg.fit(X, y)
 #The results show, for example, that an iris with 5 cm long and 2 cm wide petals is an Iris-Virginica, according to the
 #model (class 2)
 print(softmax_reg.predict([[5, 2]]))
 print(softmax_reg.predict_proba([[5, 2]]))
 
+#To serve the model without Scikit-Learn, export_logistic() saves coef_, intercept_ and classes_ to an .npz file and
+#LogisticPredictor computes the same (numerically stable, float32) probabilities with NumPy only (the file goes to a
+#temporary directory, not the working tree)
+softmax_path = os.path.join(tempfile.mkdtemp(), "softmax_reg.npz")
+export_logistic(softmax_reg, softmax_path)
+softmax_predictor = LogisticPredictor.load(softmax_path)
+print(softmax_predictor.predict_proba([[5, 2]]))
+
+#The same decision_surface() helper works for Softmax Regression (zz has one probability surface per class) and for
+#the SVM pipelines in Chapter 5 (non-linear models are only evaluated exactly near the decision boundary)
+x0, x1, zz = decision_surface(softmax_reg, (0, 8), (0, 3.5), resolution=(500, 200))
+plt.figure(figsize=(10, 4))
+plt.contourf(x0, x1, zz.argmax(axis=2), alpha=0.3)
+contour = plt.contour(x0, x1, zz[:, :, 1], cmap=plt.cm.brg)
+plt.clabel(contour, inline=1, fontsize=12)
+plt.plot(X[y==2, 0], X[y==2, 1], "g^", label="Iris-Virginica")
+plt.plot(X[y==1, 0], X[y==1, 1], "bs", label="Iris-Versicolor")
+plt.plot(X[y==0, 0], X[y==0, 1], "yo", label="Iris-Setosa")
+plt.xlabel("Petal length", fontsize=14)
+plt.ylabel("Petal width", fontsize=14)
+plt.legend(loc="center left", fontsize=14)
+plt.axis([0, 8, 0, 3.5])
+plt.show()
+
 #The figure on page 145 shows a detailed view of the output with Decision Boundaries (any two Decision Boundaries are
 #linear)
 
@@ -0,0 +1,73 @@
+import numpy as np
+
+#Lightweight inference for fitted LogisticRegression / Softmax Regression models
+#
+#softmax_reg.predict_proba([[5, 2]]) goes through Scikit-Learn's input validation on every call and serving it means
+#importing Scikit-Learn at startup. A fitted model is just theta (coef_), the bias terms (intercept_) and the class
+#labels, so export_logistic() saves those as plain arrays in an .npz file and LogisticPredictor computes the
+#probabilities with NumPy only (this module never imports Scikit-Learn):
+#   - binary:      p = sigma(x.theta + b), computed as exp(-log(1 + e^-z)) so large |z| can't overflow
+#   - multinomial: softmax with the largest score subtracted first (log-sum-exp trick), same reason
+#Batches are processed in float32 blocks of batch_size rows written into one preallocated output array.
+#tests/test_logistic_inference.py checks the probabilities against Scikit-Learn's
+
+#Saves a fitted LogisticRegression to an .npz file that LogisticPredictor.load() can read
+def export_logistic(model, path):
+    coef = np.asarray(model.coef_, dtype=np.float32)
+    if coef.shape[0] == 1:
+        link = "logistic"
+    elif getattr(model, "multi_class", None) == "ovr": #Older Scikit-Learn versions could fit one-versus-rest models
+        link = "ovr"
+    else:
+        link = "softmax"
+    np.savez(path, coef=coef, intercept=np.asarray(model.intercept_, dtype=np.float32),
+             classes=np.asarray(model.classes_), link=np.array(link))
+
+class LogisticPredictor:
+    def __init__(self, coef, intercept, classes, link="softmax", batch_size=65536):
+        self.coef_T = np.ascontiguousarray(np.asarray(coef, dtype=np.float32).T) #(n_features, n_scores)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.classes = np.asarray(classes)
+        self.link = str(link)
+        self.batch_size = batch_size
+
+    @classmethod
+    def load(cls, path, batch_size=65536):
+        with np.load(path, allow_pickle=False) as artifact:
+            return cls(artifact["coef"], artifact["intercept"], artifact["classes"], artifact["link"][()],
+                       batch_size=batch_size)
+
+    #Probabilities for one block of rows, computed in place in "out" (shape (n_rows, n_classes))
+    def _proba_block(self, X_block, out):
+        if self.link == "logistic":
+            z = X_block.dot(self.coef_T)[:, 0]
+            z += self.intercept[0]
+            np.logaddexp(0.0, -z, out=z)
+            np.negative(z, out=z)
+            np.exp(z, out=out[:, 1])
+            np.subtract(1.0, out[:, 1], out=out[:, 0])
+            return out
+        np.dot(X_block, self.coef_T, out=out)
+        out += self.intercept
+        if self.link == "ovr":
+            np.logaddexp(0.0, -out, out=out)
+            np.negative(out, out=out)
+            np.exp(out, out=out)
+        else:
+            out -= out.max(axis=1, keepdims=True)
+            np.exp(out, out=out)
+        out /= out.sum(axis=1, keepdims=True)
+        return out
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.empty((len(X), len(self.classes)), dtype=np.float32)
+        for start in range(0, len(X), self.batch_size):
+            stop = start + self.batch_size
+            self._proba_block(X[start:stop], proba[start:stop])
+        return proba
+
+    def predict(self, X):
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,109 @@
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+#PolynomialFeatures followed by StandardScaler in one transformer
+#
+#Pipeline([PolynomialFeatures(degree=90), StandardScaler()]) builds the whole dense power matrix and then a second,
+#scaled copy of it. This transformer builds each new column by multiplying a column of the previous degree by one input
+#feature (x^3 = x^2 * x, x0*x1^2 = x0*x1 * x1 etc.), so no power is ever recomputed from scratch. The work is done one
+#block of rows at a time inside a preallocated buffer and the scaling is applied as each block is written out
+#
+#The columns come out in the same order as PolynomialFeatures (degree by degree, lexicographic within a degree), so
+#this can be dropped into the "poly_scaler" Pipeline in place of the two steps (include_bias=True adds a column of ones
+#that is left unscaled)
+class PolynomialScaler(BaseEstimator, TransformerMixin):
+    def __init__(self, degree=2, include_bias=False, chunk_size=4096):
+        self.degree = degree
+        self.include_bias = include_bias
+        self.chunk_size = chunk_size
+
+    #Each output column is parent_column * X[:, feature] (parent -1 means the column is just X[:, feature])
+    #For every degree we only need the columns of the previous degree whose last feature is <= the new feature
+    def _build_plan(self, n_features):
+        parents, features = [], []
+        previous = [(-1, 0)] #(column index, last feature used) for the degree 0 "column"
+        for _ in range(self.degree):
+            current = []
+            for parent, last_feature in previous:
+                for feature in range(last_feature, n_features):
+                    current.append((len(parents), feature))
+                    parents.append(parent)
+                    features.append(feature)
+            previous = current
+        return np.array(parents, dtype=np.intp), np.array(features, dtype=np.intp)
+
+    #Raw (unscaled) polynomial features for one block of rows, written into "out"
+    def _expand(self, X_block, out):
+        start = 0
+        while start < len(self.parents_):
+            #Columns of the same degree only depend on columns of earlier degrees, so they can be done together
+            stop = start
+            while stop < len(self.parents_) and (self.parents_[stop] < start):
+                stop += 1
+            parents = self.parents_[start:stop]
+            features = self.features_[start:stop]
+            if parents[0] < 0:
+                out[:, start:stop] = X_block[:, features]
+            else:
+                np.multiply(out[:, parents], X_block[:, features], out=out[:, start:stop])
+            start = stop
+        return out
+
+    def _chunks(self, n_rows):
+        for start in range(0, n_rows, self.chunk_size):
+            yield start, min(start + self.chunk_size, n_rows)
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=np.float64)
+        self.n_features_in_ = X.shape[1]
+        self.parents_, self.features_ = self._build_plan(self.n_features_in_)
+        n_output = len(self.parents_)
+
+        #Mean and variance of every output column, merged block by block (Chan et al.) so the full expansion is never
+        #held in memory at once
+        buffer = np.empty((min(self.chunk_size, len(X)), n_output))
+        count, mean, m2 = 0, np.zeros(n_output), np.zeros(n_output)
+        for start, stop in self._chunks(len(X)):
+            block = self._expand(X[start:stop], buffer[:stop - start])
+            block_count = stop - start
+            block_mean = block.mean(axis=0)
+            block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+            delta = block_mean - mean
+            total = count + block_count
+            mean += delta * block_count / total
+            m2 += block_m2 + delta ** 2 * count * block_count / total
+            count = total
+
+        self.mean_ = mean
+        self.var_ = m2 / count
+        scale = np.sqrt(self.var_)
+        scale[scale == 0.0] = 1.0 #Same as StandardScaler: constant columns are left unscaled
+        self.scale_ = scale
+        self.n_output_features_ = n_output + (1 if self.include_bias else 0)
+        return self
+
+    #Polynomial features of one block of rows, scaled in place as they are written into "out"
+    def _transform_block(self, X_block, out):
+        offset = 1 if self.include_bias else 0
+        if self.include_bias:
+            out[:, 0] = 1.0
+        features = self._expand(X_block, out[:, offset:])
+        features -= self.mean_
+        features /= self.scale_
+        return out
+
+    #Lazy mode: yields (start, stop, block) with the scaled features of rows start:stop. The same buffer is reused for
+    #every block, so copy a block if you need to keep it after moving on to the next one (e.g. with
+    #SGDRegressor.partial_fit the block is consumed immediately and nothing needs to be copied)
+    def transform_chunks(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        buffer = np.empty((min(self.chunk_size, len(X)), self.n_output_features_))
+        for start, stop in self._chunks(len(X)):
+            yield start, stop, self._transform_block(X[start:stop], buffer[:stop - start])
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        X_out = np.empty((len(X), self.n_output_features_))
+        for start, stop in self._chunks(len(X)):
+            self._transform_block(X[start:stop], X_out[start:stop])
+        return X_out
@@ -0,0 +1,91 @@
+import numpy as np
+from sklearn.linear_model import enet_path
+from sklearn.model_selection import KFold
+
+#Regularization paths for Ridge, Lasso and Elastic Net
+#
+#Fitting Ridge(alpha=1), Lasso(alpha=0.1) and ElasticNet(alpha=0.1, l1_ratio=0.5) one at a time means refitting from
+#scratch for every alpha we want to try. Instead, we compute the whole path of solutions in one call:
+#   - Ridge: one SVD of the centered X, X = U Sigma V^T, gives the solution for every alpha at once:
+#            theta(alpha) = V diag(s / (s^2 + alpha)) U^T y
+#   - Lasso / Elastic Net: coordinate descent from the largest alpha down to the smallest, starting every fit from the
+#            previous solution (warm start), with X^T X and X^T y computed once and shared by every l1_ratio
+
+#Ridge solutions for every alpha, using the Ridge class's cost function ||y - X.theta||^2 + alpha * ||theta||^2
+#Returns coefs with shape (n_alphas, n_features) and intercepts with shape (n_alphas,)
+def ridge_path(X, y, alphas):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    alphas = np.asarray(alphas, dtype=np.float64)
+    X_mean, y_mean = X.mean(axis=0), y.mean()
+
+    U, s, Vt = np.linalg.svd(X - X_mean, full_matrices=False)
+    Uty = U.T.dot(y - y_mean)
+    d = s / (s**2 + alphas[:, np.newaxis]) #One row of shrunk inverse singular values per alpha
+    coefs = (d * Uty).dot(Vt)
+    intercepts = y_mean - coefs.dot(X_mean)
+    return coefs, intercepts
+
+#Elastic Net solutions for every alpha (sorted from largest to smallest), using the ElasticNet class's cost function
+#1/(2m) * ||y - X.theta||^2 + alpha * l1_ratio * ||theta||_1 + 0.5 * alpha * (1 - l1_ratio) * ||theta||^2
+#l1_ratio=1 is the Lasso. Gram and Xy can be passed in to share them between calls on the same (centered) data
+def elastic_net_path(X, y, alphas, l1_ratio=0.5, coef_init=None, Gram=None, Xy=None, max_iter=1000, tol=1e-4):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    alphas = np.sort(np.asarray(alphas, dtype=np.float64))[::-1]
+    X_mean, y_mean = X.mean(axis=0), y.mean()
+    X_centered = np.asfortranarray(X - X_mean)
+    y_centered = y - y_mean
+    if Gram is None:
+        Gram = X_centered.T.dot(X_centered)
+        Xy = X_centered.T.dot(y_centered)
+
+    _, coefs, _ = enet_path(X_centered, y_centered, l1_ratio=l1_ratio, alphas=alphas, precompute=Gram, Xy=Xy,
+                            coef_init=coef_init, max_iter=max_iter, tol=tol, check_input=False)
+    coefs = coefs.T #(n_alphas, n_features)
+    intercepts = y_mean - coefs.dot(X_mean)
+    return coefs, intercepts
+
+#Full path over a grid of alphas and l1_ratios, plus the cross-validation MSE of every (l1_ratio, alpha) pair, in one
+#call. Every row uses the ElasticNet cost function so alphas mean the same thing on every row -> the l1_ratio=0 row
+#(pure Ridge) is computed with the SVD shortcut using the equivalent Ridge alpha, m * alpha
+#
+#Returns (alphas, coefs, intercepts, cv_mse):
+#   alphas:     the alphas sorted from largest to smallest
+#   coefs:      shape (n_l1_ratios, n_alphas, n_features)
+#   intercepts: shape (n_l1_ratios, n_alphas)
+#   cv_mse:     shape (n_l1_ratios, n_alphas), mean squared validation error over the cv folds
+def regularization_path(X, y, alphas, l1_ratios=(0.0, 0.5, 1.0), cv=5, random_state=42, max_iter=1000, tol=1e-4):
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    alphas = np.sort(np.asarray(alphas, dtype=np.float64))[::-1]
+
+    def fit_all(X_part, y_part):
+        coefs = np.empty((len(l1_ratios), len(alphas), X.shape[1]))
+        intercepts = np.empty((len(l1_ratios), len(alphas)))
+        X_centered = np.asfortranarray(X_part - X_part.mean(axis=0))
+        Gram = X_centered.T.dot(X_centered)
+        Xy = X_centered.T.dot(y_part - y_part.mean())
+        coef_init = None
+        for i, l1_ratio in enumerate(l1_ratios):
+            if l1_ratio == 0:
+                coefs[i], intercepts[i] = ridge_path(X_part, y_part, alphas * len(X_part))
+            else:
+                coefs[i], intercepts[i] = elastic_net_path(X_part, y_part, alphas, l1_ratio=l1_ratio,
+                                                           coef_init=coef_init, Gram=Gram, Xy=Xy,
+                                                           max_iter=max_iter, tol=tol)
+                #Next l1_ratio starts from this one's largest-alpha solution. A copy: enet_path updates coef_init in
+                #place, which would overwrite coefs[i, 0]
+                coef_init = coefs[i, 0].copy()
+        return coefs, intercepts
+
+    squared_errors = np.zeros((len(l1_ratios), len(alphas)))
+    for train_index, val_index in KFold(n_splits=cv, shuffle=True, random_state=random_state).split(X):
+        coefs, intercepts = fit_all(X[train_index], y[train_index])
+        #Predictions for every (l1_ratio, alpha) pair at once: (n_l1_ratios, n_alphas, n_val)
+        y_val_predict = coefs.dot(X[val_index].T) + intercepts[:, :, np.newaxis]
+        squared_errors += ((y_val_predict - y[val_index]) ** 2).sum(axis=2)
+    cv_mse = squared_errors / len(X)
+
+    coefs, intercepts = fit_all(X, y)
+    return alphas, coefs, intercepts, cv_mse
@@ -0,0 +1,138 @@
+import time
+
+import numpy as np
+from sklearn import datasets
+from sklearn.datasets import make_moons
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.kernel_approximation import RBFSampler, Nystroem
+from sklearn.linear_model import SGDClassifier
+from sklearn.svm import SVC, LinearSVC
+
+#Approximate Gaussian RBF kernel for SVM classification
+#
+#rbf_kernel_svm_clf uses an exact SVC(kernel="rbf"), whose training time grows somewhere between m^2 and m^3 with the
+#number of instances m. Random Fourier features (Rahimi & Recht) map every instance to n_components features
+#sqrt(2/n_components) * cos(x.w + b), with w drawn from a Gaussian whose width depends on gamma, so that dot products of
+#the new features approximate the RBF kernel. A linear SVM trained on them behaves like the kernel SVM, but scales
+#linearly with m. Nystroem does the same thing with features built from a sample of the training instances
+#
+#The pipelines keep the same shape as rbf_kernel_svm_clf: "scaler" -> "rbf_map" -> "svm_clf"
+
+#RBFSampler that transforms its input in blocks of chunk_size rows, writing straight into one preallocated output
+#array (float32 by default to halve the memory), instead of creating full-size temporary arrays for the projection
+class ChunkedRBFSampler(RBFSampler):
+    def __init__(self, *, gamma=1.0, n_components=100, random_state=None, chunk_size=65536, dtype=np.float32):
+        super().__init__(gamma=gamma, n_components=n_components, random_state=random_state)
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+
+    def transform(self, X):
+        X = np.asarray(X)
+        if X.shape[1] != self.random_weights_.shape[0]:
+            raise ValueError("X has %d features, but ChunkedRBFSampler is expecting %d features as input"
+                             % (X.shape[1], self.random_weights_.shape[0]))
+        weights = self.random_weights_.astype(self.dtype, copy=False)
+        offset = self.random_offset_.astype(self.dtype, copy=False)
+        factor = self.dtype(np.sqrt(2.0 / self.n_components))
+        X_new = np.empty((len(X), self.n_components), dtype=self.dtype)
+        for start in range(0, len(X), self.chunk_size):
+            block = X_new[start:start + self.chunk_size]
+            np.dot(X[start:start + self.chunk_size].astype(self.dtype, copy=False), weights, out=block)
+            block += offset
+            np.cos(block, out=block)
+            block *= factor
+        return X_new
+
+#Drop-in replacement for rbf_kernel_svm_clf with an approximate kernel map ("rff" or "nystroem") and a LinearSVC
+def make_approx_rbf_svm(gamma=5, C=0.001, n_components=300, method="rff", random_state=42):
+    if method == "rff":
+        rbf_map = ChunkedRBFSampler(gamma=gamma, n_components=n_components, random_state=random_state)
+    elif method == "nystroem":
+        rbf_map = Nystroem(kernel="rbf", gamma=gamma, n_components=n_components, random_state=random_state)
+    else:
+        raise ValueError("method must be 'rff' or 'nystroem', got %r" % (method,))
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("rbf_map", rbf_map),
+        ("svm_clf", LinearSVC(C=C, loss="hinge")),
+    ])
+
+#Same pipeline, but with an SGDClassifier(loss="hinge", alpha=1/(m*C)) as the linear SVM (see the note at the top of
+#SMV_Iris.py) so it can be trained with fit_streaming() on data that doesn't fit in memory once mapped
+def make_streaming_rbf_svm(n_samples, gamma=5, C=0.001, n_components=300, random_state=42):
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("rbf_map", ChunkedRBFSampler(gamma=gamma, n_components=n_components, random_state=random_state)),
+        ("svm_clf", SGDClassifier(loss="hinge", alpha=1.0 / (n_samples * C), random_state=random_state)),
+    ])
+
+#Trains a "scaler" -> "rbf_map" -> linear classifier pipeline chunk_size rows at a time, so only one chunk of mapped
+#features exists at once: one pass to fit the scaler (StandardScaler.partial_fit), then n_epochs passes of
+#partial_fit() on the classifier. X can be a np.memmap for data that lives on disk
+def fit_streaming(pipeline, X, y, chunk_size=100000, n_epochs=5, random_state=42):
+    scaler = pipeline.named_steps["scaler"]
+    rbf_map = pipeline.named_steps["rbf_map"]
+    svm_clf = pipeline.steps[-1][1]
+    classes = np.unique(y)
+    starts = np.arange(0, len(X), chunk_size)
+
+    for start in starts:
+        scaler.partial_fit(X[start:start + chunk_size])
+    rbf_map.fit(scaler.transform(X[:min(chunk_size, len(X))]))
+
+    rnd = np.random.RandomState(random_state)
+    for _ in range(n_epochs):
+        for start in rnd.permutation(starts): #Visit the chunks in a different order on every epoch
+            X_mapped = rbf_map.transform(scaler.transform(X[start:start + chunk_size]))
+            svm_clf.partial_fit(X_mapped, y[start:start + chunk_size], classes=classes)
+    return pipeline
+
+#Accuracy vs. speed of the exact RBF SVC and the approximate modes on one dataset. The exact SVC is skipped above
+#exact_max_rows instances (it would take hours), and "rff+LinearSVC" above in_memory_max_rows (its mapped features
+#would have to fit in memory)
+def benchmark_rbf_modes(X_train, y_train, X_test, y_test, gamma=5, C=0.001, n_components=300, exact_max_rows=20000,
+                        in_memory_max_rows=200000, chunk_size=100000, n_epochs=5):
+    modes = [
+        ("exact SVC", lambda: Pipeline([("scaler", StandardScaler()), ("svm_clf", SVC(kernel="rbf", gamma=gamma, C=C))]),
+         exact_max_rows),
+        ("rff+LinearSVC", lambda: make_approx_rbf_svm(gamma, C, n_components, "rff"), in_memory_max_rows),
+        ("nystroem+LinearSVC", lambda: make_approx_rbf_svm(gamma, C, n_components, "nystroem"), in_memory_max_rows),
+        ("rff+SGD streaming", lambda: make_streaming_rbf_svm(len(X_train), gamma, C, n_components), None),
+    ]
+    results = []
+    for name, make_model, max_rows in modes:
+        row = {"mode": name, "n_samples": len(X_train)}
+        if max_rows is not None and len(X_train) > max_rows:
+            row.update(fit_seconds=None, predict_seconds=None, accuracy=None)
+            results.append(row)
+            continue
+        model = make_model()
+        start = time.perf_counter()
+        if name.endswith("streaming"):
+            fit_streaming(model, X_train, y_train, chunk_size=chunk_size, n_epochs=n_epochs)
+        else:
+            model.fit(X_train, y_train)
+        row["fit_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        row["predict_seconds"] = time.perf_counter() - start
+        row["accuracy"] = float((y_pred == y_test).mean())
+        results.append(row)
+    return results
+
+if __name__ == "__main__":
+    #Iris (petal length/width, Iris-Virginica or not), same data as SMV_Iris.py. With rbf_kernel_svm_clf's C=0.001
+    #every model just predicts "not Iris-Virginica", so C=1 is used here to get a meaningful comparison
+    iris = datasets.load_iris()
+    X = iris["data"][:, (2, 3)]
+    y = (iris["target"] == 2).astype(np.float64)
+    for row in benchmark_rbf_modes(X, y, X, y, C=1, n_components=100, chunk_size=50):
+        print("iris", row)
+
+    #Moons: 20,000 instances (the exact SVC can still be trained, for reference) and 1 million instances
+    X_test, y_test = make_moons(n_samples=100000, noise=0.15, random_state=43)
+    for n_samples in (20000, 1000000):
+        X, y = make_moons(n_samples=n_samples, noise=0.15, random_state=42)
+        for row in benchmark_rbf_modes(X, y, X_test, y_test):
+            print("moons", row)
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import numpy as np
 from sklearn import datasets
 from sklearn.pipeline import Pipeline
@@ -6,6 +8,11 @@ from sklearn.svm import LinearSVC, LinearSVR
 from sklearn.datasets import make_moons
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.svm import SVC, SVR
+from sklearn.kernel_approximation import Nystroem
+from SVM_Cache import SVCGridTrainer
+from Kernel_Approximation import make_approx_rbf_svm
+from SVM_Sweep import svm_sweep
+from SVM_Export import export_svm, SVMPredictor
 
 #This code loads the Iris dataset, scales the features and then trains a linear SVM (Using the LinearSVM class with
 #C = 1 and the hinge loss function) to detect the Iris-Virginica flowers
@@ -62,6 +69,17 @@ poly_kernal_clf = Pipeline([
 #Train the model
 poly_kernal_clf.fit(X, y)
 
+#When there are too many instances for SVC (the kernel matrix grows with m^2), the polynomial kernel can be
+#approximated with a Nystroem map instead: it builds n_components features whose dot products approximate the kernel,
+#so a LinearSVC can be trained on them without the combinatorial explosion of PolynomialFeatures
+poly_nystroem_clf = Pipeline([
+    ("scaler", StandardScaler()),
+    ("poly_map", Nystroem(kernel="poly", degree=3, coef0=1, n_components=100, random_state=42)),
+    ("svm_clf", LinearSVC(C=5, loss="hinge"))
+])
+
+poly_nystroem_clf.fit(X, y)
+
 #This code section above train an SVM classifier using a 3rd degree polynomial kernel (there is also an SVM classifier
 #using a 10th degree polynomial kernel on page 153).
 #   If the model is overfitting: reduce the polynomial degree
@@ -84,6 +102,22 @@ rbf_kernel_svm_clf = Pipeline([
 #Train the model
 rbf_kernel_svm_clf.fit(X, y)
 
+#Approximate version of the same model: random Fourier features make the dot products of the new features approximate
+#the RBF kernel, so a LinearSVC can be used -> training time grows linearly with the number of instances instead of
+#quadratically. Same Pipeline shape ("scaler" -> "rbf_map" -> "svm_clf"); for data that doesn't fit in memory,
+#make_streaming_rbf_svm() + fit_streaming() train it chunk by chunk (see Kernel_Approximation.py for benchmarks)
+rbf_approx_svm_clf = make_approx_rbf_svm(gamma=5, C=0.001, n_components=100, method="rff")
+rbf_approx_svm_clf.fit(X, y)
+
+#To tune C for a given gamma, SVCGridTrainer computes the kernel (Gram) matrix once per gamma/degree and trains
+#SVC(kernel="precomputed") on it for every C, instead of letting every SVC recompute the kernel values from scratch.
+#When the Gram matrix is too big to keep, it falls back to a normal SVC with cache_size sized from the available memory
+rbf_trainer = SVCGridTrainer(kernel="rbf", Cs=[0.001, 0.01, 0.1, 1, 10], gammas=[0.1, 1, 5])
+for row in rbf_trainer.fit_grid(StandardScaler().fit_transform(X), y):
+    print(row)
+print(rbf_trainer.report()) #Cache hit rate, total kernel and fit times
+print(rbf_trainer.best_params_)
+
 #Some notes from page 155:
 #   Increasing gamma makes the bell-shape barrower and as a result each instance's range of influences is smaller -->
 #   the decision boundary ends up being more irregular, wiggling around individual instances
@@ -106,6 +140,22 @@ svm_poly_reg = SVR(kernel="poly", degree=2, C=100, epsilon=0.1)
 #Train the model
 svm_poly_reg.fit(X, y)
 
+#svm_sweep() fits all of the models above for a grid of hyperparameters (C, gamma, degree, epsilon) at once: X is
+#scaled a single time, shared read-only with a pool of worker processes, and every combination is fit concurrently.
+#The result is a table of fit times and validation scores
+sweep_results = svm_sweep(X, y, n_jobs=-1)
+print(sweep_results)
+print("Sweep wall time:", sweep_results.attrs["wall_seconds"], "Sum of fit times:", sweep_results["fit_seconds"].sum())
+
+#For serving, export_svm() writes the scaler's mean/scale, the support vectors, their dual coefficients and the kernel
+#parameters to a small .npz file, and SVMPredictor evaluates whole batches from it with NumPy (no unpickling of
+#Scikit-Learn objects). prune_tol/merge_radius drop or merge near-duplicate support vectors for faster predictions.
+#The file goes to a temporary directory, not the working tree
+poly_kernel_path = os.path.join(tempfile.mkdtemp(), "poly_kernal_clf.npz")
+export_svm(poly_kernal_clf, poly_kernel_path)
+poly_kernel_predictor = SVMPredictor.load(poly_kernel_path)
+print(poly_kernel_predictor.predict([[5.5, 1.7]]), poly_kernal_clf.predict([[5.5, 1.7]]))
+
 #Chapter Five Summary:
 
 #A Support Vector Machine (SVM) is capable of linear and nonlinear classification, regression and even outlier detection
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import multiprocessing
+
+import numpy as np
+from sklearn import datasets
+from sklearn.datasets import make_moons
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, PolynomialFeatures
+from sklearn.svm import LinearSVC, LinearSVR, SVC, SVR
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import common
+from common import peak_rss_bytes, environment
+
+#Scaling benchmark for the Chapter 5 SVM pipelines
+#
+#SMV_Iris.py only ever trains on the 150 Iris instances, so it says nothing about how the pipelines scale. This script
+#generates moons and Iris-like data from 1,000 to 1,000,000 instances, and for each of the six pipelines records:
+#   - fit and predict time (and predictions per second)
+#   - peak memory: NumPy/Python allocations seen by tracemalloc and the peak RSS of the process, which also includes
+#     libsvm's own allocations (kernel cache etc.). Every case runs in a fresh process so the peaks don't carry over
+#   - training accuracy (R^2 for the regressors)
+#Results are written as JSON (by default to benchmarks/results/svm_benchmark_results.json, which git ignores) and
+#compared against the stored baseline, svm_benchmark_baseline.json (1,000 and 10,000 instances, recorded on the
+#machine in its "environment"), to flag regressions. Cases that aren't in the baseline are not compared.
+#Record a new one when the machine or the pipelines change:
+#
+#   python SVM_Benchmark.py --sizes 1000 10000
+#   python SVM_Benchmark.py --sizes 1000 10000 --output svm_benchmark_baseline.json --no-baseline   (new baseline)
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "svm_benchmark_baseline.json")
+RESULTS_PATH = os.path.join(common.REPO_ROOT, "benchmarks", "results", "svm_benchmark_results.json")
+
+#The pipelines from SMV_Iris.py. max_rows is where a pipeline stops being worth timing: the kernel SVMs (SVC/SVR) take
+#somewhere between m^2 and m^3 time, so they are skipped above it instead of running for hours
+PIPELINES = {
+    "linear": (lambda: Pipeline([
+        ("scaler", StandardScaler()),
+        ("linear_svm", LinearSVC(C=1, loss="hinge")),
+    ]), None),
+    "polynomial_features": (lambda: Pipeline([
+        ("poly_features", PolynomialFeatures(degree=3)),
+        ("scaler", StandardScaler()),
+        ("svm_clf", LinearSVC(C=10, loss="hinge")),
+    ]), None),
+    "poly_kernel": (lambda: Pipeline([
+        ("scaler", StandardScaler()),
+        ("svm_clf", SVC(kernel="poly", degree=3, coef0=1, C=5)),
+    ]), 20000),
+    "rbf": (lambda: Pipeline([
+        ("scaler", StandardScaler()),
+        ("svm_clf", SVC(kernel="rbf", gamma=5, C=0.001)),
+    ]), 20000),
+    "linear_svr": (lambda: LinearSVR(epsilon=1.5), None),
+    "svr": (lambda: SVR(kernel="poly", degree=2, C=100, epsilon=0.1), 5000),
+}
+
+#Iris-like data: instances drawn from a Gaussian fitted to each Iris class (petal length and width, like
+#SMV_Iris.py), labelled 1 for Iris-Virginica and 0 otherwise
+def make_iris_like(n_samples, random_state=42):
+    iris = datasets.load_iris()
+    X_iris = iris["data"][:, (2, 3)]
+    rnd = np.random.RandomState(random_state)
+    labels = rnd.randint(0, 3, size=n_samples)
+    X = np.empty((n_samples, 2))
+    for label in range(3):
+        rows = labels == label
+        X_class = X_iris[iris["target"] == label]
+        X[rows] = rnd.multivariate_normal(X_class.mean(axis=0), np.cov(X_class.T), size=rows.sum())
+    return X, (labels == 2).astype(np.float64)
+
+def make_data(dataset, n_samples, random_state=42):
+    if dataset == "moons":
+        X, y = make_moons(n_samples=n_samples, noise=0.15, random_state=random_state)
+        return X, y.astype(np.float64)
+    if dataset == "iris":
+        return make_iris_like(n_samples, random_state)
+    raise ValueError("Unknown dataset %r" % (dataset,))
+
+def run_case(case):
+    dataset, n_samples, name = case
+    make_model, max_rows = PIPELINES[name]
+    row = {"dataset": dataset, "n_samples": n_samples, "pipeline": name}
+    if max_rows is not None and n_samples > max_rows:
+        row["skipped"] = True
+        return row
+
+    X, y = make_data(dataset, n_samples)
+    model = make_model()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model.fit(X, y)
+    row["fit_seconds"] = time.perf_counter() - start
+    _, row["fit_peak_traced_bytes"] = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    y_pred = model.predict(X)
+    row["predict_seconds"] = time.perf_counter() - start
+    _, row["predict_peak_traced_bytes"] = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    row["predict_rows_per_second"] = n_samples / row["predict_seconds"] if row["predict_seconds"] > 0 else None
+    row["peak_rss_bytes"] = peak_rss_bytes()
+    if hasattr(model, "classes_"):
+        row["score"] = float((y_pred == y).mean())
+    else:
+        row["score"] = float(1 - ((y - y_pred) ** 2).sum() / ((y - y.mean()) ** 2).sum())
+    row["skipped"] = False
+    return row
+
+#Runs every (dataset, size, pipeline) case, each in its own process when isolate=True
+def run_benchmarks(sizes=DEFAULT_SIZES, dataset_names=("moons", "iris"), pipeline_names=None, isolate=True):
+    pipeline_names = list(PIPELINES) if pipeline_names is None else pipeline_names
+    cases = [(dataset, n_samples, name) for dataset in dataset_names for n_samples in sizes
+             for name in pipeline_names]
+    if not isolate:
+        return [run_case(case) for case in cases]
+    with multiprocessing.get_context("spawn").Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.map(run_case, cases, chunksize=1)
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as output:
+        json.dump({"environment": environment(), "results": results}, output, indent=2)
+
+#Flags every case that got slower or used more memory than the baseline by more than the tolerance (a ratio: 0.25
+#means 25% worse). Times below min_seconds are too noisy to compare and are ignored
+def compare_to_baseline(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, min_seconds=0.05):
+    metrics = [("fit_seconds", time_tolerance), ("predict_seconds", time_tolerance),
+               ("fit_peak_traced_bytes", memory_tolerance), ("peak_rss_bytes", memory_tolerance)]
+    return common.compare_to_baseline(results, baseline, ("dataset", "n_samples", "pipeline"), metrics, min_seconds)
+
+def print_results(results):
+    print("%-8s %9s %-20s %10s %10s %12s %12s %7s" % ("dataset", "n", "pipeline", "fit (s)", "predict (s)",
+                                                       "traced MB", "peak RSS MB", "score"))
+    for row in results:
+        if row["skipped"]:
+            print("%-8s %9d %-20s %10s" % (row["dataset"], row["n_samples"], row["pipeline"], "skipped"))
+            continue
+        rss = row["peak_rss_bytes"] / 1024**2 if row["peak_rss_bytes"] else float("nan")
+        print("%-8s %9d %-20s %10.3f %10.3f %12.1f %12.1f %7.3f" % (
+            row["dataset"], row["n_samples"], row["pipeline"], row["fit_seconds"], row["predict_seconds"],
+            row["fit_peak_traced_bytes"] / 1024**2, rss, row["score"]))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the Chapter 5 SVM pipelines on growing datasets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--datasets", nargs="+", default=["moons", "iris"], choices=["moons", "iris"])
+    parser.add_argument("--pipelines", nargs="+", default=list(PIPELINES), choices=list(PIPELINES))
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON results to compare against")
+    parser.add_argument("--no-baseline", action="store_true", help="Don't compare against a baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--no-isolate", action="store_true", help="Run every case in this process (faster, but "
+                                                                  "peak RSS then accumulates across cases)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.datasets, args.pipelines, isolate=not args.no_isolate)
+    print_results(results)
+    write_results(results, args.output)
+    print("Results written to", args.output)
+
+    if not args.no_baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_to_baseline(results, baseline, args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION: %(dataset)s n=%(n_samples)d %(pipeline)s %(metric)s %(baseline).4g -> %(current).4g "
+                  "(x%(ratio).2f)" % regression)
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
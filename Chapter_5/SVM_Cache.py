@@ -0,0 +1,210 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.metrics.pairwise import pairwise_kernels
+
+#Kernel cache and Gram matrix reuse for SVC
+#
+#Training an SVC with a kernel spends most of its time computing kernel values K(x_i, x_j). Scikit-Learn's SVC keeps a
+#cache of kernel rows whose size is cache_size (in MB, 200 by default), no matter how much memory the machine has, and
+#every fit starts with an empty cache. When we try several values of C for the same kernel (same gamma/degree/coef0)
+#the kernel matrix doesn't change at all, so here we:
+#   1.) Compute the whole Gram matrix once per kernel and train SVC(kernel="precomputed") on it for every C
+#   2.) Fall back to the normal SVC, with cache_size sized from the memory that is actually available, when the Gram
+#       matrix would be too big to keep
+#   3.) Report fit times and how often a Gram matrix came from the cache
+
+#Memory the OS says is available for new allocations, in bytes (None if it can't be determined)
+def available_memory_bytes():
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+#cache_size (MB) for SVC: enough for the full kernel matrix (libsvm stores it as float32) if memory allows, otherwise
+#memory_fraction of the available memory, and never less than Scikit-Learn's default of 200 MB
+def kernel_cache_size_mb(n_samples, memory_fraction=0.25, minimum_mb=200):
+    needed_mb = n_samples * n_samples * 4 / 1024**2
+    available = available_memory_bytes()
+    if available is None:
+        return max(minimum_mb, min(needed_mb, 1024))
+    return max(minimum_mb, min(needed_mb, memory_fraction * available / 1024**2))
+
+#gamma="scale" and gamma="auto" resolved the same way SVC does
+def resolve_gamma(gamma, X):
+    if gamma == "scale":
+        variance = X.var()
+        return 1.0 / (X.shape[1] * variance) if variance != 0 else 1.0
+    if gamma == "auto":
+        return 1.0 / X.shape[1]
+    return float(gamma)
+
+#Least-recently-used store of kernel matrices, keyed by the data they were computed from and the kernel parameters.
+#Keeps at most max_bytes worth of matrices and counts hits and misses. Pinned matrices are never evicted
+class GramCache:
+    def __init__(self, max_bytes=None, memory_fraction=0.25):
+        if max_bytes is None:
+            available = available_memory_bytes()
+            max_bytes = int(memory_fraction * available) if available is not None else 1024**3
+        self.max_bytes = max_bytes
+        self.matrices = OrderedDict()
+        self.pinned = set()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.compute_seconds = 0.0
+
+    #Hashes all of X: O(n_samples * n_features), so compute it once per matrix and build the keys with key()
+    @staticmethod
+    def fingerprint(X):
+        X = np.ascontiguousarray(X)
+        return X.shape, hashlib.blake2b(X.view(np.uint8), digest_size=16).hexdigest()
+
+    @staticmethod
+    def key(X_fingerprint, Y_fingerprint, kernel, **params):
+        return X_fingerprint, Y_fingerprint, kernel, tuple(sorted(params.items()))
+
+    #Kernel matrix between X and Y (None: X itself) and whether it was cached. key: from key(), to skip hashing X and Y
+    #again. pin=True keeps the matrix in the cache until unpin(key)
+    def get(self, X, Y, kernel, key=None, pin=False, **params):
+        if key is None:
+            key = self.key(self.fingerprint(X), None if Y is None else self.fingerprint(Y), kernel, **params)
+        if key in self.matrices:
+            self.hits += 1
+            self.matrices.move_to_end(key)
+            if pin:
+                self.pinned.add(key)
+            return self.matrices[key], True
+
+        self.misses += 1
+        start = time.perf_counter()
+        gram = pairwise_kernels(X, Y, metric=kernel, **params)
+        self.compute_seconds += time.perf_counter() - start
+        pinned_bytes = sum(self.matrices[k].nbytes for k in self.pinned if k in self.matrices)
+        if gram.nbytes <= self.max_bytes - pinned_bytes:
+            for old_key in [k for k in self.matrices if k not in self.pinned]: #Least recently used first
+                if self.n_bytes + gram.nbytes <= self.max_bytes:
+                    break
+                self.n_bytes -= self.matrices.pop(old_key).nbytes
+            self.matrices[key] = gram
+            self.n_bytes += gram.nbytes
+            if pin:
+                self.pinned.add(key)
+        return gram, False
+
+    def unpin(self, key):
+        self.pinned.discard(key)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+#Trains SVC for every combination of C, gamma and degree, reusing one Gram matrix for all the C values of each kernel.
+#fit_grid() returns one dict per model with its parameters, fit time, whether the Gram matrix was a cache hit, the
+#number of support vectors and its accuracy (on X_val/y_val if given, otherwise on the training set). The best model is
+#kept in best_params_/best_estimator_ and can be used through predict()
+class SVCGridTrainer:
+    def __init__(self, kernel="rbf", Cs=(1.0,), gammas=("scale",), degrees=(3,), coef0=0.0, shrinking=True,
+                 tol=1e-3, memory_fraction=0.25, cache=None):
+        self.kernel = kernel
+        self.Cs = Cs
+        self.gammas = gammas
+        self.degrees = degrees if kernel == "poly" else (3,) #degree only matters for the polynomial kernel
+        self.coef0 = coef0
+        self.shrinking = shrinking
+        self.tol = tol
+        self.memory_fraction = memory_fraction
+        self.cache = cache if cache is not None else GramCache(memory_fraction=memory_fraction)
+
+    def _kernel_params(self, gamma, degree):
+        if self.kernel == "rbf":
+            return {"gamma": gamma}
+        if self.kernel == "poly":
+            return {"gamma": gamma, "degree": degree, "coef0": self.coef0}
+        if self.kernel == "sigmoid":
+            return {"gamma": gamma, "coef0": self.coef0}
+        return {}
+
+    def fit_grid(self, X, y, X_val=None, y_val=None):
+        X = np.asarray(X, dtype=np.float64)
+        X_score, y_score = (X, y) if X_val is None else (np.asarray(X_val, dtype=np.float64), y_val)
+        precompute = X.shape[0] ** 2 * 8 <= self.cache.max_bytes
+        cache_size = kernel_cache_size_mb(len(X), self.memory_fraction)
+
+        self.results_ = []
+        best_score = -np.inf
+        #X and X_val are hashed once for the whole grid, not on every lookup
+        X_fingerprint = self.cache.fingerprint(X) if precompute else None
+        score_fingerprint = self.cache.fingerprint(X_score) if precompute and X_val is not None else None
+        for gamma in self.gammas:
+            for degree in self.degrees:
+                kernel_params = self._kernel_params(resolve_gamma(gamma, X), degree)
+                train_key = self.cache.key(X_fingerprint, None, self.kernel, **kernel_params)
+                score_key = self.cache.key(score_fingerprint, X_fingerprint, self.kernel, **kernel_params)
+                try:
+                    for C in self.Cs:
+                        svm_clf, cache_hit, fit_seconds, score = self._fit_one(
+                            X, y, X_score, y_score, C, kernel_params, precompute, cache_size, train_key,
+                            score_key if X_val is not None else None)
+                        self.results_.append({"kernel": self.kernel, "C": C, "gamma": gamma, "degree": degree,
+                                              "precomputed": precompute, "cache_hit": cache_hit,
+                                              "fit_seconds": fit_seconds, "n_support": int(svm_clf.n_support_.sum()),
+                                              "score": score})
+                        if score > best_score:
+                            best_score = score
+                            self.best_params_ = {"C": C, "gamma": gamma, "degree": degree}
+                            self.best_estimator_ = svm_clf
+                            self._best_kernel_params = kernel_params
+                finally:
+                    self.cache.unpin(train_key)
+
+        self.X_train_ = X
+        self.precomputed_ = precompute
+        return self.results_
+
+    #Trains one model. The training Gram matrix is pinned while its C values are trained, so the validation matrix
+    #(which goes through the same cache) can't evict it halfway through
+    def _fit_one(self, X, y, X_score, y_score, C, kernel_params, precompute, cache_size, train_key, score_key):
+        if precompute:
+            #Only the first C for each kernel computes the Gram matrix, the others are cache hits
+            gram, cache_hit = self.cache.get(X, None, self.kernel, key=train_key, pin=True, **kernel_params)
+            gram_score = gram
+            if score_key is not None:
+                gram_score = self.cache.get(X_score, X, self.kernel, key=score_key, **kernel_params)[0]
+            svm_clf = SVC(kernel="precomputed", C=C, shrinking=self.shrinking, tol=self.tol)
+            start = time.perf_counter()
+            svm_clf.fit(gram, y)
+            fit_seconds = time.perf_counter() - start
+            score = svm_clf.score(gram_score, y_score)
+        else:
+            svm_clf = SVC(kernel=self.kernel, C=C, shrinking=self.shrinking, tol=self.tol, cache_size=cache_size,
+                          **kernel_params)
+            start = time.perf_counter()
+            svm_clf.fit(X, y)
+            fit_seconds = time.perf_counter() - start
+            cache_hit = False
+            score = svm_clf.score(X_score, y_score)
+        return svm_clf, cache_hit, fit_seconds, score
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if not self.precomputed_:
+            return self.best_estimator_.predict(X)
+        return self.best_estimator_.predict(pairwise_kernels(X, self.X_train_, metric=self.kernel,
+                                                             **self._best_kernel_params))
+
+    def report(self):
+        return {"n_models": len(self.results_), "cache_hits": self.cache.hits, "cache_misses": self.cache.misses,
+                "cache_hit_rate": self.cache.hit_rate(), "kernel_seconds": self.cache.compute_seconds,
+                "fit_seconds": sum(row["fit_seconds"] for row in self.results_)}
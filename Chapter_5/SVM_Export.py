@@ -0,0 +1,253 @@
+import numpy as np
+
+#Compact export of trained SVM pipelines and a NumPy-only predictor
+#
+#A trained kernel SVM is fully described by its support vectors, their dual coefficients (alpha_i * y_i), the
+#intercept and the kernel parameters; the StandardScaler in front of it by its mean_ and scale_. export_svm() writes
+#exactly those arrays to a compressed .npz file, and SVMPredictor evaluates the decision function for whole batches
+#with a few matrix products:
+#   decision(x) = sum_i dual_coef_i * K(sv_i, (x - mean) / scale) + intercept
+#
+#Optionally the support vectors can be thinned out before export to make predictions cheaper, at a small cost in
+#accuracy:
+#   - prune_tol:    drop support vectors whose |dual coefficient| is below prune_tol * the largest one
+#   - merge_radius: support vectors (of the same class) closer than merge_radius to each other, in scaled space, are
+#                   replaced by their |alpha|-weighted average with the sum of their dual coefficients
+#
+#Works for SVC (binary and one-versus-one multiclass) and SVR, alone or at the end of a Pipeline whose other steps are
+#StandardScalers. This module does not import Scikit-Learn
+
+def _unwrap(model):
+    steps = getattr(model, "steps", None)
+    if steps is None:
+        return [], model
+    return [step for _, step in steps[:-1] if step is not None and step != "passthrough"], steps[-1][1]
+
+#Folds any StandardScaler steps into one (mean, scale) pair: ((x - m1)/s1 - m2)/s2 = (x - (m1 + m2*s1)) / (s1*s2)
+def _scaler_params(transformers, n_features):
+    mean, scale = np.zeros(n_features), np.ones(n_features)
+    for transformer in transformers:
+        if not (hasattr(transformer, "mean_") and hasattr(transformer, "scale_")):
+            raise ValueError("Only StandardScaler steps can be exported in front of the SVM, got %r" % (transformer,))
+        step_mean = transformer.mean_ if transformer.with_mean else 0.0
+        step_scale = transformer.scale_ if transformer.with_std else 1.0
+        mean = mean + step_mean * scale
+        scale = scale * step_scale
+    return mean, scale
+
+#Groups of support vectors (as index arrays) that may be merged together: one group per class for classifiers, one per
+#sign of the dual coefficient for SVR
+def _support_groups(dual_coef, n_support):
+    if n_support is None:
+        signs = np.sign(dual_coef[0])
+        return [np.flatnonzero(signs == sign) for sign in (-1, 1)]
+    bounds = np.r_[0, np.cumsum(n_support)]
+    return [np.arange(bounds[k], bounds[k + 1]) for k in range(len(n_support))]
+
+def _merge_group(support_vectors, dual_coef, merge_radius):
+    weights = np.abs(dual_coef).sum(axis=0)
+    unassigned = np.ones(len(support_vectors), dtype=bool)
+    merged_vectors, merged_coef = [], []
+    for i in np.argsort(-weights): #Largest coefficients become the cluster centers
+        if not unassigned[i]:
+            continue
+        distances = np.sqrt(((support_vectors - support_vectors[i]) ** 2).sum(axis=1))
+        members = np.flatnonzero(unassigned & (distances <= merge_radius))
+        unassigned[members] = False
+        member_weights = weights[members]
+        if member_weights.sum() > 0:
+            merged_vectors.append(np.average(support_vectors[members], axis=0, weights=member_weights))
+        else:
+            merged_vectors.append(support_vectors[members].mean(axis=0))
+        merged_coef.append(dual_coef[:, members].sum(axis=1))
+    return np.array(merged_vectors).reshape(-1, support_vectors.shape[1]), np.array(merged_coef).T
+
+def compress_support_vectors(support_vectors, dual_coef, n_support=None, prune_tol=None, merge_radius=None):
+    kept_vectors, kept_coef, kept_counts = [], [], []
+    largest = np.abs(dual_coef).max() if dual_coef.size else 0.0
+    for group in _support_groups(dual_coef, n_support):
+        vectors, coef = support_vectors[group], dual_coef[:, group]
+        if prune_tol is not None and len(group):
+            keep = np.abs(coef).max(axis=0) >= prune_tol * largest
+            vectors, coef = vectors[keep], coef[:, keep]
+        if merge_radius is not None and len(vectors):
+            vectors, coef = _merge_group(vectors, coef, merge_radius)
+        kept_vectors.append(vectors)
+        kept_coef.append(coef.reshape(dual_coef.shape[0], -1))
+        kept_counts.append(len(vectors))
+    return np.vstack(kept_vectors), np.hstack(kept_coef), np.array(kept_counts, dtype=np.int32)
+
+#Writes the scaler parameters, support vectors, dual coefficients and kernel parameters of a fitted SVC/SVR (or a
+#StandardScaler -> SVC/SVR Pipeline) to "path" (.npz)
+def export_svm(model, path, prune_tol=None, merge_radius=None, dtype=np.float32):
+    transformers, svm = _unwrap(model)
+    support_vectors = np.asarray(svm.support_vectors_, dtype=np.float64)
+    dual_coef = np.asarray(svm.dual_coef_, dtype=np.float64)
+    mean, scale = _scaler_params(transformers, support_vectors.shape[1])
+
+    is_classifier = hasattr(svm, "classes_")
+    n_support = np.asarray(svm.n_support_) if is_classifier else None
+    if prune_tol is not None or merge_radius is not None:
+        support_vectors, dual_coef, counts = compress_support_vectors(support_vectors, dual_coef, n_support,
+                                                                      prune_tol, merge_radius)
+        if is_classifier:
+            n_support = counts
+
+    gamma = getattr(svm, "_gamma", svm.gamma) #SVC stores the value actually used for gamma="scale"/"auto" in _gamma
+    np.savez_compressed(
+        path,
+        mean=mean.astype(dtype), scale=scale.astype(dtype),
+        support_vectors=support_vectors.astype(dtype), dual_coef=dual_coef.astype(dtype),
+        intercept=np.asarray(svm.intercept_, dtype=np.float64),
+        n_support=np.asarray(n_support if is_classifier else [len(support_vectors)], dtype=np.int32),
+        classes=np.asarray(svm.classes_) if is_classifier else np.array([]),
+        kernel=np.array(svm.kernel), gamma=np.float64(gamma), degree=np.int32(svm.degree),
+        coef0=np.float64(svm.coef0), is_classifier=np.bool_(is_classifier),
+    )
+
+class SVMPredictor:
+    def __init__(self, mean, scale, support_vectors, dual_coef, intercept, n_support, classes, kernel, gamma, degree,
+                 coef0, is_classifier, batch_size=4096):
+        #The artifact may store float32 to stay small; compute in float64, converted once here rather than per batch
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.support_vectors = np.asarray(support_vectors, dtype=np.float64)
+        self.support_vectors_T = np.ascontiguousarray(self.support_vectors.T)
+        self.dual_coef = np.asarray(dual_coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        self.n_support = n_support
+        self.classes = classes
+        self.kernel = str(kernel)
+        self.gamma = float(gamma)
+        self.degree = int(degree)
+        self.coef0 = float(coef0)
+        self.is_classifier = bool(is_classifier)
+        self.batch_size = batch_size
+        self.sv_squared_norms = (self.support_vectors ** 2).sum(axis=1)
+        bounds = np.r_[0, np.cumsum(n_support)]
+        self.class_slices = [slice(bounds[k], bounds[k + 1]) for k in range(len(n_support))]
+
+    @classmethod
+    def load(cls, path, batch_size=4096):
+        with np.load(path, allow_pickle=False) as artifact:
+            params = {name: artifact[name] for name in artifact.files}
+        for name in ("kernel", "gamma", "degree", "coef0", "is_classifier"):
+            params[name] = params[name][()]
+        return cls(batch_size=batch_size, **params)
+
+    def number_of_support_vectors(self):
+        return len(self.support_vectors)
+
+    #K(x, sv) for every row of X_scaled and every support vector: shape (n_rows, n_support_vectors)
+    def _kernel(self, X_scaled):
+        products = X_scaled.dot(self.support_vectors_T)
+        if self.kernel == "linear":
+            return products
+        if self.kernel == "poly":
+            products *= self.gamma
+            products += self.coef0
+            return products ** self.degree
+        if self.kernel == "rbf":
+            #||x - sv||^2 = ||x||^2 - 2 x.sv + ||sv||^2
+            products *= -2.0
+            products += (X_scaled ** 2).sum(axis=1)[:, np.newaxis]
+            products += self.sv_squared_norms
+            np.maximum(products, 0.0, out=products)
+            products *= -self.gamma
+            return np.exp(products, out=products)
+        if self.kernel == "sigmoid":
+            products *= self.gamma
+            products += self.coef0
+            return np.tanh(products, out=products)
+        raise ValueError("Unsupported kernel %r" % (self.kernel,))
+
+    #Raw decision values of one batch: (n_rows,) for binary SVC and SVR, (n_rows, n_pairs) for multiclass SVC
+    def _decision_block(self, X_block):
+        X_scaled = (np.asarray(X_block, dtype=np.float64) - self.mean) / self.scale
+        K = self._kernel(X_scaled)
+        if not self.is_classifier or len(self.classes) == 2:
+            return K.dot(self.dual_coef[0]) + self.intercept[0]
+
+        #One-versus-one: the decision for the pair (i, j) uses the support vectors of classes i and j, with the
+        #coefficients libsvm stores in rows j-1 (for class i's vectors) and i (for class j's vectors)
+        n_classes = len(self.classes)
+        decisions = np.empty((len(X_scaled), n_classes * (n_classes - 1) // 2))
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                si, sj = self.class_slices[i], self.class_slices[j]
+                decisions[:, pair] = (K[:, si].dot(self.dual_coef[j - 1, si]) + K[:, sj].dot(self.dual_coef[i, sj])
+                                      + self.intercept[pair])
+                pair += 1
+        return decisions
+
+    def decision_function(self, X):
+        X = np.asarray(X)
+        blocks = [self._decision_block(X[start:start + self.batch_size])
+                  for start in range(0, len(X), self.batch_size)]
+        return np.concatenate(blocks) if blocks else np.empty(0)
+
+    def predict(self, X):
+        decisions = self.decision_function(X)
+        if not self.is_classifier:
+            return decisions
+        if len(self.classes) == 2:
+            return self.classes[(decisions > 0).astype(int)]
+        n_classes = len(self.classes)
+        votes = np.zeros((len(decisions), n_classes), dtype=np.int32)
+        pair = 0
+        for i in range(n_classes):
+            for j in range(i + 1, n_classes):
+                positive = decisions[:, pair] > 0
+                votes[:, i] += positive
+                votes[:, j] += ~positive
+                pair += 1
+        return self.classes[votes.argmax(axis=1)]
+
+if __name__ == "__main__":
+    #Check the exported predictor against the Scikit-Learn pipelines it came from
+    import os
+    import tempfile
+    from sklearn import datasets
+    from sklearn.datasets import make_moons
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.svm import SVC, SVR
+
+    iris = datasets.load_iris()
+    X = iris["data"][:, (2, 3)]
+    y = (iris["target"] == 2).astype(np.float64)
+    X_moons, y_moons = make_moons(n_samples=5000, noise=0.2, random_state=42)
+    checks = [
+        ("poly_kernal_clf", Pipeline([("scaler", StandardScaler()),
+                                      ("svm_clf", SVC(kernel="poly", degree=3, coef0=1, C=5))]), X, y),
+        ("rbf_kernel_svm_clf", Pipeline([("scaler", StandardScaler()),
+                                         ("svm_clf", SVC(kernel="rbf", gamma=5, C=0.001))]), X, y),
+        ("multiclass rbf", Pipeline([("scaler", StandardScaler()), ("svm_clf", SVC(kernel="rbf", C=10))]),
+         iris["data"], iris["target"]),
+        ("svm_poly_reg", SVR(kernel="poly", degree=2, C=100, epsilon=0.1), X, y),
+        ("moons rbf", Pipeline([("scaler", StandardScaler()), ("svm_clf", SVC(kernel="rbf", gamma=5, C=1))]),
+         X_moons, y_moons),
+    ]
+    directory = tempfile.mkdtemp()
+    for name, model, X_check, y_check in checks:
+        model.fit(X_check, y_check)
+        path = os.path.join(directory, "model.npz")
+        export_svm(model, path, dtype=np.float64)
+        predictor = SVMPredictor.load(path)
+        if hasattr(model, "classes_") and len(model.classes_) == 2:
+            assert np.allclose(predictor.decision_function(X_check), model.decision_function(X_check)), name
+        if hasattr(model, "classes_"):
+            agreement = (predictor.predict(X_check) == model.predict(X_check)).mean()
+        else:
+            agreement = np.isclose(predictor.predict(X_check), model.predict(X_check)).mean()
+        print(name, "agreement with Scikit-Learn:", agreement)
+
+    #Thinning the support vectors of the moons model: fewer vectors, faster predictions, nearly the same accuracy
+    model = checks[-1][1]
+    for prune_tol, merge_radius in [(None, None), (0.05, None), (None, 0.1), (0.05, 0.2)]:
+        export_svm(model, path, prune_tol=prune_tol, merge_radius=merge_radius)
+        predictor = SVMPredictor.load(path)
+        print("prune_tol=%s merge_radius=%s: %d support vectors, accuracy %.4f, %d bytes"
+              % (prune_tol, merge_radius, predictor.number_of_support_vectors(),
+                 (predictor.predict(X_moons) == y_moons).mean(), os.path.getsize(path)))
@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, PolynomialFeatures
+from sklearn.svm import LinearSVC, LinearSVR, SVC, SVR
+
+#Parallel hyperparameter sweep over all the SVM models in SMV_Iris.py
+#
+#In SMV_Iris.py every pipeline starts with its own StandardScaler, so the same X gets rescaled once per model (and
+#once per hyperparameter combination in a grid search). Here X is scaled once (with a scaler fitted on the training
+#rows), and every (model, hyperparameters) combination is fit in a pool of worker processes. joblib hands the scaled
+#array (and the train/validation indices) to the workers as a read-only memory map, so the workers share one copy
+#instead of each receiving its own
+#
+#The models below are the ones from SMV_Iris.py minus their "scaler" step (polynomial_svm_clf keeps the StandardScaler
+#that comes after PolynomialFeatures, since that one scales the new features)
+SMV_IRIS_MODELS = {
+    "svm_clf": (LinearSVC(loss="hinge"), {"C": [0.1, 1, 10]}),
+    "polynomial_svm_clf": (
+        Pipeline([
+            ("poly_features", PolynomialFeatures(degree=3)),
+            ("scaler", StandardScaler()),
+            ("svm_clf", LinearSVC(loss="hinge", max_iter=10000)),
+        ]),
+        {"poly_features__degree": [2, 3], "svm_clf__C": [1, 10]},
+    ),
+    "poly_kernal_clf": (SVC(kernel="poly", coef0=1), {"degree": [2, 3, 10], "C": [1, 5]}),
+    "rbf_kernel_svm_clf": (SVC(kernel="rbf"), {"gamma": [0.1, 1, 5], "C": [0.001, 1, 1000]}),
+    "svm_reg": (LinearSVR(), {"epsilon": [0.5, 1.5], "C": [1, 10]}),
+    "svm_poly_reg": (SVR(kernel="poly", degree=2), {"C": [1, 100], "epsilon": [0.1, 0.5]}),
+}
+
+#Runs in a worker process: fit one model with one set of hyperparameters and score it on the validation rows
+def _fit_and_score(name, estimator, params, X, y, train_index, val_index):
+    model = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    score = model.score(X[val_index], y[val_index]) #Accuracy for classifiers, R^2 for regressors
+    score_seconds = time.perf_counter() - start
+    return {"model": name, "params": params, "fit_seconds": fit_seconds, "score_seconds": score_seconds,
+            "score": score}
+
+#Fits every combination of every model's parameter grid in parallel and returns a DataFrame with one row per
+#combination (model, params, fit_seconds, score_seconds, score), best score first within each model
+#backend="threading" shares X without any copy or memory map at all (libsvm and liblinear release the GIL while
+#training), which avoids the cost of starting worker processes when the individual fits are short
+def svm_sweep(X, y, models=None, test_size=0.2, n_jobs=-1, backend="loky", random_state=42):
+    models = SMV_IRIS_MODELS if models is None else models
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    train_index, val_index = train_test_split(np.arange(len(X)), test_size=test_size, random_state=random_state)
+    #Scaled once, shared by every model. The scaler only sees the training rows, like each pipeline's own scaler in
+    #SMV_Iris.py, so the validation rows don't leak into the mean and variance
+    X_scaled = StandardScaler().fit(X[train_index]).transform(X)
+
+    tasks = [(name, estimator, params)
+             for name, (estimator, param_grid) in models.items()
+             for params in ParameterGrid(param_grid)]
+    start = time.perf_counter()
+    rows = Parallel(n_jobs=n_jobs, backend=backend, max_nbytes="1M", mmap_mode="r")(
+        delayed(_fit_and_score)(name, estimator, params, X_scaled, y, train_index, val_index)
+        for name, estimator, params in tasks
+    )
+    wall_seconds = time.perf_counter() - start
+
+    results = pd.DataFrame(rows)
+    results = results.sort_values(["model", "score"], ascending=[True, False]).reset_index(drop=True)
+    results.attrs["wall_seconds"] = wall_seconds #Total time of the sweep (compare with results["fit_seconds"].sum())
+    return results
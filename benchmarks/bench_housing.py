@@ -0,0 +1,271 @@
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GridSearchCV, StratifiedShuffleSplit, KFold
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+
+from common import housing_path
+from ml_practice.housing import load_housing_data, make_full_pipeline, training_set, income_cat
+from ml_practice.transform_plan import compile_full_pipeline
+from ml_practice.incremental import IncrementalTrainer
+from ml_practice.sampling import StreamingStratifiedSplit
+from ml_practice.correlation import CorrelationMatrix
+from ml_practice.importance import permutation_importance
+from ml_practice.search import AsyncSearch
+from ml_practice.binning import BinMapper
+
+#Chapter 2 hot paths: loading housing.csv, full_pipeline.fit_transform() and the RandomForestRegressor GridSearchCV,
+#set up exactly like Housing.py does it (stratified split on income_cat, then the same pipeline and param_grid), and
+#transforming single districts with the fitted full_pipeline and with its compiled TransformPlan, and folding 2,000
+#new districts into models fitted on the rest (IncrementalTrainer.partial_fit(), which should not depend on the
+#history size). The stratified split benchmarks run on 5 million median incomes (1 million in quick mode). The
+#correlation benchmarks add the three combined attributes and get the correlation matrix again, recomputed by pandas
+#or updated by CorrelationMatrix.add_columns(). The prediction benchmarks give ocean_proximity 2,000 categories and
+#compare the ColumnTransformer's sparse output with a BlockMatrix (linear model) and its ordinal features (forest).
+#The permutation importance benchmarks rank the 16 attributes of a 30-tree forest, with Scikit-Learn's
+#permutation_importance() (a copy of the matrix per attribute) and ml_practice.importance (one scratch buffer). The
+#forest fit benchmarks train the 30-tree, max_features=8 forest on housing_prepared and on its bin codes, and
+#compare_with_hist_gradient_boosting() cross-validates both forests and HistGradientBoostingRegressor
+
+def _training_set():
+    return training_set(load_housing_data(housing_path()))
+
+def _full_pipeline(housing):
+    return make_full_pipeline(list(housing.drop("ocean_proximity", axis=1)))
+
+def bench_load_housing_data(quick=False):
+    path = housing_path()
+    n_rows = len(load_housing_data(path))
+    return {"run": lambda: load_housing_data(path), "items": n_rows}
+
+def bench_full_pipeline_fit_transform(quick=False):
+    housing, _ = _training_set()
+    return {"run": lambda: _full_pipeline(housing).fit_transform(housing), "items": len(housing)}
+
+#One district at a time (like scoring some_data in Housing.py): 100 calls per run (20 in quick mode for Scikit-Learn)
+def bench_full_pipeline_transform_record(quick=False):
+    housing, _ = _training_set()
+    full_pipeline = _full_pipeline(housing).fit(housing)
+    records = [housing.iloc[[i]] for i in range(20 if quick else 100)]
+    return {"run": lambda: [full_pipeline.transform(record) for record in records], "items": len(records),
+            "unit": "records"}
+
+def bench_transform_plan_record(quick=False):
+    housing, _ = _training_set()
+    plan = compile_full_pipeline(_full_pipeline(housing).fit(housing))
+    records = housing.iloc[:100].to_dict("records")
+    return {"run": lambda: [plan.transform_record(record) for record in records], "items": len(records),
+            "unit": "records"}
+
+#The full grid is 18 combinations x 5 folds = 90 forests; quick mode keeps 2 folds and 4,000 districts
+def _grid_search_setup(quick):
+    housing, housing_labels = _training_set()
+    if quick:
+        housing, housing_labels = housing.iloc[:4000], housing_labels.iloc[:4000]
+    housing_prepared = _full_pipeline(housing).fit_transform(housing)
+    param_grid = [
+        {'n_estimators': [3, 10, 30], 'max_features': [2, 4, 6, 8]},
+        {'bootstrap': [False], 'n_estimators': [3, 10], 'max_features': [2, 3, 4]},
+    ]
+    return housing_prepared, housing_labels, param_grid, 2 if quick else 5
+
+def _grid_search(quick, n_jobs=None):
+    housing_prepared, housing_labels, param_grid, cv = _grid_search_setup(quick)
+
+    def run():
+        grid_search = GridSearchCV(RandomForestRegressor(random_state=42), param_grid, cv=cv,
+                                   scoring='neg_mean_squared_error', return_train_score=True, n_jobs=n_jobs)
+        grid_search.fit(housing_prepared, housing_labels)
+    return {"run": run, "items": 18 * cv, "unit": "fits"}
+
+def bench_grid_search(quick=False):
+    return _grid_search(quick)
+
+#The same grid on every core: GridSearchCV with n_jobs=-1 and AsyncSearch (most expensive fits first). Benchmarks run
+#in daemon processes, where AsyncSearch uses threads instead of a process pool
+def bench_grid_search_parallel(quick=False):
+    return _grid_search(quick, n_jobs=-1)
+
+def bench_async_search(quick=False):
+    housing_prepared, housing_labels, param_grid, cv = _grid_search_setup(quick)
+
+    def run():
+        AsyncSearch(RandomForestRegressor(random_state=42), param_grid, cv=cv, n_jobs=-1).fit(housing_prepared,
+                                                                                               housing_labels)
+    return {"run": run, "items": 18 * cv, "unit": "fits"}
+
+def _partial_fit(make_model, quick):
+    housing, housing_labels = _training_set()
+    n_history = len(housing) - 2000
+    if quick:
+        housing, housing_labels, n_history = housing.iloc[-6000:], housing_labels.iloc[-6000:], 4000
+    trainer = IncrementalTrainer(_full_pipeline(housing), make_model())
+    trainer.fit(housing.iloc[:n_history], housing_labels.iloc[:n_history])
+    new_housing, new_labels = housing.iloc[n_history:], housing_labels.iloc[n_history:]
+
+    def run(): #Every repeat folds the same rows in again; the forest keeps its size, so the cost stays the same
+        trainer.partial_fit(new_housing, new_labels)
+    return {"run": run, "items": len(new_housing)}
+
+def bench_partial_fit_linear_regression(quick=False):
+    return _partial_fit(LinearRegression, quick)
+
+def bench_partial_fit_forest(quick=False):
+    return _partial_fit(lambda: RandomForestRegressor(n_estimators=30, max_features=8, random_state=42), quick)
+
+def _median_incomes(quick):
+    return np.random.RandomState(42).lognormal(1.3, 0.45, 1000000 if quick else 5000000)
+
+#What Housing.py does: income_cat with pd.cut(), then StratifiedShuffleSplit on the whole frame
+def bench_stratified_shuffle_split(quick=False):
+    housing = pd.DataFrame({"median_income": _median_incomes(quick)})
+
+    def run():
+        split = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+        return next(split.split(housing, income_cat(housing)))
+    return {"run": run, "items": len(housing)}
+
+def _streaming_split(method, quick):
+    median_income = _median_incomes(quick)
+
+    def run():
+        splitter = StreamingStratifiedSplit(test_size=0.2, random_state=42, method=method)
+        for start in range(0, len(median_income), 100000):
+            splitter.update(median_income[start:start + 100000])
+        return splitter.split(), splitter.compare_props()
+    return {"run": run, "items": len(median_income)}
+
+def bench_streaming_split_reservoir(quick=False):
+    return _streaming_split("reservoir", quick)
+
+def bench_streaming_split_hash(quick=False):
+    return _streaming_split("hash", quick)
+
+def _with_combined_attributes():
+    housing, _ = _training_set()
+    housing = housing.drop("ocean_proximity", axis=1)
+    combined = housing.assign(rooms_per_household=housing["total_rooms"] / housing["households"],
+                              bedrooms_per_room=housing["total_bedrooms"] / housing["total_rooms"],
+                              population_per_household=housing["population"] / housing["households"])
+    return housing, combined
+
+def bench_corr_recompute(quick=False):
+    housing, combined = _with_combined_attributes()
+    return {"run": lambda: combined.corr(), "items": len(combined)}
+
+def bench_corr_add_columns(quick=False):
+    housing, combined = _with_combined_attributes()
+    correlations = CorrelationMatrix().update(housing)
+
+    new_columns = ["rooms_per_household", "bedrooms_per_room", "population_per_household"]
+
+    def run(): #On a copy, so every repeat adds the columns to the original matrix (copying is a few small arrays)
+        return copy.deepcopy(correlations).add_columns(combined, new_columns).corr()
+    return {"run": run, "items": len(combined)}
+
+#Housing with a 2,000-category attribute in place of ocean_proximity (e.g. a district code)
+def _high_cardinality(quick):
+    housing, housing_labels = _training_set()
+    if quick:
+        housing, housing_labels = housing.iloc[:4000], housing_labels.iloc[:4000]
+    housing = housing.assign(ocean_proximity=np.random.RandomState(42).randint(0, 2000, len(housing)).astype(str))
+    full_pipeline = _full_pipeline(housing).fit(housing)
+    return housing, housing_labels, full_pipeline, compile_full_pipeline(full_pipeline).transform_blocks(housing)
+
+def bench_linear_predict_sparse(quick=False):
+    housing, housing_labels, full_pipeline, _ = _high_cardinality(quick)
+    housing_prepared = full_pipeline.transform(housing)
+    lin_reg = LinearRegression().fit(housing_prepared, housing_labels)
+    return {"run": lambda: lin_reg.predict(housing_prepared), "items": len(housing)}
+
+def bench_linear_predict_blocks(quick=False):
+    housing, housing_labels, full_pipeline, blocks = _high_cardinality(quick)
+    lin_reg = LinearRegression().fit(full_pipeline.transform(housing), housing_labels)
+    return {"run": lambda: blocks.dot(lin_reg.coef_) + lin_reg.intercept_, "items": len(housing)}
+
+def bench_forest_one_hot(quick=False):
+    housing, housing_labels, full_pipeline, _ = _high_cardinality(quick)
+    housing_prepared = full_pipeline.transform(housing)
+
+    def run():
+        forest_reg = RandomForestRegressor(n_estimators=10, random_state=42).fit(housing_prepared, housing_labels)
+        return forest_reg.predict(housing_prepared)
+    return {"run": run, "items": len(housing)}
+
+def bench_forest_ordinal(quick=False):
+    housing, housing_labels, _, blocks = _high_cardinality(quick)
+    housing_ordinal = blocks.ordinal()
+
+    def run():
+        forest_reg = RandomForestRegressor(n_estimators=10, random_state=42).fit(housing_ordinal, housing_labels)
+        return forest_reg.predict(housing_ordinal)
+    return {"run": run, "items": len(housing)}
+
+def _importance_setup(quick):
+    housing, housing_labels = _training_set()
+    if quick:
+        housing, housing_labels = housing.iloc[:4000], housing_labels.iloc[:4000]
+    housing_prepared = _full_pipeline(housing).fit_transform(housing)
+    forest_reg = RandomForestRegressor(n_estimators=30, random_state=42).fit(housing_prepared, housing_labels)
+    return forest_reg, housing_prepared, housing_labels
+
+def bench_permutation_importance_sklearn(quick=False):
+    from sklearn.inspection import permutation_importance as sklearn_permutation_importance
+
+    forest_reg, housing_prepared, housing_labels = _importance_setup(quick)
+    return {"run": lambda: sklearn_permutation_importance(forest_reg, housing_prepared, housing_labels, n_repeats=3,
+                                                          random_state=42, scoring="neg_root_mean_squared_error"),
+            "items": housing_prepared.shape[1] * 3, "unit": "permutations"}
+
+def bench_permutation_importance(quick=False):
+    forest_reg, housing_prepared, housing_labels = _importance_setup(quick)
+    return {"run": lambda: permutation_importance(forest_reg, housing_prepared, housing_labels, n_repeats=3,
+                                                  random_state=42),
+            "items": housing_prepared.shape[1] * 3, "unit": "permutations"}
+
+def _forest_fit(data, quick):
+    housing_prepared, housing_labels, _, _ = _grid_search_setup(quick)
+    X = {"raw": housing_prepared, "bins": BinMapper().fit_transform(housing_prepared)}[data]
+    make_model = lambda: RandomForestRegressor(n_estimators=30, max_features=8, random_state=42)
+    return {"run": lambda: make_model().fit(X, housing_labels), "items": len(X)}
+
+def bench_forest_fit(quick=False):
+    return _forest_fit("raw", quick)
+
+def bench_forest_fit_bins(quick=False):
+    return _forest_fit("bins", quick)
+
+#Cross-validated RMSE and fit time of RandomForestRegressor on X (how Housing.py trains it), of the same forest on the
+#bin codes of X (binned once for all the folds, binning time included) and of HistGradientBoostingRegressor() on X.
+#Returns a dict with a row per model and the fit time speedup of each over the first one
+def compare_with_hist_gradient_boosting(X, y, cv=3, n_estimators=30, max_features=8, random_state=42):
+    X = np.asarray(X.toarray() if hasattr(X, "toarray") else X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    start = time.perf_counter()
+    codes = BinMapper().fit_transform(X)
+    binning_seconds = time.perf_counter() - start
+    params = {"n_estimators": n_estimators, "max_features": max_features, "random_state": random_state}
+    report = {}
+    for name, model, data, setup_seconds in (
+            ("random_forest", RandomForestRegressor(**params), X, 0.0),
+            ("random_forest_bins", RandomForestRegressor(**params), codes, binning_seconds),
+            ("hist_gradient_boosting", HistGradientBoostingRegressor(random_state=random_state), X, 0.0)):
+        squared_errors, fit_seconds = [], setup_seconds
+        for train, test in KFold(cv).split(data):
+            start = time.perf_counter()
+            model.fit(data[train], y[train])
+            fit_seconds += time.perf_counter() - start
+            squared_errors.append((model.predict(data[test]) - y[test]) ** 2)
+        report[name] = {"rmse": float(np.sqrt(np.mean(np.concatenate(squared_errors)))), "fit_seconds": fit_seconds}
+    for row in report.values():
+        row["speedup"] = report["random_forest"]["fit_seconds"] / row["fit_seconds"]
+    return report
+
+#The whole comparison: 3 folds x (the forest on housing_prepared, on its codes, HistGradientBoostingRegressor)
+def bench_forest_cv_comparison(quick=False):
+    housing_prepared, housing_labels, _, _ = _grid_search_setup(quick)
+    return {"run": lambda: compare_with_hist_gradient_boosting(housing_prepared, housing_labels), "items": 9,
+            "unit": "fits"}
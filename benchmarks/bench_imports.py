@@ -0,0 +1,32 @@
+import sys
+import subprocess
+
+from common import REPO_ROOT
+
+#Import times: each run starts a fresh interpreter (nothing already imported), so "items" is one import. The first
+#benchmark is the interpreter start-up alone, to subtract from the others. ml_practice should only add a few
+#milliseconds on top of NumPy, except for CombinedAttributesAdder (and so "import *"), which is a Scikit-Learn
+#estimator and imports sklearn.base; Housing.py (the Chapter 2 script) is there for comparison, since it imports pandas
+#plotting, Matplotlib and Scikit-Learn up front
+
+def _import(statement):
+    command = [sys.executable, "-c", statement]
+    return {"run": lambda: subprocess.check_call(command, cwd=REPO_ROOT), "items": 1, "unit": "imports"}
+
+def bench_import_python_startup(quick=False):
+    return _import("pass")
+
+def bench_import_numpy(quick=False):
+    return _import("import numpy")
+
+def bench_import_ml_practice(quick=False):
+    return _import("import ml_practice")
+
+def bench_import_combined_attributes_adder(quick=False):
+    return _import("from ml_practice import CombinedAttributesAdder")
+
+def bench_import_ml_practice_everything(quick=False):
+    return _import("from ml_practice import *")
+
+def bench_import_housing_script(quick=False):
+    return _import("import sys; sys.path.insert(0, 'Chapter_2'); import Housing")
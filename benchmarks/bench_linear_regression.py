@@ -0,0 +1,54 @@
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+import common #Puts the repository root on sys.path, for ml_practice
+from ml_practice.linear_models import batch_gradient_descent, stochastic_gradient_descent, plot_learning_curves
+
+#Chapter 4 hot paths: the Batch and Stochastic Gradient Descent loops and plot_learning_curves() from
+#Linear_Regression.py (ml_practice/linear_models.py); the figures go to the Agg backend and are discarded
+#
+#"items" is the number of gradient steps (or of model fits for the learning curves)
+
+def _linear_data(m, random_state=42):
+    rnd = np.random.RandomState(random_state)
+    X = 2 * rnd.rand(m, 1)
+    y = 4 + 3 * X + rnd.randn(m, 1)
+    return np.c_[np.ones((m, 1)), X], y
+
+def _quadratic_data(m, random_state=42):
+    rnd = np.random.RandomState(random_state)
+    X = 6 * rnd.rand(m, 1) - 3
+    y = 0.5 * X**2 + X + 2 + rnd.randn(m, 1)
+    return X, y
+
+def _plot_learning_curves(model, X, y):
+    plot_learning_curves(model, X, y)
+    plt.close("all")
+
+#Linear_Regression.py uses m = 100; the full benchmark also runs the loops on 10,000 instances
+def bench_batch_gradient_descent(quick=False):
+    X_b, y = _linear_data(100 if quick else 10000)
+    return {"run": lambda: batch_gradient_descent(X_b, y), "items": 1000, "unit": "steps"}
+
+def bench_stochastic_gradient_descent(quick=False):
+    X_b, y = _linear_data(100 if quick else 10000)
+    return {"run": lambda: stochastic_gradient_descent(X_b, y), "items": 50 * len(X_b), "unit": "steps"}
+
+def bench_learning_curves_linear(quick=False):
+    X, y = _quadratic_data(100 if quick else 1000)
+    return {"run": lambda: _plot_learning_curves(LinearRegression(), X, y), "items": int(len(X) * 0.8) - 1,
+            "unit": "fits"}
+
+def bench_learning_curves_polynomial(quick=False):
+    X, y = _quadratic_data(100 if quick else 1000)
+    polynomial_regression = Pipeline([
+        ("poly_features", PolynomialFeatures(degree=10, include_bias=False)),
+        ("lin_reg", LinearRegression()),
+    ])
+    return {"run": lambda: _plot_learning_curves(polynomial_regression, X, y), "items": int(len(X) * 0.8) - 1,
+            "unit": "fits"}
@@ -0,0 +1,39 @@
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import cross_val_predict
+from sklearn.preprocessing import StandardScaler
+
+from common import synthetic_mnist
+
+#Chapter 3 hot paths: the cross_val_predict() calls in MNIST.py, on MNIST-sized synthetic data (60,000 training images
+#of 784 pixels, 10,000 in quick mode) since MNIST.py fetches the real data from OpenML at import
+#
+#How many epochs SGD needs to converge depends on the data, and the synthetic images don't converge like MNIST does, so
+#the classifier runs a fixed number of epochs (tol=None): the time then measures the cost of the passes themselves
+N_EPOCHS = 10
+
+def _training_set(quick):
+    X_train, y_train = synthetic_mnist(10000 if quick else 60000)
+    return X_train, y_train
+
+#The "5-detector": binary SGDClassifier with 3-fold cross_val_predict
+def bench_cross_val_predict_5_detector(quick=False):
+    X_train, y_train = _training_set(quick)
+    y_train_5 = (y_train == 5)
+    sgd_clf = SGDClassifier(max_iter=N_EPOCHS, tol=None, random_state=42)
+    return {"run": lambda: cross_val_predict(sgd_clf, X_train, y_train_5, cv=3), "items": len(X_train)}
+
+#Decision scores for the precision/recall curve (method="decision_function")
+def bench_cross_val_predict_decision_function(quick=False):
+    X_train, y_train = _training_set(quick)
+    y_train_5 = (y_train == 5)
+    sgd_clf = SGDClassifier(max_iter=N_EPOCHS, tol=None, random_state=42)
+    return {"run": lambda: cross_val_predict(sgd_clf, X_train, y_train_5, cv=3, method="decision_function"),
+            "items": len(X_train)}
+
+#Multiclass (one-vs-all SGD over the 10 digits) on the standardized images, as used for the confusion matrix
+def bench_cross_val_predict_multiclass_scaled(quick=False):
+    X_train, y_train = _training_set(quick)
+    X_train_scaled = StandardScaler().fit_transform(X_train.astype(np.float64))
+    sgd_clf = SGDClassifier(max_iter=N_EPOCHS, tol=None, random_state=42)
+    return {"run": lambda: cross_val_predict(sgd_clf, X_train_scaled, y_train, cv=3), "items": len(X_train)}
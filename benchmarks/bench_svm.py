@@ -0,0 +1,34 @@
+from common import use_chapter
+
+#Chapter 5 hot paths: fitting the SMV_Iris.py pipelines. The pipelines and the moons / Iris-like data generators are
+#the ones from Chapter_5/SVM_Benchmark.py (which also sweeps sizes up to 1M instances); here each pipeline gets one fixed
+#size so its timings can be followed from commit to commit
+
+use_chapter(5)
+from SVM_Benchmark import PIPELINES, make_data
+
+def _svm_fit(name, dataset, quick):
+    make_model, max_rows = PIPELINES[name]
+    n_samples = 2000 if quick else 20000
+    if max_rows is not None:
+        n_samples = min(n_samples, max_rows)
+    X, y = make_data(dataset, n_samples)
+    return {"run": lambda: make_model().fit(X, y), "items": n_samples}
+
+def bench_linear_svc(quick=False):
+    return _svm_fit("linear", "iris", quick)
+
+def bench_polynomial_features_svc(quick=False):
+    return _svm_fit("polynomial_features", "moons", quick)
+
+def bench_poly_kernel_svc(quick=False):
+    return _svm_fit("poly_kernel", "moons", quick)
+
+def bench_rbf_kernel_svc(quick=False):
+    return _svm_fit("rbf", "moons", quick)
+
+def bench_linear_svr(quick=False):
+    return _svm_fit("linear_svr", "moons", quick)
+
+def bench_poly_kernel_svr(quick=False):
+    return _svm_fit("svr", "moons", quick)
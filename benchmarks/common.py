@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import platform
+
+import numpy as np
+import sklearn
+from sklearn.datasets import load_digits
+
+#Shared helpers for the benchmark modules and runners: paths to the chapter scripts, the offline datasets they run on,
+#and the measurements and baseline comparisons of run_benchmarks.py and Chapter_5/SVM_Benchmark.py
+#
+#The benchmarks never download anything. The housing data is the cached housing.csv that Housing.py fetches (if it's
+#there), otherwise a synthetic file with the same columns. MNIST is replaced by MNIST-sized data built from the small
+#digits dataset that ships with Scikit-Learn, so the timings have the right shape (784 pixel features, 10 classes)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, "benchmarks", ".cache")
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT) #For ml_practice
+
+from ml_practice.housing import synthetic_housing
+
+#Makes the modules of one chapter folder importable (e.g. use_chapter(2) before "import Housing")
+def use_chapter(number):
+    path = os.path.join(REPO_ROOT, "Chapter_%d" % number)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+#Folder containing a housing.csv for Housing.load_housing_data(): the one Housing.py downloaded if it exists, otherwise
+#a synthetic one written once to benchmarks/.cache
+def housing_path(n_rows=20640):
+    for folder in (os.path.join(REPO_ROOT, "Chapter_2", "datasets", "housing"), os.path.join("datasets", "housing")):
+        if os.path.isfile(os.path.join(folder, "housing.csv")):
+            return folder
+    folder = os.path.join(CACHE_DIR, "housing_%d" % n_rows)
+    csv_path = os.path.join(folder, "housing.csv")
+    if not os.path.isfile(csv_path):
+        os.makedirs(folder, exist_ok=True)
+        synthetic_housing(n_rows).to_csv(csv_path, index=False)
+    return folder
+
+#MNIST-like data: the 8x8 digits upsampled to 28x28 (784 features, 0-255 intensities) and repeated with noise up to
+#n_samples instances. Returns X (float64, like fetch_openml) and y (uint8 labels)
+def synthetic_mnist(n_samples=70000, random_state=42):
+    digits = load_digits()
+    pixels = (np.arange(28) * 8) // 28
+    images = digits.images[:, pixels][:, :, pixels].reshape(len(digits.images), 784) * (255.0 / 16)
+    rnd = np.random.RandomState(random_state)
+    rows = rnd.randint(0, len(images), n_samples)
+    X = images[rows] + rnd.normal(0, 20, (n_samples, 784))
+    np.clip(X, 0, 255, out=X)
+    return np.round(X), digits.target[rows].astype(np.uint8)
+
+#Peak resident set size of this process in bytes (ru_maxrss is in KB on Linux, bytes on macOS)
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError: #Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "sklearn": sklearn.__version__,
+            "machine": platform.machine(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+#Flags every result that got slower or used more memory than the baseline row with the same key_fields by more than
+#the tolerance of the metric (metrics: [(name, tolerance)], a ratio: 0.25 means 25% worse). Times (metrics ending in
+#"seconds") below min_seconds are too noisy to compare and are ignored, and so are skipped rows. Each regression is a
+#dict of the key fields plus metric, baseline, current and ratio
+def compare_to_baseline(results, baseline, key_fields, metrics, min_seconds=0.05):
+    def key(row):
+        return tuple(row[field] for field in key_fields)
+
+    baseline_rows = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = baseline_rows.get(key(row))
+        if old is None or row.get("skipped") or old.get("skipped"):
+            continue
+        for metric, tolerance in metrics:
+            before, after = old.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            if metric.endswith("seconds") and max(before, after) < min_seconds:
+                continue
+            if after > before * (1 + tolerance):
+                regressions.append(dict(zip(key_fields, key(row)), metric=metric, baseline=before, current=after,
+                                        ratio=after / before))
+    return regressions
@@ -0,0 +1,204 @@
+import os
+import sys
+import glob
+import shutil
+import json
+import time
+import argparse
+import importlib
+import subprocess
+import multiprocessing
+
+os.environ.setdefault("MPLBACKEND", "Agg") #No windows: some chapter modules import pyplot
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCHMARK_DIR not in sys.path:
+    sys.path.insert(0, BENCHMARK_DIR)
+import common
+from common import REPO_ROOT, peak_rss_bytes, environment
+
+#Benchmark suite for the hot paths of every chapter
+#
+#Every bench_*.py module in this folder defines functions named bench_*(quick=False). Each one does its setup (loading
+#or generating data, building the model) and returns a dict with:
+#   "run":   a function doing the work being timed
+#   "items": how many rows / fits / steps one run processes, used to report throughput
+#   "unit":  what the items are ("rows" if not given)
+#Each benchmark runs in a fresh process (so peak RSS belongs to that benchmark alone), its run() is called --repeat
+#times, and wall time, CPU time, peak RSS and throughput are recorded. The results go to results/<commit>.json, keyed
+#by the git commit they were measured on, so the numbers can be followed across commits and compared:
+#
+#   python benchmarks/run_benchmarks.py --quick                     (everything, small sizes)
+#   python benchmarks/run_benchmarks.py -k housing svm              (only benchmarks whose name contains a keyword)
+#   python benchmarks/run_benchmarks.py --baseline 5999084          (flag regressions against an earlier commit)
+#
+#Without --baseline, the results are compared with benchmarks/baseline.json: a --quick run of every benchmark,
+#recorded on the machine in its "environment". Benchmarks that aren't in it (or full-size runs, when it only has quick
+#ones) are not compared. Record it again with --update-baseline when the machine changes
+#   python benchmarks/run_benchmarks.py --history                   (table of every commit measured so far)
+
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+#"module.function" names of every benchmark, in file order
+def discover(keywords=None):
+    names = []
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, "bench_*.py"))):
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as source:
+            for line in source:
+                if line.startswith("def bench_"):
+                    name = "%s.%s" % (module_name, line[4:line.index("(")])
+                    if not keywords or any(keyword in name for keyword in keywords):
+                        names.append(name)
+    return names
+
+def run_benchmark(task):
+    name, quick, repeat = task
+    module_name, function_name = name.split(".")
+    row = {"name": name, "quick": quick}
+    start = time.perf_counter()
+    benchmark = getattr(importlib.import_module(module_name), function_name)(quick=quick)
+    row["setup_seconds"] = time.perf_counter() - start
+    row["setup_rss_bytes"] = peak_rss_bytes()
+
+    wall, cpu = [], []
+    for _ in range(repeat):
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        benchmark["run"]()
+        wall.append(time.perf_counter() - start_wall)
+        cpu.append(time.process_time() - start_cpu)
+    row.update(wall_seconds=wall, cpu_seconds=cpu, min_seconds=min(wall), median_seconds=float(np.median(wall)),
+               peak_rss_bytes=peak_rss_bytes(), items=benchmark["items"], unit=benchmark.get("unit", "rows"))
+    row["throughput"] = row["items"] / row["min_seconds"] if row["min_seconds"] > 0 else None
+    return row
+
+def run_benchmarks(names, quick=False, repeat=3, isolate=True):
+    tasks = [(name, quick, repeat) for name in names]
+    if not isolate:
+        return [run_benchmark(task) for task in tasks]
+    with multiprocessing.get_context("spawn").Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.map(run_benchmark, tasks, chunksize=1)
+
+def _git(*args):
+    try:
+        return subprocess.check_output(("git",) + args, cwd=REPO_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#Short hash of HEAD, with "-dirty" when the working tree has uncommitted changes to tracked files
+def current_commit():
+    commit = _git("rev-parse", "--short", "HEAD")
+    if commit is None:
+        return "unknown"
+    return commit + "-dirty" if _git("status", "--porcelain", "--untracked-files=no") else commit
+
+def results_path(commit, results_dir=RESULTS_DIR):
+    return os.path.join(results_dir, "%s.json" % commit)
+
+#Merges the new rows into the commit's results file, so running a subset of the benchmarks keeps the other ones
+def write_results(results, commit, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    path = results_path(commit, results_dir)
+    rows = {}
+    if os.path.isfile(path):
+        with open(path) as previous:
+            rows = {(row["name"], row["quick"]): row for row in json.load(previous)["results"]}
+    rows.update({(row["name"], row["quick"]): row for row in results})
+    with open(path, "w") as output:
+        json.dump({"commit": commit, "subject": _git("log", "-1", "--format=%s"), "environment": environment(),
+                   "results": list(rows.values())}, output, indent=2)
+    return path
+
+#A commit hash (results/<commit>.json) or the path of a results file
+def load_results(commit_or_path, results_dir=RESULTS_DIR):
+    path = commit_or_path if os.path.isfile(commit_or_path) else results_path(commit_or_path, results_dir)
+    with open(path) as results_file:
+        return json.load(results_file)
+
+#Flags every benchmark that got slower (min_seconds) or used more memory (peak_rss_bytes) than in the baseline by more
+#than the tolerance (a ratio: 0.25 means 25% worse). Times below min_seconds are too noisy to compare and are ignored
+def compare_to_baseline(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, min_seconds=0.05):
+    return common.compare_to_baseline(results, baseline, ("name", "quick"),
+                                      [("min_seconds", time_tolerance), ("peak_rss_bytes", memory_tolerance)],
+                                      min_seconds)
+
+#Minimum time of every benchmark for every commit that has a results file, oldest commit first (in git history
+#order, with commits that aren't in the history, like "-dirty" runs, at the end)
+def history(quick=False, results_dir=RESULTS_DIR):
+    order = (_git("rev-list", "--abbrev-commit", "--reverse", "HEAD") or "").split()
+    runs = {}
+    for path in glob.glob(os.path.join(results_dir, "*.json")):
+        with open(path) as results_file:
+            run = json.load(results_file)
+        runs[run["commit"]] = {row["name"]: row for row in run["results"] if row["quick"] == quick}
+    position = {commit: i for i, commit in enumerate(order)}
+    commits = sorted(runs, key=lambda commit: (position.get(commit.replace("-dirty", ""), len(order)), commit))
+    return commits, runs
+
+def print_history(quick=False, results_dir=RESULTS_DIR):
+    commits, runs = history(quick, results_dir)
+    names = sorted({name for commit in commits for name in runs[commit]})
+    print("%-58s" % "benchmark (min seconds)" + "".join(" %13s" % commit[:13] for commit in commits))
+    for name in names:
+        cells = [runs[commit].get(name) for commit in commits]
+        print("%-58s" % name + "".join(" %13s" % ("%.4f" % cell["min_seconds"] if cell else "-") for cell in cells))
+
+def print_results(results):
+    print("%-58s %10s %10s %10s %12s %16s" % ("benchmark", "min (s)", "median (s)", "cpu (s)", "peak RSS MB",
+                                              "throughput"))
+    for row in results:
+        rss = row["peak_rss_bytes"] / 1024**2 if row["peak_rss_bytes"] else float("nan")
+        throughput = "%.4g %s/s" % (row["throughput"], row["unit"]) if row["throughput"] else "-"
+        print("%-58s %10.4f %10.4f %10.4f %12.1f %16s" % (row["name"], row["min_seconds"], row["median_seconds"],
+                                                         min(row["cpu_seconds"]), rss, throughput))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the hot paths of every chapter and record the results by "
+                                                 "git commit")
+    parser.add_argument("-k", "--keywords", nargs="+", default=None,
+                        help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--quick", action="store_true", help="Small sizes (a couple of minutes in total)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Commit (or results file) to compare against")
+    parser.add_argument("--no-baseline", action="store_true", help="Don't compare against a baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results to baseline.json")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--memory-tolerance", type=float, default=0.25)
+    parser.add_argument("--no-isolate", action="store_true", help="Run every benchmark in this process (faster, "
+                                                                  "but peak RSS then accumulates)")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    parser.add_argument("--history", action="store_true", help="Print the recorded results of every commit and exit")
+    args = parser.parse_args(argv)
+
+    names = discover(args.keywords)
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if args.history:
+        print_history(args.quick, args.results_dir)
+        return 0
+
+    results = run_benchmarks(names, args.quick, args.repeat, isolate=not args.no_isolate)
+    print_results(results)
+    commit = current_commit()
+    path = write_results(results, commit, args.results_dir)
+    print("Results written to", path)
+    if args.update_baseline:
+        shutil.copyfile(path, BASELINE_PATH)
+        print("Baseline written to", BASELINE_PATH)
+    elif not args.no_baseline:
+        baseline = load_results(args.baseline, args.results_dir)
+        regressions = compare_to_baseline(results, baseline, args.time_tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION: %(name)s %(metric)s %(baseline).4g -> %(current).4g (x%(ratio).2f)" % regression)
+        if regressions:
+            return 1
+        print("No regressions against", args.baseline)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
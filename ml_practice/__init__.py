@@ -0,0 +1,62 @@
+import importlib
+
+#Reusable pieces of the chapter scripts: loaders, transformers and training/evaluation helpers
+#
+#   from ml_practice import CombinedAttributesAdder, load_housing_data
+#
+#Importing the package does no work: the names below are looked up in their submodule the first time they are used
+#(PEP 562 module __getattr__), and the submodules import pandas, Scikit-Learn and Matplotlib inside the functions that
+#need them (except ml_practice/transformers.py, whose classes are Scikit-Learn estimators). benchmarks/bench_imports.py
+#keeps track of the import times and tests/test_imports.py keeps them in budget
+
+_EXPORTS = {
+    "CombinedAttributesAdder": "transformers",
+    "fetch_housing_data": "housing",
+    "load_housing_data": "housing",
+    "synthetic_housing": "housing",
+    "split_train_test": "housing",
+    "test_set_check": "housing",
+    "income_cat": "housing",
+    "stratified_split": "housing",
+    "make_full_pipeline": "housing",
+    "training_set": "housing",
+    "fetch_mnist": "mnist",
+    "split_mnist": "mnist",
+    "plot_digit": "mnist",
+    "plot_precision_recall_vs_threshold": "mnist",
+    "plot_roc_curve": "mnist",
+    "batch_gradient_descent": "linear_models",
+    "learning_schedule": "linear_models",
+    "stochastic_gradient_descent": "linear_models",
+    "learning_curves": "linear_models",
+    "plot_learning_curves": "linear_models",
+    "ModelStore": "artifacts",
+    "FlatForest": "artifacts",
+    "compile_full_pipeline": "transform_plan",
+    "check_plan": "transform_plan",
+    "TransformPlan": "transform_plan",
+    "DriftMonitor": "drift",
+    "IncrementalTrainer": "incremental",
+    "StreamingStratifiedSplit": "sampling",
+    "income_category": "sampling",
+    "CorrelationMatrix": "correlation",
+    "BlockMatrix": "block_matrix",
+    "permutation_importance": "importance",
+    "housing_attributes": "importance",
+    "AsyncSearch": "search",
+    "BinMapper": "binning",
+    "span": "profiling",
+    "profiled": "profiling",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("%s.%s" % (__name__, _EXPORTS[name])), name)
+    globals()[name] = value #Later lookups don't go through __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
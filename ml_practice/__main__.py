@@ -0,0 +1,6 @@
+import sys
+
+from ml_practice.batch import main
+
+if __name__ == "__main__": #The figure-rendering processes import this module again
+    sys.exit(main())
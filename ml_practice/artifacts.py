@@ -0,0 +1,356 @@
+import datetime
+import hashlib
+import json
+import os
+import platform
+import shutil
+import tempfile
+
+import numpy as np
+
+#Versioned store for trained models: the fitted preprocessing pipeline and the final model are saved together, every
+#save gets a new version with a content hash, and a CURRENT pointer says which version is served (so we can roll back)
+#
+#   store = ModelStore("models")
+#   version = store.save("housing", full_pipeline, final_model, metadata={"test_rmse": final_rmse})
+#   artifact = store.load("housing")            #The CURRENT version
+#   predictions = artifact.predict(X_test)      #Raw DataFrame in, predictions out
+#   store.rollback("housing")                   #CURRENT goes back to the version before
+#
+#Layout of a store:
+#   models/housing/CURRENT              the name of the served version ("v0003")
+#   models/housing/v0003/metadata.json  version, parent, created, content hash, sha256 of every file, library versions
+#   models/housing/v0003/pipeline.joblib
+#   models/housing/v0003/model.joblib
+#   models/housing/v0003/forest/*.npy   tree ensembles only: the node arrays of all the trees (see FlatForest)
+#
+#Loading is meant to take milliseconds and share memory between serving processes: the .joblib files are written
+#uncompressed and loaded with mmap_mode="r", so NumPy arrays (scaler means and scales, imputer statistics, regression
+#coefficients) are memory-mapped from the page cache instead of copied. That doesn't work for the trees of a forest,
+#whose Cython Tree objects copy their nodes into their own buffers when unpickled, so tree ensembles are also flattened
+#into plain .npy arrays that FlatForest memory-maps and predicts from. model.joblib is only unpickled if the model
+#object itself is asked for
+#
+#A version directory is written under a temporary name and renamed into place, and CURRENT is replaced atomically, so
+#a reader never sees half a version. Versions are never modified: saving content identical to an existing version
+#(same content hash) just returns that version
+
+CURRENT = "CURRENT"
+METADATA = "metadata.json"
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#{relative path: {"sha256", "bytes"}} of every file under directory except metadata.json
+def _file_hashes(directory):
+    files = {}
+    for folder, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            if relative != METADATA:
+                files[relative] = {"sha256": _sha256(path), "bytes": os.path.getsize(path)}
+    return dict(sorted(files.items()))
+
+#One hash for the whole version: the sha256 of the sorted (path, file hash) pairs
+def _content_hash(files):
+    digest = hashlib.sha256()
+    for relative, info in sorted(files.items()):
+        digest.update(("%s %s\n" % (relative, info["sha256"])).encode())
+    return digest.hexdigest()
+
+def _environment():
+    import joblib
+    import sklearn
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "sklearn": sklearn.__version__,
+            "joblib": joblib.__version__}
+
+#Tree models in an estimator: the estimators_ of a forest, or the model itself for a single tree; None otherwise
+def _trees(model):
+    if hasattr(model, "tree_"):
+        return [model]
+    estimators = getattr(model, "estimators_", None)
+    if isinstance(estimators, list) and estimators and all(hasattr(tree, "tree_") for tree in estimators):
+        return estimators
+    return None
+
+#The trees of a fitted decision tree or forest (RandomForest/ExtraTrees, regressor or classifier) as a handful of
+#flat arrays, one entry per node of all the trees:
+#   roots:          (n_trees,) index of the root node of every tree
+#   children_left:  index of the left child (x[feature] <= threshold) or, for a leaf, of the node itself
+#   children_right: index of the right child, or of the node itself for a leaf
+#   feature:        feature tested by the node (0 for leaves)
+#   threshold:      threshold of the node
+#   value:          (n_nodes, n_outputs * n_classes) prediction of the node
+#Leaves point to themselves, which is how predict() recognizes them. Predictions match Scikit-Learn's (features are
+#rounded to float32 like it does)
+class FlatForest:
+    ARRAYS = ("roots", "children_left", "children_right", "feature", "threshold", "value")
+
+    def __init__(self, roots, children_left, children_right, feature, threshold, value, max_depth, n_outputs,
+                 classes=None):
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.max_depth = int(max_depth)
+        self.n_outputs = int(n_outputs)
+        self.classes = classes
+
+    @classmethod
+    def from_estimator(cls, model):
+        trees = _trees(model)
+        if trees is None:
+            raise ValueError("Expected a fitted decision tree or forest, got %r" % (model,))
+        node_counts = [tree.tree_.node_count for tree in trees]
+        offsets = np.r_[0, np.cumsum(node_counts)[:-1]]
+        left, right, feature, value = [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            leaf = t.children_left < 0
+            left.append(np.where(leaf, nodes, t.children_left) + offset)
+            right.append(np.where(leaf, nodes, t.children_right) + offset)
+            feature.append(np.where(leaf, 0, t.feature))
+            value.append(t.value.reshape(t.node_count, -1))
+        classes = getattr(model, "classes_", None)
+        return cls(roots=offsets.astype(np.int32), children_left=np.concatenate(left).astype(np.int32),
+                   children_right=np.concatenate(right).astype(np.int32),
+                   feature=np.concatenate(feature).astype(np.int32),
+                   threshold=np.concatenate([tree.tree_.threshold for tree in trees]),
+                   value=np.concatenate(value), max_depth=max(tree.tree_.max_depth for tree in trees),
+                   n_outputs=trees[0].tree_.n_outputs,
+                   classes=None if classes is None else np.asarray(classes))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+        info = {"max_depth": self.max_depth, "n_outputs": self.n_outputs,
+                "classes": None if self.classes is None else self.classes.tolist()}
+        with open(os.path.join(directory, "forest.json"), "w") as f:
+            json.dump(info, f, indent=2)
+
+    #mmap_mode="r" maps the arrays read-only: loading costs a few system calls and the pages are shared with every
+    #other process that maps the same files
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, "forest.json")) as f:
+            info = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        classes = info.pop("classes")
+        return cls(classes=None if classes is None else np.asarray(classes), **arrays, **info)
+
+    #Mean of the leaf values reached in every tree: (n_samples, n_outputs * n_classes). All the (tree, row) pairs of a
+    #chunk of rows move down one level per iteration, and the pairs that reached a leaf are dropped from the active set
+    #so the work follows the actual path lengths rather than max_depth
+    def _mean_leaf_value(self, X, chunk_size=None):
+        if hasattr(X, "toarray"):
+            X = X.toarray()
+        X = np.asarray(X, dtype=np.float32)
+        n_trees = self.n_trees
+        chunk_size = chunk_size or max(1, (1 << 18) // n_trees)
+        result = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), chunk_size):
+            X_chunk = X[start:start + chunk_size]
+            rows = np.tile(np.arange(len(X_chunk)), n_trees)
+            nodes = np.repeat(self.roots, len(X_chunk)) #Tree-major: nodes[t * len(X_chunk) + i]
+            active = np.flatnonzero(self.children_left[nodes] != nodes)
+            while active.size:
+                current = nodes[active]
+                go_left = X_chunk[rows[active], self.feature[current]] <= self.threshold[current]
+                current = np.where(go_left, self.children_left[current], self.children_right[current])
+                nodes[active] = current
+                active = active[self.children_left[current] != current]
+            leaf_values = self.value[nodes].reshape(n_trees, len(X_chunk), -1)
+            if self.classes is not None: #Class fractions of every tree sum to one, like predict_proba()
+                leaf_values = leaf_values / leaf_values.sum(axis=-1, keepdims=True)
+            result[start:start + chunk_size] = leaf_values.mean(axis=0)
+        return result
+
+    def predict_proba(self, X):
+        if self.classes is None:
+            raise ValueError("predict_proba() needs a classifier")
+        return self._mean_leaf_value(X)
+
+    def predict(self, X):
+        mean = self._mean_leaf_value(X)
+        if self.classes is not None:
+            return self.classes[np.argmax(mean, axis=1)]
+        return mean[:, 0] if self.n_outputs == 1 else mean
+
+#A loaded version: metadata, the pipeline and model (unpickled on first use) and, for tree ensembles, the
+#memory-mapped FlatForest
+class Artifact:
+    def __init__(self, directory, metadata, mmap_mode="r"):
+        self.directory = directory
+        self.metadata = metadata
+        self.version = metadata["version"]
+        self.mmap_mode = mmap_mode
+        self._pipeline = self._model = None
+        forest_dir = os.path.join(directory, "forest")
+        self.forest = FlatForest.load(forest_dir, mmap_mode) if os.path.isdir(forest_dir) else None
+
+    def _load(self, filename):
+        import joblib
+
+        return joblib.load(os.path.join(self.directory, filename), mmap_mode=self.mmap_mode)
+
+    @property
+    def pipeline(self):
+        if self._pipeline is None and "pipeline.joblib" in self.metadata["files"]:
+            self._pipeline = self._load("pipeline.joblib")
+        return self._pipeline
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._load("model.joblib")
+        return self._model
+
+    def transform(self, X):
+        return X if self.pipeline is None else self.pipeline.transform(X)
+
+    #Raw input (what the pipeline was fitted on) to predictions, through the FlatForest when there is one
+    def predict(self, X):
+        X_prepared = self.transform(X)
+        if self.forest is not None:
+            return self.forest.predict(X_prepared)
+        return self.model.predict(X_prepared)
+
+    def __repr__(self):
+        return "Artifact(%r, version=%r, content_hash=%r)" % (self.metadata["name"], self.version,
+                                                            self.metadata["content_hash"][:12])
+
+class ModelStore:
+    def __init__(self, root):
+        self.root = root
+
+    def _dir(self, name, version=None):
+        return os.path.join(self.root, name) if version is None else os.path.join(self.root, name, version)
+
+    #Metadata of every version of name, oldest first
+    def versions(self, name):
+        if not os.path.isdir(self._dir(name)):
+            return []
+        result = []
+        for version in sorted(os.listdir(self._dir(name))):
+            path = os.path.join(self._dir(name, version), METADATA)
+            if version.startswith("v") and os.path.isfile(path):
+                with open(path) as f:
+                    result.append(json.load(f))
+        return result
+
+    def current(self, name):
+        try:
+            with open(os.path.join(self._dir(name), CURRENT)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def metadata(self, name, version=None):
+        version = version or self.current(name)
+        if version is None:
+            raise LookupError("No saved versions of %r in %s" % (name, self.root))
+        path = os.path.join(self._dir(name, version), METADATA)
+        if not os.path.isfile(path):
+            raise LookupError("No version %r of %r in %s" % (version, name, self.root))
+        with open(path) as f:
+            return json.load(f)
+
+    #Makes version the one load() returns by default
+    def activate(self, name, version):
+        self.metadata(name, version) #Raises LookupError for unknown versions
+        handle, tmp_path = tempfile.mkstemp(dir=self._dir(name), prefix=".CURRENT-")
+        with os.fdopen(handle, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self._dir(name), CURRENT))
+        return version
+
+    #Goes back to the given version or, by default, to the newest version older than the current one. Versions after
+    #it are kept, so a rollback can be undone with activate()
+    def rollback(self, name, version=None):
+        if version is None:
+            current = self.current(name)
+            older = [v["version"] for v in self.versions(name) if current is None or v["version"] < current]
+            if not older:
+                raise LookupError("No version of %r older than %s to roll back to" % (name, current))
+            version = older[-1]
+        return self.activate(name, version)
+
+    #Saves pipeline (may be None) and model as a new version and, if activate, makes it CURRENT. metadata is any
+    #JSON-serializable dict (metrics, parameters, data version...). Returns the version's metadata
+    def save(self, name, pipeline, model, metadata=None, activate=True):
+        import joblib
+
+        os.makedirs(self._dir(name), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self._dir(name), prefix=".tmp-")
+        try:
+            if pipeline is not None:
+                joblib.dump(pipeline, os.path.join(tmp_dir, "pipeline.joblib")) #Uncompressed: mmap-able
+            joblib.dump(model, os.path.join(tmp_dir, "model.joblib"))
+            if _trees(model) is not None:
+                FlatForest.from_estimator(model).save(os.path.join(tmp_dir, "forest"))
+            files = _file_hashes(tmp_dir)
+            content_hash = _content_hash(files)
+            for existing in self.versions(name):
+                if existing["content_hash"] == content_hash:
+                    shutil.rmtree(tmp_dir)
+                    if activate:
+                        self.activate(name, existing["version"])
+                    return existing
+
+            info = {"name": name, "version": None, "parent": self.current(name),
+                    "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                    "content_hash": content_hash, "model": type(model).__name__,
+                    "pipeline": None if pipeline is None else type(pipeline).__name__,
+                    "environment": _environment(), "metadata": metadata or {}, "files": files}
+            number = len(self.versions(name)) + 1
+            while True: #Another process may take the same number: os.rename() fails on non-empty directories
+                info["version"] = "v%04d" % number
+                with open(os.path.join(tmp_dir, METADATA), "w") as f:
+                    json.dump(info, f, indent=2, default=str)
+                try:
+                    os.rename(tmp_dir, self._dir(name, info["version"]))
+                    break
+                except OSError:
+                    if not os.path.isdir(self._dir(name, info["version"])):
+                        raise
+                    number += 1
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(name, info["version"])
+        return info
+
+    #Recomputes the hashes of a version's files. Raises ValueError naming the files that changed
+    def verify(self, name, version=None):
+        info = self.metadata(name, version)
+        files = _file_hashes(self._dir(name, info["version"]))
+        changed = sorted(set(files) ^ set(info["files"]) |
+                         {path for path in files if path in info["files"] and files[path] != info["files"][path]})
+        if changed or _content_hash(files) != info["content_hash"]:
+            raise ValueError("Version %s of %r doesn't match its content hash: %s changed"
+                             % (info["version"], name, ", ".join(changed) or "metadata"))
+        return info
+
+    #The CURRENT version (or the given one) of name. verify=True checks the content hash first, which reads every file
+    def load(self, name, version=None, mmap_mode="r", verify=False):
+        info = self.verify(name, version) if verify else self.metadata(name, version)
+        return Artifact(self._dir(name, info["version"]), info, mmap_mode)
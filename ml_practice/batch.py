@@ -0,0 +1,567 @@
+import os
+import sys
+import json
+import time
+import pickle
+import runpy
+import argparse
+import contextlib
+import multiprocessing
+
+import numpy as np
+
+from ml_practice import profiling
+
+#Headless batch runner for the chapter pipelines
+#
+#The chapter scripts stop at every plt.show() until the window is closed, and render each figure in between the
+#computations. Here everything runs on the non-interactive Agg backend and every figure is handed over to a background
+#process that renders it to a file (pickling a figure takes a few ms, rendering it to PNG ~100 ms), so training goes on
+#while the figures are written. Two ways of running:
+#
+#   python -m ml_practice run housing --skip grid_search --output runs/housing     (stages below, selectable)
+#   python -m ml_practice run mnist --stages load binary_sgd precision_recall --n-train 10000
+#   python -m ml_practice script Chapter_3/MNIST.py --output runs/mnist            (a chapter script as it is)
+#   python -m ml_practice list                                                     (pipelines and their stages)
+#   python -m ml_practice models runs/housing/models housing --rollback            (saved model versions)
+#
+#"run" executes the stages of a pipeline in order, each one inside a profiling span, and writes the metrics of every
+#stage to <output>/results.json. --stages keeps only the given stages and --skip drops some; a stage that needs a value
+#made by a stage that doesn't run is reported before anything starts. "script" runs the script unchanged with
+#plt.show() replaced by "save the open figures". The housing pipeline ends by saving the fitted pipeline and the final
+#model as a new version in <output>/models (--model-store), which "models" lists and rolls back
+
+#Renders pickled figures to files, in a background process (workers >= 1) or right away in this one (workers=0)
+class FigureWriter:
+    def __init__(self, directory, workers=1, dpi=100, fmt="png"):
+        self.directory = directory
+        self.dpi = dpi
+        self.fmt = fmt
+        self.count = 0
+        self.futures = []
+        self.paths = []
+        os.makedirs(directory, exist_ok=True)
+        #spawn: forking a process that has BLAS/OpenMP threads running can deadlock. A Pool starts its processes right
+        #away, before run_script() makes the chapter script __main__ (which spawned processes would run again)
+        self.pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 0 else None
+
+    def submit(self, figure, name=None):
+        import matplotlib.pyplot as plt
+
+        self.count += 1
+        path = os.path.join(self.directory, "%03d_%s.%s" % (self.count, name or "figure", self.fmt))
+        if self.pool is None:
+            figure.savefig(path, dpi=self.dpi)
+            self.paths.append(path)
+        else:
+            self.futures.append(self.pool.apply_async(_render, (pickle.dumps(figure), path, self.dpi)))
+        plt.close(figure)
+        return path
+
+    #Hands over every open pyplot figure (what plt.show() would have displayed)
+    def submit_open_figures(self, name=None):
+        import matplotlib.pyplot as plt
+
+        for number in plt.get_fignums():
+            figure = plt.figure(number)
+            label = figure.get_label() or (figure.axes[0].get_title() if figure.axes else "")
+            self.submit(figure, _slug(name or label or "figure"))
+
+    #Waits for the background renders and returns the paths of every file written
+    def close(self):
+        if self.pool is not None:
+            self.paths.extend(future.get() for future in self.futures)
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        return self.paths
+
+def _render(data, path, dpi):
+    import matplotlib
+    matplotlib.use("Agg")
+
+    pickle.loads(data).savefig(path, dpi=dpi)
+    return path
+
+def _slug(text):
+    return "".join(c if c.isalnum() else "_" for c in text.lower()).strip("_")[:60] or "figure"
+
+#Switches Matplotlib to Agg and replaces plt.show() with figure_writer.submit_open_figures() until the block ends
+@contextlib.contextmanager
+def headless(figure_writer):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    show = plt.show
+    plt.show = lambda *args, **kwargs: figure_writer.submit_open_figures()
+    try:
+        yield
+    finally:
+        plt.show = show
+
+#One step of a pipeline: a function taking and updating the shared context dict. requires are the context keys it
+#reads (made by earlier stages or by the command line), provides the ones it adds
+class Stage:
+    def __init__(self, name, function, requires=(), provides=()):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+
+def _rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((np.asarray(y_true) - np.asarray(y_pred)) ** 2)))
+
+#Chapter 2: housing prices
+
+def _housing_load(ctx):
+    from ml_practice.housing import fetch_housing_data, load_housing_data
+
+    if not os.path.isfile(os.path.join(ctx["housing_path"], "housing.csv")):
+        fetch_housing_data(housing_path=ctx["housing_path"])
+    ctx["housing_data"] = load_housing_data(ctx["housing_path"])
+    return {"n_districts": len(ctx["housing_data"])}
+
+def _housing_explore(ctx):
+    import matplotlib.pyplot as plt
+    from pandas.plotting import scatter_matrix
+
+    housing = ctx["housing_data"]
+    housing.hist(bins=50, figsize=(20, 15))
+    ctx["figures"].submit(plt.gcf(), "histograms")
+    housing.plot(kind="scatter", x="longitude", y="latitude", alpha=0.4, s=housing["population"] / 100,
+                 label="population", figsize=(10, 7), c="median_house_value", cmap=plt.get_cmap("jet"),
+                 colorbar=True)
+    ctx["figures"].submit(plt.gcf(), "geographic_scatter")
+    scatter_matrix(housing[["median_house_value", "median_income", "total_rooms", "housing_median_age"]],
+                   figsize=(12, 8))
+    ctx["figures"].submit(plt.gcf(), "scatter_matrix")
+    corr = housing.drop("ocean_proximity", axis=1).corr()["median_house_value"]
+    return {"correlations": corr.sort_values(ascending=False).round(4).to_dict()}
+
+def _housing_split(ctx):
+    from ml_practice.housing import stratified_split
+
+    ctx["strat_train_set"], ctx["strat_test_set"] = stratified_split(ctx["housing_data"])
+    return {"n_train": len(ctx["strat_train_set"]), "n_test": len(ctx["strat_test_set"])}
+
+def _housing_prepare(ctx):
+    from ml_practice.housing import make_full_pipeline
+
+    housing = ctx["strat_train_set"].drop("median_house_value", axis=1)
+    ctx["housing_labels"] = ctx["strat_train_set"]["median_house_value"].copy()
+    ctx["full_pipeline"] = make_full_pipeline(list(housing.drop("ocean_proximity", axis=1)))
+    ctx["housing_prepared"] = ctx["full_pipeline"].fit_transform(housing)
+    return {"prepared_shape": list(ctx["housing_prepared"].shape)}
+
+def _housing_model(key, make_model):
+    def stage(ctx):
+        model = make_model()
+        model.fit(ctx["housing_prepared"], ctx["housing_labels"])
+        ctx[key] = model
+        return {"train_rmse": _rmse(ctx["housing_labels"], model.predict(ctx["housing_prepared"]))}
+    return stage
+
+def _linear_regression():
+    from sklearn.linear_model import LinearRegression
+    return LinearRegression()
+
+def _decision_tree():
+    from sklearn.tree import DecisionTreeRegressor
+    return DecisionTreeRegressor(random_state=42)
+
+def _random_forest():
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=100, random_state=42)
+
+def _housing_cross_validation(ctx):
+    from sklearn.model_selection import cross_val_score
+
+    results = {}
+    for key in ("lin_reg", "tree_reg", "forest_reg"):
+        if key in ctx:
+            scores = cross_val_score(ctx[key], ctx["housing_prepared"], ctx["housing_labels"],
+                                     scoring="neg_mean_squared_error", cv=ctx["cv"])
+            rmse_scores = np.sqrt(-scores)
+            results[key] = {"mean": float(rmse_scores.mean()), "std": float(rmse_scores.std())}
+    return results
+
+#The grid search of Housing.py on AsyncSearch: most expensive fits first, every fit logged to ctx["search_log"] so
+#an interrupted run picks up where it stopped
+def _housing_grid_search(ctx):
+    from sklearn.ensemble import RandomForestRegressor
+    from ml_practice.search import AsyncSearch
+
+    param_grid = [
+        {'n_estimators': [3, 10, 30], 'max_features': [2, 4, 6, 8]},
+        {'bootstrap': [False], 'n_estimators': [3, 10], 'max_features': [2, 3, 4]},
+    ]
+    grid_search = AsyncSearch(RandomForestRegressor(random_state=42), param_grid, cv=5, log_path=ctx["search_log"])
+    grid_search.fit(ctx["housing_prepared"], ctx["housing_labels"])
+    ctx["final_model"] = grid_search.best_estimator_
+    return {"best_params": grid_search.best_params_, "best_rmse": float(np.sqrt(-grid_search.best_score_))}
+
+def _housing_evaluate(ctx):
+    final_model = ctx.get("final_model") or ctx.get("forest_reg") or ctx.get("lin_reg")
+    if final_model is None:
+        raise RuntimeError("evaluate needs a trained model: run grid_search, random_forest or linear_regression")
+    X_test = ctx["strat_test_set"].drop("median_house_value", axis=1)
+    y_test = ctx["strat_test_set"]["median_house_value"].copy()
+    final_predictions = final_model.predict(ctx["full_pipeline"].transform(X_test))
+    ctx["test_rmse"] = _rmse(y_test, final_predictions)
+    return {"model": type(final_model).__name__, "test_rmse": ctx["test_rmse"]}
+
+#Input drift of the test set against the training set (the monitoring the closing notes of Housing.py ask for)
+def _housing_monitor(ctx):
+    from ml_practice.drift import DriftMonitor
+
+    monitor = DriftMonitor.fit(ctx["strat_train_set"].drop("median_house_value", axis=1))
+    monitor.update(ctx["strat_test_set"].drop("median_house_value", axis=1))
+    scores = monitor.scores()
+    return {"psi": {column: round(s["psi"], 4) for column, s in scores.items()}, "alerts": monitor.alerts(scores)}
+
+def _housing_save(ctx):
+    from ml_practice.artifacts import ModelStore
+
+    final_model = ctx.get("final_model") or ctx.get("forest_reg") or ctx.get("lin_reg")
+    if final_model is None:
+        raise RuntimeError("save needs a trained model: run grid_search, random_forest or linear_regression")
+    metadata = {"test_rmse": ctx["test_rmse"]} if "test_rmse" in ctx else {}
+    saved = ModelStore(ctx["model_store"]).save("housing", ctx["full_pipeline"], final_model, metadata)
+    return {"version": saved["version"], "content_hash": saved["content_hash"]}
+
+HOUSING_STAGES = [
+    Stage("load", _housing_load, ["housing_path"], ["housing_data"]),
+    Stage("explore", _housing_explore, ["housing_data"]),
+    Stage("split", _housing_split, ["housing_data"], ["strat_train_set", "strat_test_set"]),
+    Stage("prepare", _housing_prepare, ["strat_train_set"], ["housing_prepared", "housing_labels", "full_pipeline"]),
+    Stage("linear_regression", _housing_model("lin_reg", _linear_regression), ["housing_prepared"], ["lin_reg"]),
+    Stage("decision_tree", _housing_model("tree_reg", _decision_tree), ["housing_prepared"], ["tree_reg"]),
+    Stage("random_forest", _housing_model("forest_reg", _random_forest), ["housing_prepared"], ["forest_reg"]),
+    Stage("cross_validation", _housing_cross_validation, ["housing_prepared"]),
+    Stage("grid_search", _housing_grid_search, ["housing_prepared"], ["final_model"]),
+    Stage("evaluate", _housing_evaluate, ["full_pipeline", "strat_test_set"]),
+    Stage("monitor", _housing_monitor, ["strat_train_set", "strat_test_set"]),
+    Stage("save", _housing_save, ["full_pipeline"]),
+]
+
+#Chapter 3: MNIST
+
+def _mnist_load(ctx):
+    from ml_practice.mnist import fetch_mnist, split_mnist
+
+    X, y = fetch_mnist()
+    X_train, X_test, y_train, y_test = split_mnist(X, y)
+    n_train = ctx.get("n_train") or len(X_train)
+    ctx.update(X_train=X_train[:n_train], X_test=X_test, y_train=y_train[:n_train], y_test=y_test)
+    ctx["y_train_5"] = (ctx["y_train"] == 5)
+    return {"n_train": n_train, "n_test": len(X_test)}
+
+def _mnist_plot_digit(ctx):
+    import matplotlib.pyplot as plt
+    from ml_practice.mnist import plot_digit
+
+    plt.figure()
+    plot_digit(ctx["X_train"][0])
+    ctx["figures"].submit(plt.gcf(), "some_digit")
+    return {"label": int(ctx["y_train"][0])}
+
+def _mnist_binary_sgd(ctx):
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.metrics import confusion_matrix, precision_score, recall_score, f1_score
+    from sklearn.model_selection import cross_val_predict
+
+    ctx["sgd_clf"] = SGDClassifier(random_state=42)
+    y_train_pred = cross_val_predict(ctx["sgd_clf"], ctx["X_train"], ctx["y_train_5"], cv=3)
+    return {"confusion_matrix": confusion_matrix(ctx["y_train_5"], y_train_pred).tolist(),
+            "precision": float(precision_score(ctx["y_train_5"], y_train_pred)),
+            "recall": float(recall_score(ctx["y_train_5"], y_train_pred)),
+            "f1": float(f1_score(ctx["y_train_5"], y_train_pred))}
+
+def _mnist_precision_recall(ctx):
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import precision_recall_curve
+    from sklearn.model_selection import cross_val_predict
+    from ml_practice.mnist import plot_precision_recall_vs_threshold
+
+    ctx["y_scores"] = cross_val_predict(ctx["sgd_clf"], ctx["X_train"], ctx["y_train_5"], cv=3,
+                                        method="decision_function")
+    precisions, recalls, thresholds = precision_recall_curve(ctx["y_train_5"], ctx["y_scores"])
+    plt.figure()
+    plot_precision_recall_vs_threshold(precisions, recalls, thresholds)
+    ctx["figures"].submit(plt.gcf(), "precision_recall_vs_threshold")
+    plt.figure()
+    plt.plot(recalls, precisions)
+    ctx["figures"].submit(plt.gcf(), "precision_vs_recall")
+    threshold_90 = float(thresholds[np.argmax(precisions >= 0.90)])
+    return {"threshold_90_precision": threshold_90}
+
+def _mnist_roc(ctx):
+    import matplotlib.pyplot as plt
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import roc_curve, roc_auc_score
+    from sklearn.model_selection import cross_val_predict
+    from ml_practice.mnist import plot_roc_curve
+
+    fpr, tpr, _ = roc_curve(ctx["y_train_5"], ctx["y_scores"])
+    y_probas_forest = cross_val_predict(RandomForestClassifier(random_state=42), ctx["X_train"], ctx["y_train_5"],
+                                        cv=3, method="predict_proba")
+    y_scores_forest = y_probas_forest[:, 1]
+    fpr_forest, tpr_forest, _ = roc_curve(ctx["y_train_5"], y_scores_forest)
+    plt.figure()
+    plt.plot(fpr, tpr, "b:", label="SGD")
+    plot_roc_curve(fpr_forest, tpr_forest, "Random Forest")
+    plt.legend(loc="lower right")
+    ctx["figures"].submit(plt.gcf(), "roc_curves")
+    return {"sgd_auc": float(roc_auc_score(ctx["y_train_5"], ctx["y_scores"])),
+            "forest_auc": float(roc_auc_score(ctx["y_train_5"], y_scores_forest))}
+
+def _mnist_multiclass(ctx):
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.model_selection import cross_val_predict
+    from sklearn.preprocessing import StandardScaler
+
+    X_train_scaled = StandardScaler().fit_transform(ctx["X_train"].astype(np.float64))
+    ctx["y_train_pred"] = cross_val_predict(SGDClassifier(random_state=42), X_train_scaled, ctx["y_train"], cv=3)
+    return {"accuracy": float((ctx["y_train_pred"] == ctx["y_train"]).mean())}
+
+def _mnist_error_analysis(ctx):
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import confusion_matrix
+
+    conf_mx = confusion_matrix(ctx["y_train"], ctx["y_train_pred"])
+    norm_conf_mx = conf_mx / conf_mx.sum(axis=1, keepdims=True)
+    np.fill_diagonal(norm_conf_mx, 0)
+    plt.matshow(conf_mx, cmap=plt.cm.gray)
+    ctx["figures"].submit(plt.gcf(), "confusion_matrix")
+    plt.matshow(norm_conf_mx, cmap=plt.cm.gray)
+    ctx["figures"].submit(plt.gcf(), "normalized_errors")
+    return {"confusion_matrix": conf_mx.tolist()}
+
+MNIST_STAGES = [
+    Stage("load", _mnist_load, [], ["X_train", "y_train", "y_train_5"]),
+    Stage("plot_digit", _mnist_plot_digit, ["X_train"]),
+    Stage("binary_sgd", _mnist_binary_sgd, ["X_train", "y_train_5"], ["sgd_clf"]),
+    Stage("precision_recall", _mnist_precision_recall, ["sgd_clf"], ["y_scores"]),
+    Stage("roc", _mnist_roc, ["y_scores"]),
+    Stage("multiclass", _mnist_multiclass, ["X_train", "y_train"], ["y_train_pred"]),
+    Stage("error_analysis", _mnist_error_analysis, ["y_train_pred"]),
+]
+
+#Chapter 4: linear regression on generated data
+
+def _linear_data(ctx):
+    rnd = np.random.RandomState(ctx["random_state"])
+    X = 2 * rnd.rand(100, 1)
+    ctx["X"], ctx["y"] = X, 4 + 3 * X + rnd.randn(100, 1)
+    ctx["X_b"] = np.c_[np.ones((100, 1)), X]
+    X_quad = 6 * rnd.rand(100, 1) - 3
+    ctx["X_quad"], ctx["y_quad"] = X_quad, 0.5 * X_quad**2 + X_quad + 2 + rnd.randn(100, 1)
+    return {}
+
+def _normal_equation(ctx):
+    theta_best = np.linalg.inv(ctx["X_b"].T.dot(ctx["X_b"])).dot(ctx["X_b"].T).dot(ctx["y"])
+    return {"theta": theta_best.ravel().tolist()}
+
+def _gradient_descent(ctx):
+    from ml_practice.linear_models import batch_gradient_descent, stochastic_gradient_descent
+
+    return {"batch_theta": batch_gradient_descent(ctx["X_b"], ctx["y"]).ravel().tolist(),
+            "stochastic_theta": stochastic_gradient_descent(ctx["X_b"], ctx["y"]).ravel().tolist()}
+
+def _polynomial(ctx):
+    import matplotlib.pyplot as plt
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import PolynomialFeatures
+
+    X_poly = PolynomialFeatures(degree=2, include_bias=False).fit_transform(ctx["X_quad"])
+    lin_reg = LinearRegression().fit(X_poly, ctx["y_quad"])
+    plt.figure()
+    plt.plot(ctx["X_quad"], ctx["y_quad"], "b.")
+    X_new = np.linspace(-3, 3, 100).reshape(100, 1)
+    plt.plot(X_new, lin_reg.predict(np.c_[X_new, X_new**2]), "r-", linewidth=2)
+    ctx["figures"].submit(plt.gcf(), "polynomial_regression")
+    return {"intercept": lin_reg.intercept_.tolist(), "coef": lin_reg.coef_.ravel().tolist()}
+
+def _learning_curves(ctx):
+    import matplotlib.pyplot as plt
+    from sklearn.linear_model import LinearRegression
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import PolynomialFeatures
+    from ml_practice.linear_models import plot_learning_curves
+
+    models = {"linear": LinearRegression(),
+              "polynomial_10": Pipeline([("poly_features", PolynomialFeatures(degree=10, include_bias=False)),
+                                         ("lin_reg", LinearRegression())])}
+    for name, model in models.items():
+        plt.figure()
+        plot_learning_curves(model, ctx["X_quad"], ctx["y_quad"])
+        ctx["figures"].submit(plt.gcf(), "learning_curves_" + name)
+    return {}
+
+LINEAR_REGRESSION_STAGES = [
+    Stage("data", _linear_data, ["random_state"], ["X_b", "y", "X_quad", "y_quad"]),
+    Stage("normal_equation", _normal_equation, ["X_b", "y"]),
+    Stage("gradient_descent", _gradient_descent, ["X_b", "y"]),
+    Stage("polynomial", _polynomial, ["X_quad", "y_quad"]),
+    Stage("learning_curves", _learning_curves, ["X_quad", "y_quad"]),
+]
+
+PIPELINES = {
+    "housing": HOUSING_STAGES,
+    "mnist": MNIST_STAGES,
+    "linear_regression": LINEAR_REGRESSION_STAGES,
+}
+
+#The stages of a pipeline left after --stages/--skip, in pipeline order. Raises ValueError for unknown stage names and
+#for stages that need a context key that no selected stage (or the initial context) provides
+def select_stages(pipeline, stages=None, skip=(), initial_keys=()):
+    all_stages = PIPELINES[pipeline]
+    names = [stage.name for stage in all_stages]
+    for name in list(stages or []) + list(skip):
+        if name not in names:
+            raise ValueError("Unknown stage %r for pipeline %r (stages: %s)" % (name, pipeline, ", ".join(names)))
+    selected = [stage for stage in all_stages
+                if (not stages or stage.name in stages) and stage.name not in skip]
+
+    available = set(initial_keys)
+    for stage in selected:
+        missing = [key for key in stage.requires if key not in available]
+        if missing:
+            providers = [other.name for other in all_stages if set(missing) & set(other.provides)]
+            raise ValueError("Stage %r needs %s, made by stage(s) %s which won't run"
+                             % (stage.name, ", ".join(missing), ", ".join(providers) or "-"))
+        available.update(stage.provides)
+    return selected
+
+#The context the stages start from: the defaults, overridden by the options that are not None
+def _initial_context(output_dir, **options):
+    ctx = {"housing_path": os.path.join("datasets", "housing"), "cv": 10, "random_state": 42, "n_train": None,
+           "model_store": os.path.join(output_dir, "models"),
+           "search_log": os.path.join(output_dir, "grid_search.jsonl")}
+    ctx.update((key, value) for key, value in options.items() if value is not None)
+    return ctx
+
+#Runs the selected stages with figures rendered in the background. Returns {stage: {"seconds": ..., metrics...}}
+def run_pipeline(pipeline, output_dir, stages=None, skip=(), figure_workers=1, **options):
+    ctx = _initial_context(output_dir, **options)
+    selected = select_stages(pipeline, stages, skip, initial_keys=ctx)
+    figure_writer = FigureWriter(os.path.join(output_dir, "figures"), workers=figure_workers)
+    ctx["figures"] = figure_writer
+
+    results = {}
+    try:
+        with headless(figure_writer):
+            for stage in selected:
+                print("[%s] %s..." % (pipeline, stage.name), file=sys.stderr)
+                start = time.perf_counter()
+                with profiling.span(stage.name, stage=pipeline):
+                    metrics = stage.function(ctx) or {}
+                results[stage.name] = dict(metrics, seconds=time.perf_counter() - start)
+    finally:
+        start = time.perf_counter()
+        figures = figure_writer.close()
+        results["figures"] = {"paths": figures, "wait_seconds": time.perf_counter() - start}
+
+    with open(os.path.join(output_dir, "results.json"), "w") as output:
+        json.dump(results, output, indent=2, default=str)
+    return results
+
+#Runs a chapter script unchanged (as __main__, from its own folder) with every plt.show() saving the open figures
+def run_script(path, output_dir, figure_workers=1):
+    path = os.path.abspath(path)
+    figure_writer = FigureWriter(os.path.abspath(os.path.join(output_dir, "figures")), workers=figure_workers)
+    cwd = os.getcwd()
+    sys.path.insert(0, os.path.dirname(path))
+    os.chdir(os.path.dirname(path))
+    try:
+        with headless(figure_writer):
+            runpy.run_path(path, run_name="__main__")
+            figure_writer.submit_open_figures()
+    finally:
+        sys.path.remove(os.path.dirname(path))
+        os.chdir(cwd)
+        figures = figure_writer.close()
+    return figures
+
+def _models_command(parser, args):
+    from ml_practice.artifacts import ModelStore
+
+    store = ModelStore(args.store)
+    try:
+        if args.rollback is not None:
+            version = store.rollback(args.name, None if args.rollback == "previous" else args.rollback)
+            print("%s: now serving %s" % (args.name, version))
+        current = store.current(args.name)
+        for info in store.versions(args.name):
+            status = ""
+            if args.verify:
+                try:
+                    store.verify(args.name, info["version"])
+                    status = "ok"
+                except ValueError as error:
+                    status = str(error)
+            print("%s %s  %s  %-22s %-12s %s  %s" % ("*" if info["version"] == current else " ", info["version"],
+                                                    info["created"], info["model"], info["content_hash"][:12],
+                                                    json.dumps(info["metadata"]), status))
+    except LookupError as error:
+        parser.error(str(error))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_practice",
+                                     description="Run the chapter pipelines headless, with figures saved to files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the stages of a pipeline")
+    run.add_argument("pipeline", choices=list(PIPELINES))
+    run.add_argument("--stages", nargs="+", default=None, help="Only run these stages")
+    run.add_argument("--skip", nargs="+", default=[], help="Don't run these stages")
+    run.add_argument("--output", default=None, help="Folder for results.json and figures/ (default runs/<pipeline>)")
+    run.add_argument("--figure-workers", type=int, default=1, help="Processes rendering figures (0: render inline)")
+    run.add_argument("--housing-path", default=None, help="Folder with housing.csv (downloaded if missing)")
+    run.add_argument("--n-train", type=int, default=None, help="MNIST: use only the first N training images")
+    run.add_argument("--cv", type=int, default=None, help="Housing: cross-validation folds")
+    run.add_argument("--model-store", default=None, help="Housing: folder of saved models (default <output>/models)")
+
+    script = commands.add_parser("script", help="Run a chapter script with plt.show() saving figures")
+    script.add_argument("path")
+    script.add_argument("--output", default=None, help="Folder for figures/ (default runs/<script name>)")
+    script.add_argument("--figure-workers", type=int, default=1)
+
+    commands.add_parser("list", help="List the pipelines and their stages")
+
+    models = commands.add_parser("models", help="List the saved versions of a model, or roll back")
+    models.add_argument("store", help="Folder of the model store")
+    models.add_argument("name", nargs="?", default="housing")
+    models.add_argument("--rollback", nargs="?", const="previous", default=None, metavar="VERSION",
+                        help="Serve VERSION (default: the version before the current one)")
+    models.add_argument("--verify", action="store_true", help="Check the content hash of every version")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, stages in PIPELINES.items():
+            print("%s: %s" % (name, " ".join(stage.name for stage in stages)))
+        return 0
+    if args.command == "models":
+        return _models_command(parser, args)
+    if args.command == "script":
+        output = args.output or os.path.join("runs", os.path.splitext(os.path.basename(args.path))[0])
+        for path in run_script(args.path, output, args.figure_workers):
+            print(path)
+        return 0
+
+    output = args.output or os.path.join("runs", args.pipeline)
+    options = dict(housing_path=args.housing_path, n_train=args.n_train, cv=args.cv, model_store=args.model_store)
+    #Only a bad --stages/--skip is a usage error: errors raised by the stages themselves propagate with their traceback
+    try:
+        select_stages(args.pipeline, args.stages, args.skip, initial_keys=_initial_context(output, **options))
+    except ValueError as error:
+        parser.error(str(error))
+    os.makedirs(output, exist_ok=True)
+    results = run_pipeline(args.pipeline, output, args.stages, args.skip, args.figure_workers, **options)
+    for stage, metrics in results.items():
+        if stage != "figures":
+            print("%-20s %8.2fs  %s" % (stage, metrics.pop("seconds"), json.dumps(metrics, default=str)[:100]))
+    print("%d figures written to %s" % (len(results["figures"]["paths"]), os.path.join(output, "figures")))
+    return 0
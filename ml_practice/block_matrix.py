@@ -0,0 +1,107 @@
+import numpy as np
+
+#Output of the housing full_pipeline as two blocks instead of one matrix: the dense numerical features and, for every
+#categorical attribute, the integer code of its category
+#
+#The ColumnTransformer stacks the dense num block and the one-hot cat block into one matrix: dense when it is dense
+#enough (one float64 per category per row), sparse CSR otherwise (an 8-byte value and a 4-byte index per row, plus
+#scipy overhead on every product). The one-hot part holds no information beyond the category codes, so BlockMatrix
+#keeps only those:
+#   - dense:  (n, d) float64, the scaled numerical features
+#   - codes:  (n, c) int32, the column of the category inside the one-hot block of every categorical attribute (-1 for
+#             unknown categories, which one-hot encode to all zeros)
+#and lets models use them directly:
+#   - linear models: blocks.dot(coef) = dense @ coef[:d] + the coefficient of each row's category, gathered from
+#                    coef[d:] like an embedding lookup (no one-hot matrix is built)
+#   - tree models:   blocks.ordinal() = [dense, codes], each categorical attribute as one integer feature instead of
+#                    one column per category
+#toarray() and tocsr() give the matrix of full_pipeline.transform() when something needs it
+#
+#   plan = compile_full_pipeline(full_pipeline)       #ml_practice/transform_plan.py
+#   blocks = plan.transform_blocks(housing)
+#   lin_reg.predict(housing_prepared) == blocks.dot(lin_reg.coef_) + lin_reg.intercept_
+
+class BlockMatrix:
+    #cardinalities: number of categories (one-hot columns) of every categorical attribute, in codes column order.
+    #dense_names/categorical_names: feature names of the dense columns and of the categorical attributes
+    def __init__(self, dense, codes, cardinalities, dense_names=None, categorical_names=None):
+        self.dense = np.asarray(dense, dtype=np.float64)
+        self.codes = np.asarray(codes, dtype=np.int32).reshape(len(self.dense), -1)
+        self.cardinalities = [int(k) for k in cardinalities]
+        self.dense_names = list(dense_names) if dense_names is not None else None
+        self.categorical_names = list(categorical_names) if categorical_names is not None else None
+        #Position of the first one-hot column of every categorical attribute in the full matrix
+        self.offsets = self.dense.shape[1] + np.r_[0, np.cumsum(self.cardinalities)[:-1]].astype(np.int64)
+
+    @property
+    def shape(self):
+        return len(self.dense), self.dense.shape[1] + sum(self.cardinalities)
+
+    @property
+    def nbytes(self):
+        return self.dense.nbytes + self.codes.nbytes
+
+    def __len__(self):
+        return len(self.dense)
+
+    #Rows (an index array, a boolean mask or a slice), e.g. for cross-validation folds
+    def take(self, rows):
+        return BlockMatrix(self.dense[rows], self.codes[rows], self.cardinalities, self.dense_names,
+                           self.categorical_names)
+
+    #Column of the full matrix holding a 1 for every (row, categorical attribute), or -1 for unknown categories
+    def _onehot_columns(self):
+        return np.where(self.codes >= 0, self.codes + self.offsets, -1)
+
+    #Product with a vector (n_features,) or matrix (n_features, k) laid out like the full matrix's columns
+    def dot(self, coef):
+        coef = np.asarray(coef, dtype=np.float64)
+        d = self.dense.shape[1]
+        result = self.dense @ coef[:d]
+        columns = self._onehot_columns()
+        for j in range(columns.shape[1]):
+            known = columns[:, j] >= 0
+            gathered = coef[np.maximum(columns[:, j], 0)]
+            if known.all():
+                result += gathered
+            else:
+                result += np.where(known.reshape((-1,) + (1,) * (coef.ndim - 1)), gathered, 0.0)
+        return result
+
+    #Dense numerical features followed by one integer feature (the code, as float) per categorical attribute
+    def ordinal(self):
+        return np.c_[self.dense, self.codes.astype(np.float64)]
+
+    def ordinal_feature_names(self):
+        return (self.dense_names or ["x%d" % i for i in range(self.dense.shape[1])]) + \
+               (self.categorical_names or ["cat%d" % j for j in range(len(self.cardinalities))])
+
+    #The one-hot matrix, like full_pipeline.transform()
+    def toarray(self):
+        result = np.zeros(self.shape)
+        result[:, :self.dense.shape[1]] = self.dense
+        rows, attributes = np.nonzero(self.codes >= 0)
+        result[rows, self._onehot_columns()[rows, attributes]] = 1.0
+        return result
+
+    def tocsr(self):
+        from scipy import sparse
+
+        return sparse.hstack([sparse.csr_matrix(self.dense), self._onehot_csr()], format="csr")
+
+    def _onehot_csr(self):
+        from scipy import sparse
+
+        rows, attributes = np.nonzero(self.codes >= 0)
+        columns = self._onehot_columns()[rows, attributes] - self.dense.shape[1]
+        return sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(self), sum(self.cardinalities)))
+
+    def __repr__(self):
+        return "BlockMatrix(%d rows: %d dense + %d categorical -> %d one-hot columns, %.1f MB)" % (
+            len(self), self.dense.shape[1], len(self.cardinalities), sum(self.cardinalities), self.nbytes / 1e6)
+
+#Bytes of the same data as a dense one-hot matrix, a CSR matrix (int32 indices) and a BlockMatrix
+def memory_report(blocks):
+    n, n_features = blocks.shape
+    nnz = blocks.dense.size + int(np.count_nonzero(blocks.codes >= 0))
+    return {"dense": n * n_features * 8, "csr": nnz * 12 + (n + 1) * 4, "blocks": blocks.nbytes}
@@ -0,0 +1,113 @@
+import numpy as np
+
+#Correlation matrix built in one pass over chunks, to which new columns can be added without starting over
+#
+#Housing.py calls housing.corr(), adds rooms_per_household, bedrooms_per_room and population_per_household, and calls
+#housing.corr() again on everything. CorrelationMatrix keeps, for every pair of columns (i, j), the sums over the rows
+#where both are present:
+#   N[i, j] = count,  SX[i, j] = sum x_i,  SXX[i, j] = sum x_i^2,  SXY[i, j] = sum x_i x_j
+#which give the same pairwise-complete Pearson correlations as DataFrame.corr(). The sums of a chunk are a few matrix
+#products (O(n k^2)), chunks are added up, and adding m columns only computes the blocks that involve them
+#(O(n k m)) instead of the whole matrix again:
+#
+#   correlations = CorrelationMatrix().update(housing)             #Or update() chunk after chunk
+#   correlations.corrwith("median_house_value")                    #corr_matrix["median_house_value"], sorted
+#   housing["rooms_per_household"] = housing["total_rooms"] / housing["households"]
+#   correlations.add_columns(housing, ["rooms_per_household"])     #The same rows, in the same order
+#
+#Values are shifted by a per-column constant (the mean of the first chunk) before being summed, which keeps the
+#variances accurate for columns with a large mean and a small spread (longitude, latitude)
+
+#Values with NaNs replaced by 0 and the presence mask, both as float64
+def _masked(X, shift):
+    present = ~np.isnan(X)
+    return np.where(present, X - shift, 0.0), present.astype(np.float64)
+
+#Pair sums between the columns of A (rows of the blocks) and those of B (columns of the blocks)
+def _pair_sums(A, mask_a, B, mask_b):
+    return {"N": mask_a.T @ mask_b, "SX": A.T @ mask_b, "SXX": (A * A).T @ mask_b, "SXY": A.T @ B}
+
+class CorrelationMatrix:
+    def __init__(self, columns=None):
+        self.columns = list(columns) if columns is not None else None
+        self.n_rows = 0
+
+    #Numerical columns of a chunk (DataFrame) or the chunk itself (2D array, columns in self.columns order)
+    def _values(self, chunk, columns):
+        if hasattr(chunk, "columns"):
+            return chunk[columns].to_numpy(dtype=np.float64)
+        return np.asarray(chunk, dtype=np.float64).reshape(len(chunk), -1)
+
+    def _empty(self, k):
+        return {name: np.zeros((k, k)) for name in ("N", "SX", "SXX", "SXY")}
+
+    #Adds rows. The first chunk fixes the columns (its numerical ones if none were given)
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns = [column for column in chunk.columns if chunk[column].dtype.kind in "biuf"]
+        X = self._values(chunk, self.columns)
+        if not hasattr(self, "sums_"):
+            self.shift_ = np.nan_to_num(np.nanmean(X, axis=0)) if len(X) else np.zeros(len(self.columns))
+            self.sums_ = self._empty(len(self.columns))
+        X, mask = _masked(X, self.shift_)
+        for name, block in _pair_sums(X, mask, X, mask).items():
+            self.sums_[name] += block
+        self.n_rows += len(X)
+        return self
+
+    #Adds columns computed on the rows already seen, given again in the same order as one DataFrame or an iterable
+    #of DataFrame chunks, each with the existing columns and the new ones (new_columns, default: every numerical
+    #column not tracked yet). Only the blocks of pair sums that involve a new column are computed
+    def add_columns(self, chunks, new_columns=None):
+        if hasattr(chunks, "columns"):
+            chunks = [chunks]
+        blocks = ({}, {}, {}) #Pair sums old x new, new x old and new x new
+        shift, n_rows = None, 0
+        for chunk in chunks:
+            if new_columns is None:
+                new_columns = [column for column in chunk.columns
+                               if chunk[column].dtype.kind in "biuf" and column not in self.columns]
+            Y = self._values(chunk, new_columns)
+            if shift is None:
+                shift = np.nan_to_num(np.nanmean(Y, axis=0)) if len(Y) else np.zeros(len(new_columns))
+            X, mask_x = _masked(self._values(chunk, self.columns), self.shift_)
+            Y, mask_y = _masked(Y, shift)
+            chunk_blocks = (_pair_sums(X, mask_x, Y, mask_y), _pair_sums(Y, mask_y, X, mask_x),
+                            _pair_sums(Y, mask_y, Y, mask_y))
+            for total, chunk_block in zip(blocks, chunk_blocks):
+                for name, block in chunk_block.items():
+                    total[name] = total.get(name, 0) + block
+            n_rows += len(Y)
+        if n_rows != self.n_rows:
+            raise ValueError("add_columns() needs the %d rows seen so far, got %d" % (self.n_rows, n_rows))
+
+        old_new, new_old, new_new = blocks
+        for name in self.sums_:
+            self.sums_[name] = np.block([[self.sums_[name], old_new[name]], [new_old[name], new_new[name]]])
+        self.shift_ = np.r_[self.shift_, shift]
+        self.columns = self.columns + list(new_columns)
+        return self
+
+    #Pearson correlations as a (k, k) array, NaN where a pair has less than two rows or a constant column
+    def corr_array(self):
+        s = self.sums_
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = s["N"]
+            mean_x = s["SX"] / n      #Mean of column i over the rows where j is present too
+            mean_y = mean_x.T
+            covariance = s["SXY"] / n - mean_x * mean_y
+            variance_x = s["SXX"] / n - mean_x ** 2
+            variance_y = variance_x.T
+            result = covariance / np.sqrt(variance_x * variance_y)
+        result[n < 2] = np.nan
+        return np.clip(result, -1.0, 1.0)
+
+    #The correlation matrix as a DataFrame, like DataFrame.corr()
+    def corr(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.corr_array(), index=self.columns, columns=self.columns)
+
+    #Correlations of every column with one of them, sorted from highest to lowest (corr_matrix[column].sort_values())
+    def corrwith(self, column):
+        return self.corr()[column].sort_values(ascending=False)
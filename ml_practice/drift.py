@@ -0,0 +1,320 @@
+import json
+import bisect
+
+import numpy as np
+
+#Input-drift monitoring for the housing pipeline (the "monitor the system's input quality" note at the end of
+#Housing.py)
+#
+#Every monitored column is summarized by a small sketch with a fixed size, whatever the number of rows it has seen:
+#   - NumericSketch:     counts over fixed bins (the quantiles of the training data, plus one open bin below and one
+#                        above the training range), the number of missing values, and count/sum/sum of squares/min/max
+#   - CategoricalSketch: counts of the training categories, plus one bucket for categories never seen in training
+#Two sketches of the same column with the same bins are merged by adding their counts, so sketches built on different
+#batches, processes or machines combine exactly into the sketch of all their rows
+#
+#   monitor = DriftMonitor.fit(strat_train_set.drop("median_house_value", axis=1))    #Reference sketches
+#   for batch in production_batches:
+#       monitor.update(batch)                 #DataFrame, list of dicts or 2D array: searchsorted + bincount per column
+#       report = monitor.scores()             #{column: {"psi", "ks", "missing_rate", ...}}, O(bins) per column
+#       alerts = monitor.alerts()             #Columns whose PSI is above the alert threshold
+#
+#Scores compare the reference sketch with the current one (everything since fit() or the last reset()):
+#   - PSI (population stability index) = sum over bins of (p_current - p_reference) * ln(p_current / p_reference),
+#     missing values and unknown categories counting as bins of their own. Rule of thumb: < 0.1 stable, 0.1 to 0.25
+#     moderate shift, > 0.25 major shift
+#   - KS: largest difference between the two cumulative distributions, evaluated at the bin edges (numerical columns)
+#   - missing_rate, mean and mean_shift (difference of the means in reference standard deviations)
+#
+#monitor.to_dict()/DriftMonitor.from_dict() (and save()/load() to JSON) let the reference be shipped with a model and
+#the sketches of several serving processes be merged with monitor.merge(other)
+
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+_EPSILON = 1e-4 #Floor of the bin proportions in PSI, for empty bins
+
+def _psi(reference, current):
+    p = np.maximum(reference / max(reference.sum(), 1), _EPSILON)
+    q = np.maximum(current / max(current.sum(), 1), _EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+class NumericSketch:
+    #edges are the inner bin edges: len(edges) + 1 bins, the first and last ones open-ended
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self._edge_list = self.edges.tolist() #For add()
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.missing = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    #Sketch whose inner edges are the quantiles of values, so each bin holds about 1/n_bins of the data
+    @classmethod
+    def from_values(cls, values, n_bins=20):
+        values = np.asarray(values, dtype=np.float64)
+        present = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(present, np.linspace(0, 1, n_bins + 1))[1:-1]) if len(present) else []
+        return cls(edges).update(values) #The reference missing rate counts too
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        missing = np.isnan(values)
+        n_missing = int(missing.sum())
+        if n_missing:
+            values = values[~missing]
+        self.missing += n_missing
+        if len(values):
+            #side="left": a value equal to an edge goes in the bin below it, like np.quantile puts it
+            self.counts += np.bincount(np.searchsorted(self.edges, values, side="left"), minlength=len(self.counts))
+            self.count += len(values)
+            self.sum += float(values.sum())
+            self.sum_squares += float(np.dot(values, values))
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+        return self
+
+    #One value, without going through NumPy (for single records)
+    def add(self, value):
+        if value is None or value != value:
+            self.missing += 1
+            return self
+        value = float(value)
+        self.counts[bisect.bisect_left(self._edge_list, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.sum_squares += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Can't merge sketches with different bin edges")
+        self.counts += other.counts
+        self.missing += other.missing
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def empty_copy(self):
+        return NumericSketch(self.edges)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else np.nan
+
+    @property
+    def std(self):
+        if not self.count:
+            return np.nan
+        return float(np.sqrt(max(self.sum_squares / self.count - self.mean ** 2, 0.0)))
+
+    #Approximate q-quantile: linear interpolation inside the bin that contains it (the open bins use min and max)
+    def quantile(self, q):
+        if not self.count:
+            return np.nan
+        bounds = np.r_[min(self.min, self.edges[0]) if len(self.edges) else self.min, self.edges,
+                       max(self.max, self.edges[-1]) if len(self.edges) else self.max]
+        cumulative = np.r_[0, np.cumsum(self.counts)] / self.count
+        return float(np.interp(q, cumulative, bounds))
+
+    def compare(self, reference):
+        total = self.count + self.missing
+        scores = {"n": total, "missing_rate": self.missing / total if total else np.nan, "mean": self.mean}
+        scores["psi"] = _psi(np.r_[reference.counts, reference.missing], np.r_[self.counts, self.missing])
+        if self.count and reference.count:
+            scores["ks"] = float(np.max(np.abs(np.cumsum(self.counts) / self.count -
+                                               np.cumsum(reference.counts) / reference.count)))
+            scores["mean_shift"] = (self.mean - reference.mean) / reference.std if reference.std else np.nan
+        else:
+            scores["ks"] = scores["mean_shift"] = np.nan
+        return scores
+
+    def to_dict(self):
+        return {"type": "numeric", "edges": self.edges.tolist(), "counts": self.counts.tolist(),
+                "missing": self.missing, "count": self.count, "sum": self.sum, "sum_squares": self.sum_squares,
+                "min": self.min if self.count else None, "max": self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["edges"])
+        sketch.counts = np.asarray(data["counts"], dtype=np.int64)
+        sketch.missing, sketch.count = data["missing"], data["count"]
+        sketch.sum, sketch.sum_squares = data["sum"], data["sum_squares"]
+        sketch.min = np.inf if data["min"] is None else data["min"]
+        sketch.max = -np.inf if data["max"] is None else data["max"]
+        return sketch
+
+class CategoricalSketch:
+    #categories: the known categories; anything else is counted in the unknown bucket. Missing values (None/NaN) are
+    #counted separately
+    def __init__(self, categories):
+        self.categories = list(categories)
+        self._index = {category: i for i, category in enumerate(self.categories)}
+        self.counts = np.zeros(len(self.categories), dtype=np.int64)
+        self.unknown = 0
+        self.missing = 0
+
+    @classmethod
+    def from_values(cls, values):
+        values = [value for value in np.asarray(values, dtype=object).ravel().tolist() if not _is_missing(value)]
+        return cls(sorted(set(values), key=str)).update(values)
+
+    def update(self, values):
+        index = self._index
+        codes = np.array([index.get(value, -1 if not _is_missing(value) else -2)
+                          for value in np.asarray(values, dtype=object).ravel().tolist()], dtype=np.intp)
+        self.counts += np.bincount(codes[codes >= 0], minlength=len(self.counts))
+        self.unknown += int(np.count_nonzero(codes == -1))
+        self.missing += int(np.count_nonzero(codes == -2))
+        return self
+
+    def add(self, value):
+        i = self._index.get(value)
+        if i is not None:
+            self.counts[i] += 1
+        elif _is_missing(value):
+            self.missing += 1
+        else:
+            self.unknown += 1
+        return self
+
+    def merge(self, other):
+        if self.categories != other.categories:
+            raise ValueError("Can't merge sketches with different categories")
+        self.counts += other.counts
+        self.unknown += other.unknown
+        self.missing += other.missing
+        return self
+
+    def empty_copy(self):
+        return CategoricalSketch(self.categories)
+
+    @property
+    def count(self):
+        return int(self.counts.sum()) + self.unknown
+
+    def compare(self, reference):
+        total = self.count + self.missing
+        scores = {"n": total, "missing_rate": self.missing / total if total else np.nan,
+                  "unknown_rate": self.unknown / total if total else np.nan, "ks": np.nan}
+        scores["psi"] = _psi(np.r_[reference.counts, reference.unknown, reference.missing],
+                             np.r_[self.counts, self.unknown, self.missing])
+        return scores
+
+    def to_dict(self):
+        return {"type": "categorical", "categories": self.categories, "counts": self.counts.tolist(),
+                "unknown": self.unknown, "missing": self.missing}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["categories"])
+        sketch.counts = np.asarray(data["counts"], dtype=np.int64)
+        sketch.unknown, sketch.missing = data["unknown"], data["missing"]
+        return sketch
+
+def _is_missing(value):
+    return value is None or value != value
+
+def _sketch_from_dict(data):
+    return (NumericSketch if data["type"] == "numeric" else CategoricalSketch).from_dict(data)
+
+#Reference and current sketches of a set of columns
+class DriftMonitor:
+    def __init__(self, reference, psi_threshold=PSI_MAJOR):
+        self.reference = reference #{column: sketch}
+        self.columns = list(reference)
+        self.psi_threshold = psi_threshold
+        self.current = {column: sketch.empty_copy() for column, sketch in reference.items()}
+
+    #Reference sketches of every column of the DataFrame X (or of columns): quantile bins for numerical columns,
+    #category counts for the others
+    @classmethod
+    def fit(cls, X, columns=None, n_bins=20, psi_threshold=PSI_MAJOR):
+        reference = {}
+        for column in columns or list(X.columns):
+            values = X[column].to_numpy()
+            if values.dtype.kind in "biuf":
+                reference[column] = NumericSketch.from_values(values, n_bins)
+            else:
+                reference[column] = CategoricalSketch.from_values(values)
+        return cls(reference, psi_threshold)
+
+    #Adds a batch to the current sketches: a DataFrame, a dict or list of dicts (records), or a 2D array whose columns
+    #are in self.columns order. Columns missing from the batch are left alone
+    def update(self, batch):
+        if isinstance(batch, dict): #A single record: one add() per column
+            for column in self.columns:
+                if column in batch:
+                    self.current[column].add(batch[column])
+            return self
+        if hasattr(batch, "columns"):
+            columns = {column: batch[column].to_numpy() for column in self.columns if column in batch.columns}
+        elif isinstance(batch, list) and batch and isinstance(batch[0], dict):
+            columns = {column: [record[column] for record in batch] for column in self.columns if column in batch[0]}
+        else:
+            batch = np.asarray(batch, dtype=object)
+            columns = {column: batch[:, i] for i, column in enumerate(self.columns)}
+        for column, values in columns.items():
+            self.current[column].update(values)
+        return self
+
+    def reset(self):
+        self.current = {column: sketch.empty_copy() for column, sketch in self.reference.items()}
+        return self
+
+    #Adds the current sketches of another monitor with the same reference (e.g. another serving process)
+    def merge(self, other):
+        for column in self.columns:
+            self.current[column].merge(other.current[column])
+        return self
+
+    #{column: scores} for the current sketches against the reference
+    def scores(self):
+        return {column: self.current[column].compare(self.reference[column]) for column in self.columns}
+
+    #Columns whose PSI is above psi_threshold: [(column, psi)] sorted by decreasing PSI
+    def alerts(self, scores=None):
+        scores = scores or self.scores()
+        drifted = [(column, s["psi"]) for column, s in scores.items() if s["n"] and s["psi"] > self.psi_threshold]
+        return sorted(drifted, key=lambda item: -item[1])
+
+    def report(self, scores=None):
+        scores = scores or self.scores()
+        lines = ["%-20s %8s %8s %8s %8s %10s" % ("column", "n", "psi", "ks", "missing", "mean_shift")]
+        for column, s in scores.items():
+            flag = ""
+            if s["psi"] > PSI_MAJOR:
+                flag = " <-- major shift"
+            elif s["psi"] > PSI_MODERATE:
+                flag = " <-- moderate shift"
+            lines.append("%-20s %8d %8.4f %8.4f %8.4f %10.4f%s" % (column, s["n"], s["psi"], s["ks"],
+                                                                 s["missing_rate"], s.get("mean_shift", np.nan), flag))
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {"psi_threshold": self.psi_threshold,
+                "reference": {column: sketch.to_dict() for column, sketch in self.reference.items()},
+                "current": {column: sketch.to_dict() for column, sketch in self.current.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        monitor = cls({column: _sketch_from_dict(sketch) for column, sketch in data["reference"].items()},
+                      data["psi_threshold"])
+        monitor.current = {column: _sketch_from_dict(sketch) for column, sketch in data["current"].items()}
+        return monitor
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+
+from ml_practice import profiling
+
+#Chapter 2 loaders, splits and pipeline (see Chapter_2/Housing.py for the walkthrough)
+#
+#Importing this module only imports NumPy: pandas and Scikit-Learn are imported by the functions that need them.
+#CombinedAttributesAdder, a Scikit-Learn transformer, is in ml_practice/transformers.py
+
+DOWNLOAD_ROOT = "https://raw.githubusercontent.com/ageron/handson-ml/master/"
+HOUSING_PATH = os.path.join("datasets", "housing")
+HOUSING_URL = DOWNLOAD_ROOT + "datasets/housing/housing.tgz"
+
+INCOME_BINS = [0, 1.5, 3.0, 4.5, 6., np.inf]
+OCEAN_PROXIMITY = ["<1H OCEAN", "INLAND", "NEAR OCEAN", "NEAR BAY", "ISLAND"]
+
+@profiling.profiled(stage="fetch")
+def fetch_housing_data(housing_url=HOUSING_URL, housing_path=HOUSING_PATH):
+    import tarfile
+    from urllib.request import urlretrieve
+
+    if not os.path.isdir(housing_path):
+        os.makedirs(housing_path)
+    tgz_path = os.path.join(housing_path, "housing.tgz")
+    urlretrieve(housing_url, tgz_path)
+    with tarfile.open(tgz_path) as housing_tgz:
+        housing_tgz.extractall(path=housing_path)
+
+@profiling.profiled(stage="load")
+def load_housing_data(housing_path=HOUSING_PATH):
+    import pandas as pd
+
+    csv_path = os.path.join(housing_path, "housing.csv")
+    return pd.read_csv(csv_path)
+
+#California-housing-like DataFrame: same columns and dtypes as housing.csv, about 1% missing total_bedrooms. For the
+#benchmarks and tests, which never download anything
+def synthetic_housing(n_rows=20640, random_state=42):
+    import pandas as pd
+
+    rnd = np.random.RandomState(random_state)
+    households = np.round(rnd.lognormal(6.0, 0.7, n_rows)) + 1
+    total_rooms = np.round(households * rnd.lognormal(1.6, 0.25, n_rows))
+    total_bedrooms = np.round(total_rooms * rnd.uniform(0.15, 0.3, n_rows))
+    total_bedrooms[rnd.rand(n_rows) < 0.01] = np.nan
+    median_income = np.clip(rnd.lognormal(1.3, 0.45, n_rows), 0.5, 15.0)
+    housing = pd.DataFrame({
+        "longitude": rnd.uniform(-124.3, -114.3, n_rows),
+        "latitude": rnd.uniform(32.5, 42.0, n_rows),
+        "housing_median_age": rnd.randint(1, 53, n_rows).astype(np.float64),
+        "total_rooms": total_rooms,
+        "total_bedrooms": total_bedrooms,
+        "population": np.round(households * rnd.lognormal(1.0, 0.3, n_rows)),
+        "households": households,
+        "median_income": median_income,
+        "median_house_value": np.clip(median_income * 40000 + rnd.normal(0, 50000, n_rows), 15000, 500001),
+        "ocean_proximity": rnd.choice(OCEAN_PROXIMITY, n_rows, p=[0.44, 0.32, 0.13, 0.109, 0.001]),
+    })
+    return housing
+
+# This is not the best method to generate test data...
+def split_train_test(data, test_ratio):
+    shuffled_indices = np.random.permutation(len(data)) #Randomly shuffles data around
+    test_set_size = int(len(data) * test_ratio)
+    test_indices = shuffled_indices[:test_set_size]
+    train_indices = shuffled_indices[test_set_size:]
+    return data.iloc[train_indices], data.iloc[test_indices]
+
+def test_set_check(identifier, test_ratio):
+    from zlib import crc32
+
+    return crc32(np.int64(identifier)) & 0xffffffff < test_ratio * 2**32
+
+#Income category (1 to 5) of every district, the attribute the train/test split is stratified on
+def income_cat(housing):
+    import pandas as pd
+
+    return pd.cut(housing["median_income"], bins=INCOME_BINS, labels=[1, 2, 3, 4, 5])
+
+#Stratified (on income_cat) 80/20 split, as in Housing.py. Returns strat_train_set, strat_test_set
+def stratified_split(housing, test_size=0.2, random_state=42):
+    from sklearn.model_selection import StratifiedShuffleSplit
+
+    split = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+    train_index, test_index = next(split.split(housing, income_cat(housing)))
+    return housing.iloc[train_index], housing.iloc[test_index]
+
+#full_pipeline from Housing.py: median imputing, CombinedAttributesAdder and standard scaling for the numerical
+#attributes, one-hot encoding for ocean_proximity
+def make_full_pipeline(num_attribs, cat_attribs=("ocean_proximity",)):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    from ml_practice.transformers import CombinedAttributesAdder
+
+    num_pipeline = Pipeline([
+        ('imputer', SimpleImputer(strategy="median")),
+        ('attribs_adder', CombinedAttributesAdder()),
+        ('std_scaler', StandardScaler()),
+    ])
+    return ColumnTransformer([
+        ("num", num_pipeline, list(num_attribs)),
+        ("cat", OneHotEncoder(), list(cat_attribs)),
+    ])
+
+#Predictors and labels of the stratified training set: housing, housing_labels
+def training_set(housing, test_size=0.2, random_state=42):
+    strat_train_set, _ = stratified_split(housing, test_size, random_state)
+    return strat_train_set.drop("median_house_value", axis=1), strat_train_set["median_house_value"].copy()
@@ -0,0 +1,108 @@
+import numpy as np
+
+#Permutation feature importance for the housing models (the commented-out feature_importances block of Housing.py)
+#
+#The forest's feature_importances_ are computed from the impurity decrease of the training fits, which favours
+#features with many possible split points (the numerical ones) over the one-hot columns. Permutation importance is
+#the increase of the RMSE when the values of one attribute are shuffled between the rows, i.e. when the model can't
+#use it anymore:
+#
+#   importances = permutation_importance(final_model, housing_prepared, housing_labels,
+#                                        housing_attributes(full_pipeline), n_repeats=5, n_jobs=-1)
+#   importances.ranking()            #sorted(zip(importances_mean, attributes), reverse=True)
+#
+#Every (attribute, repeat) needs one predict() on a copy of X with one column shuffled. Instead of copying the whole
+#matrix for every permutation, each worker copies X once into a scratch buffer and, for every task, writes the
+#shuffled column into it, predicts and writes the original column back (O(n) per task instead of O(n * n_features)).
+#The tasks are split between n_jobs workers with joblib: threads by default, which share X and the model (tree and
+#BLAS predictions release the GIL), or processes (backend="loky"), which get X memory-mapped. For tree models the
+#buffer is float32 like their predict() input, so predict() doesn't copy it again
+#
+#Repeat r shuffles every attribute with the same permutation of the rows, which only depends on random_state and r,
+#so each worker draws n_repeats permutations at most and the results don't change with n_jobs
+
+def _rmse(y, y_pred):
+    return float(np.sqrt(np.mean((y - y_pred) ** 2)))
+
+#Columns of housing_prepared, named like the feature_importances block: num_attribs + extra_attribs +
+#cat_one_hot_attribs (the categories of ocean_proximity)
+def housing_attributes(full_pipeline):
+    num_pipeline = full_pipeline.named_transformers_["num"]
+    cat_encoder = full_pipeline.named_transformers_["cat"]
+    columns = {name: list(columns) for name, _, columns in full_pipeline.transformers_}
+    num_attribs = columns["num"]
+    attribs_adder = num_pipeline.named_steps["attribs_adder"]
+    extra_attribs = list(attribs_adder.get_feature_names_out(num_attribs))[len(num_attribs):]
+    cat_one_hot_attribs = [str(category) for categories in cat_encoder.categories_ for category in categories]
+    return num_attribs + extra_attribs + cat_one_hot_attribs
+
+class PermutationImportances:
+    def __init__(self, attributes, baseline, importances):
+        self.attributes = list(attributes)
+        self.baseline = baseline         #Error of the model on the unshuffled data
+        self.importances = importances   #(n_attributes, n_repeats) error increases
+        self.importances_mean = importances.mean(axis=1)
+        self.importances_std = importances.std(axis=1)
+
+    #(mean importance, attribute) pairs, most important first
+    def ranking(self):
+        return sorted(zip(self.importances_mean.tolist(), self.attributes), reverse=True)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({"importance": self.importances_mean, "std": self.importances_std},
+                            index=pd.Index(self.attributes, name="attribute")).sort_values("importance",
+                                                                                           ascending=False)
+
+    def __repr__(self):
+        return "PermutationImportances(%d attributes, %d repeats, baseline=%.6g)" % (
+            len(self.attributes), self.importances.shape[1], self.baseline)
+
+def _is_tree_model(model):
+    return hasattr(model, "estimators_") or hasattr(model, "tree_")
+
+#Errors of the permuted tasks [(group, repeat), ...] of one worker, with its own scratch buffer. The buffer is
+#column-major, so the shuffled column and the restored one are written contiguously
+def _permuted_errors(model, X, y, groups, tasks, random_state, error):
+    buffer = np.array(X, dtype=np.float32 if _is_tree_model(model) else np.float64, order="F")
+    permutations = {r: np.random.default_rng([random_state, r]).permutation(len(X)) for r in {r for _, r in tasks}}
+    errors = []
+    for g, r in tasks:
+        for j in groups[g]:
+            buffer[:, j] = X[:, j].take(permutations[r])
+        errors.append(error(y, model.predict(buffer)))
+        for j in groups[g]:
+            buffer[:, j] = X[:, j]
+    return errors
+
+#model: a fitted regressor; X: the prepared matrix (dense); attributes: the name of every column (default x0, x1,
+#...). groups: {name: [column, ...]} to shuffle several columns together, e.g. the one-hot columns of one categorical
+#attribute (the rows keep a valid one-hot encoding); the importances are then per group. error(y, y_pred): lower is
+#better, default RMSE
+def permutation_importance(model, X, y, attributes=None, n_repeats=5, random_state=42, n_jobs=None, groups=None,
+                           error=_rmse, backend="threading"):
+    from joblib import Parallel, delayed, effective_n_jobs
+
+    if hasattr(X, "toarray"):
+        X = X.toarray()
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if groups is None:
+        attributes = list(attributes) if attributes is not None else ["x%d" % j for j in range(X.shape[1])]
+        if len(attributes) != X.shape[1]:
+            raise ValueError("Got %d attributes for %d columns" % (len(attributes), X.shape[1]))
+        groups = [[j] for j in range(X.shape[1])]
+    else:
+        attributes, groups = list(groups), [list(np.atleast_1d(columns)) for columns in groups.values()]
+
+    baseline = error(y, model.predict(X))
+    tasks = [(g, r) for g in range(len(groups)) for r in range(n_repeats)]
+    #Contiguous runs of tasks, so each worker's buffer is copied once
+    n_workers = max(1, min(effective_n_jobs(n_jobs), len(tasks)))
+    chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(tasks)), n_workers)]
+    results = Parallel(n_jobs=n_workers, backend=backend)(
+        delayed(_permuted_errors)(model, X, y, groups, [tasks[i] for i in chunk], random_state, error)
+        for chunk in chunks)
+    errors = np.array([e for chunk_errors in results for e in chunk_errors]).reshape(len(groups), n_repeats)
+    return PermutationImportances(attributes, baseline, errors - baseline)
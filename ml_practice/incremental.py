@@ -0,0 +1,157 @@
+import numpy as np
+
+from ml_practice.drift import NumericSketch
+
+#Incremental retraining of the housing models on appended data (the "train models on a regular basis using fresh
+#data" note at the end of Housing.py), at a cost that depends on the number of new rows, not on the history
+#
+#   trainer = IncrementalTrainer(make_full_pipeline(num_attribs), RandomForestRegressor(n_estimators=30))
+#   trainer.fit(housing, housing_labels)                     #Full fit on the history, once
+#   trainer.partial_fit(new_housing, new_labels)             #Every time fresh data comes in
+#   trainer.predict(X_test)                                  #Or trainer.full_pipeline / trainer.model, as usual
+#
+#What partial_fit() updates:
+#   - SimpleImputer medians: every numerical column keeps a NumericSketch (ml_practice/drift.py) with n_bins bins at
+#     the quantiles of the first fit. Sketches merge by adding counts, and the median is read from the merged sketch,
+#     so it is approximate (interpolated inside one bin, well below a bin width off)
+#   - StandardScaler: its own partial_fit(), i.e. mergeable counts, means and variances. Only with LinearRegression:
+#     trees don't depend on the scaling, and a forest keeps the scaler of the first fit, see below
+#   - LinearRegression: count, means and co-moment matrix of the unscaled features and the labels, merged with
+#     Chan et al.'s pairwise update, from which the least-squares solution for the current scaler is solved (the same
+#     minimum-norm solution LinearRegression.fit() finds on all the rows)
+#   - RandomForestRegressor/ExtraTreesRegressor: new trees are grown on the new rows only (warm_start), in proportion
+#     to their share of the data, and the oldest trees are retired to keep max_estimators trees. The kept trees are left
+#     as they are, so the rows they have seen stay in the same leaves. Remapping their thresholds onto an updated
+#     scaler can't promise that: trees compare float32 inputs, and a row right on a split point (an integer age
+#     halfway between two others) rounds to either side of it, independently under the old and the new scaler
+#
+#Rows already seen are never transformed again, so they keep the imputed values of their time. New categories of
+#ocean_proximity can't be added (the one-hot columns are fixed) and raise ValueError
+
+#Count, mean and co-moment matrix (sum of (x - mean)(x - mean)^T) of the rows seen so far. Two Moments merge exactly
+#(Chan, Golub & LeVeque), so the statistics of all the rows are built one batch at a time
+class Moments:
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.comoment = np.zeros((n_features, n_features))
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X):
+            batch = Moments(X.shape[1])
+            batch.n = len(X)
+            batch.mean = X.mean(axis=0)
+            centered = X - batch.mean
+            batch.comoment = centered.T @ centered
+            self.merge(batch)
+        return self
+
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return self
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+
+    @property
+    def covariance(self):
+        return self.comoment / max(self.n - 1, 1)
+
+def _is_forest(model):
+    return hasattr(model, "estimators_") or (hasattr(model, "n_estimators") and hasattr(model, "warm_start"))
+
+class IncrementalTrainer:
+    #full_pipeline: make_full_pipeline() (unfitted or fitted, fit() refits it). model: a LinearRegression or a
+    #RandomForestRegressor/ExtraTreesRegressor. max_estimators: forest size kept by partial_fit() (default
+    #model.n_estimators). n_bins: bins of the median sketches
+    def __init__(self, full_pipeline, model, max_estimators=None, n_bins=2048):
+        if type(model).__name__ != "LinearRegression" and not _is_forest(model):
+            raise ValueError("Incremental retraining supports LinearRegression and forests, got %r" % (model,))
+        self.full_pipeline = full_pipeline
+        self.model = model
+        self.max_estimators = max_estimators
+        self.n_bins = n_bins
+
+    def _parts(self):
+        num_pipeline = self.full_pipeline.named_transformers_["num"]
+        return (num_pipeline.named_steps["imputer"], num_pipeline.named_steps["attribs_adder"],
+                num_pipeline.named_steps["std_scaler"], self.full_pipeline.named_transformers_["cat"])
+
+    #Unscaled numerical features (imputed with the current medians, plus the combined attributes) and one-hot columns
+    def _features(self, housing):
+        imputer, attribs_adder, _, cat_encoder = self._parts()
+        raw = attribs_adder.transform(imputer.transform(housing[self.num_attribs_]))
+        cat = cat_encoder.transform(housing[self.cat_attribs_])
+        return raw, cat.toarray() if hasattr(cat, "toarray") else cat
+
+    def fit(self, housing, housing_labels):
+        housing_prepared = self.full_pipeline.fit_transform(housing)
+        columns = {name: list(columns) for name, _, columns in self.full_pipeline.transformers_}
+        self.num_attribs_, self.cat_attribs_ = columns["num"], columns["cat"]
+        y = np.asarray(housing_labels, dtype=np.float64)
+        if _is_forest(self.model):
+            self.model.set_params(warm_start=True)
+            self.max_estimators = self.max_estimators or self.model.n_estimators
+        self.model.fit(housing_prepared, y)
+
+        num = housing[self.num_attribs_].to_numpy(dtype=np.float64)
+        raw, cat = self._features(housing)
+        self.median_sketches_ = [NumericSketch.from_values(num[:, j], self.n_bins) for j in range(num.shape[1])]
+        self.moments_ = Moments(raw.shape[1] + cat.shape[1] + 1).update(np.c_[raw, cat, y])
+        self.n_samples_seen_ = len(y)
+        self.n_updates_ = 0
+        return self
+
+    def partial_fit(self, new_housing, new_labels):
+        imputer, _, std_scaler, _ = self._parts()
+        y = np.asarray(new_labels, dtype=np.float64)
+        num = new_housing[self.num_attribs_].to_numpy(dtype=np.float64)
+        for j, sketch in enumerate(self.median_sketches_):
+            sketch.update(num[:, j])
+        imputer.statistics_ = np.array([sketch.quantile(0.5) for sketch in self.median_sketches_])
+
+        raw, cat = self._features(new_housing)
+        if not _is_forest(self.model):
+            std_scaler.partial_fit(raw)
+        self.moments_.update(np.c_[raw, cat, y])
+        self.n_samples_seen_ += len(y)
+        self.n_updates_ += 1
+
+        if _is_forest(self.model):
+            self._grow_trees(np.c_[std_scaler.transform(raw), cat], y)
+        else:
+            self._solve_linear_regression()
+        return self
+
+    #Least squares on the merged moments, in the scaled feature space x_s = (x - mean_) / scale_ (one-hot columns
+    #unscaled): the centered Gram matrix and X^T y become D^-1 S D^-1 and D^-1 s_xy with D = diag(scale_, 1...)
+    def _solve_linear_regression(self):
+        _, _, std_scaler, _ = self._parts()
+        moments = self.moments_
+        scale = np.r_[std_scaler.scale_, np.ones(len(moments.mean) - 1 - len(std_scaler.scale_))]
+        shift = np.r_[std_scaler.mean_, np.zeros(len(scale) - len(std_scaler.mean_))]
+        gram = moments.comoment[:-1, :-1] / np.outer(scale, scale)
+        xy = moments.comoment[:-1, -1] / scale
+        coef = np.linalg.lstsq(gram, xy, rcond=None)[0] #Minimum-norm solution, like LinearRegression
+        self.model.coef_ = coef
+        self.model.intercept_ = moments.mean[-1] - ((moments.mean[:-1] - shift) / scale) @ coef
+
+    #New trees on the new rows, as many as their share of all the rows seen (at least one), then the oldest trees
+    #are dropped to keep max_estimators
+    def _grow_trees(self, X_new, y_new):
+        n_new_trees = max(1, int(round(self.max_estimators * len(y_new) / self.n_samples_seen_)))
+        self.model.set_params(n_estimators=len(self.model.estimators_) + n_new_trees)
+        self.model.fit(X_new, y_new) #warm_start: only the new trees are fitted
+        retired = max(0, len(self.model.estimators_) - self.max_estimators)
+        self.model.estimators_ = self.model.estimators_[retired:]
+        self.model.set_params(n_estimators=len(self.model.estimators_))
+
+    def transform(self, housing):
+        return self.full_pipeline.transform(housing)
+
+    def predict(self, housing):
+        return self.model.predict(self.transform(housing))
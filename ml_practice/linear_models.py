@@ -0,0 +1,57 @@
+import numpy as np
+
+#Chapter 4 training helpers (see Chapter_4/Linear_Regression.py for the walkthrough): the hand-written Batch and
+#Stochastic Gradient Descent loops and the learning curves. Scikit-Learn and Matplotlib are imported by the functions
+#that use them
+
+#Batch Gradient Descent for Linear Regression. X_b includes the bias column; returns theta
+def batch_gradient_descent(X_b, y, eta=0.1, n_iterations=1000, theta=None):
+    m = len(X_b)
+    theta = np.random.randn(X_b.shape[1], 1) if theta is None else theta #Random Initialization
+    for iteration in range(n_iterations):
+        gradients = 2/m * X_b.T.dot(X_b.dot(theta) - y)
+        theta = theta - eta * gradients
+    return theta
+
+#Learning rate of Stochastic Gradient Descent at step t
+def learning_schedule(t, t0=5, t1=50):
+    return t0 / (t + t1)
+
+#Stochastic Gradient Descent: one randomly picked instance per step, m steps per epoch, with learning_schedule()
+#decreasing the learning rate
+def stochastic_gradient_descent(X_b, y, n_epochs=50, t0=5, t1=50, theta=None):
+    m = len(X_b)
+    theta = np.random.rand(X_b.shape[1], 1) if theta is None else theta #Random initialization
+    for epoch in range(n_epochs):
+        for i in range(m):
+            random_index = np.random.randint(m)
+            xi = X_b[random_index:random_index+1]
+            yi = y[random_index:random_index+1]
+            gradients = 2 * xi.T.dot(xi.dot(theta) - yi)
+            eta = learning_schedule(epoch * m + i, t0, t1)
+            theta = theta - eta * gradients
+    return theta
+
+#Trains the model on the first 1, 2, ... instances of an 80% training split and returns the training and validation
+#MSE of every size
+def learning_curves(model, X, y):
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2)
+    train_errors, val_errors = [], []
+    for m in range(1, len(X_train)):
+        model.fit(X_train[:m], y_train[:m])
+        y_train_predict = model.predict(X_train[:m])
+        y_val_predict = model.predict(X_val)
+        train_errors.append(mean_squared_error(y_train[:m], y_train_predict))
+        val_errors.append(mean_squared_error(y_val, y_val_predict))
+    return train_errors, val_errors
+
+#Plots the learning curves (RMSE against training set size) of a model
+def plot_learning_curves(model, X, y):
+    import matplotlib.pyplot as plt
+
+    train_errors, val_errors = learning_curves(model, X, y)
+    plt.plot(np.sqrt(train_errors), "r-+", linewidth = 2, label="train")
+    plt.plot(np.sqrt(val_errors), "b-", linewidth=3, label="val")
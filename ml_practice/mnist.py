@@ -0,0 +1,47 @@
+import numpy as np
+
+from ml_practice import profiling
+
+#Chapter 3 loaders and plotting helpers (see Chapter_3/MNIST.py for the walkthrough). Scikit-Learn and Matplotlib are
+#imported by the functions that use them
+
+#MNIST as NumPy arrays: X (70,000 x 784 pixel intensities, float64) and y (uint8 labels). fetch_openml caches the
+#download in data_home (~/scikit_learn_data by default)
+@profiling.profiled(stage="fetch")
+def fetch_mnist(data_home=None):
+    from sklearn.datasets import fetch_openml
+
+    mnist = fetch_openml('mnist_784', version=1, as_frame=False, data_home=data_home)
+    return mnist["data"], mnist["target"].astype(np.uint8)
+
+#MNIST is already split into a training set (the first 60,000 images) and a test set (the last 10,000 images), and the
+#training set is already shuffled. Returns X_train, X_test, y_train, y_test
+def split_mnist(X, y, n_train=60000):
+    return X[:n_train], X[n_train:], y[:n_train], y[n_train:]
+
+def plot_digit(some_digit):
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+
+    plt.imshow(np.asarray(some_digit).reshape(28, 28), cmap=mpl.cm.binary, interpolation="nearest")
+    plt.axis("off")
+
+#Plots precision and recall as a function of threshold
+def plot_precision_recall_vs_threshold(precisions, recalls, thresholds):
+    import matplotlib.pyplot as plt
+
+    plt.plot(thresholds, precisions[:-1], "b--", label="Precision")
+    plt.plot(thresholds, recalls[:-1], "g--", label="Recall")
+    plt.xlabel("Threshold")
+    plt.legend(loc="center left")
+    plt.ylim([0, 1])
+
+#Plots the FPR against the TPR (false positive rate versus true positive rate)
+def plot_roc_curve(fpr, tpr, label=None):
+    import matplotlib.pyplot as plt
+
+    plt.plot(fpr, tpr, linewidth=2, label=label)
+    plt.plot([0, 1], [0, 1], 'k--')
+    plt.axis([0, 1, 0, 1])
+    plt.xlabel('False Positive Rate')
+    plt.ylabel('True Positive Rate')
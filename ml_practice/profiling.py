@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+import tracemalloc
+
+#Timing spans for finding out where a run spends its time
+#
+#   from ml_practice import profiling
+#   with profiling.span("fit", stage="fit", model="RandomForestRegressor") as s:
+#       s.record_array("X", housing_prepared)
+#       grid_search.fit(housing_prepared, housing_labels)
+#
+#   @profiling.profiled(stage="evaluate")
+#   def display_scores(scores): ...
+#
+#Every span records its wall and CPU time, the memory allocated while it ran (tracemalloc: net change and peak), the
+#shape/size of the arrays recorded on it and its parent span, so nested spans make a tree. The stages used in the
+#chapter scripts are fetch, load, preprocess, fit, predict and evaluate.
+#
+#Profiling is off by default, and then span() hands back one shared do-nothing object and profiled() functions call
+#straight through, so leaving the spans in the code costs next to nothing. It is turned on with enable(), or for a
+#whole run with the ML_PROFILE environment variable, which also names the file the spans are written to at exit:
+#
+#   ML_PROFILE=housing_trace.json python Chapter_2/Housing.py      (Chrome trace: open in chrome://tracing/Perfetto)
+#   ML_PROFILE=housing_spans.jsonl python Chapter_2/Housing.py     (one JSON object per span)
+#   ML_PROFILE=1 python Chapter_2/Housing.py                       (summary table only)
+#
+#ML_PROFILE_MEMORY=0 leaves tracemalloc off (it slows allocation-heavy code down noticeably)
+
+STAGES = ("fetch", "load", "preprocess", "fit", "predict", "evaluate")
+
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_spans = []
+_local = threading.local()
+_lock = threading.Lock()
+_next_id = 0
+
+def enabled():
+    return _enabled
+
+def enable(memory=True):
+    global _enabled, _trace_memory, _started_tracemalloc
+    _trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _enabled = True
+
+def disable():
+    global _enabled, _started_tracemalloc
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+def reset():
+    del _spans[:]
+
+#Finished spans as dicts, in the order they ended
+def spans():
+    return list(_spans)
+
+#Shape, dtype and size in bytes of an array, DataFrame or sparse matrix (None for anything without a shape)
+def array_info(array):
+    shape = getattr(array, "shape", None)
+    if shape is None:
+        return None
+    nbytes = getattr(array, "nbytes", None)
+    if nbytes is None and hasattr(array, "data") and hasattr(array.data, "nbytes"): #scipy.sparse
+        nbytes = array.data.nbytes
+    if nbytes is None and hasattr(array, "memory_usage"): #pandas
+        usage = array.memory_usage(index=False)
+        nbytes = int(getattr(usage, "sum", lambda: usage)())
+    dtype = getattr(array, "dtype", None)
+    return {"shape": list(shape), "dtype": None if dtype is None else str(dtype),
+            "nbytes": None if nbytes is None else int(nbytes)}
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def record(self, **attributes):
+        pass
+
+    def record_array(self, name, array):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    __slots__ = ("name", "stage", "attributes", "arrays", "span_id", "parent_id", "thread_id", "_start_wall",
+                 "_start_cpu", "_start_memory", "_start_ns", "_child_peak")
+
+    def __init__(self, name, stage, attributes):
+        global _next_id
+        self.name = name
+        self.stage = stage
+        self.attributes = attributes
+        self.arrays = {}
+        with _lock:
+            _next_id += 1
+            self.span_id = _next_id
+
+    def record(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_array(self, name, array):
+        info = array_info(array)
+        if info is not None:
+            self.arrays[name] = info
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        self.thread_id = threading.get_ident()
+        stack.append(self)
+        if _trace_memory and tracemalloc.is_tracing():
+            #reset_peak() is global: hand the peak reached so far to the parent span before clearing it
+            self._start_memory, peak = tracemalloc.get_traced_memory()
+            if len(stack) > 1 and stack[-2]._start_memory is not None:
+                stack[-2]._child_peak = max(stack[-2]._child_peak, peak)
+            self._child_peak = self._start_memory
+            tracemalloc.reset_peak()
+        else:
+            self._start_memory = None
+        self._start_ns = time.time_ns()
+        self._start_cpu = time.process_time()
+        self._start_wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_seconds = time.perf_counter() - self._start_wall
+        cpu_seconds = time.process_time() - self._start_cpu
+        record = {"name": self.name, "stage": self.stage, "id": self.span_id, "parent": self.parent_id,
+                  "thread": self.thread_id, "start_ns": self._start_ns, "wall_seconds": wall_seconds,
+                  "cpu_seconds": cpu_seconds, "attributes": self.attributes, "arrays": self.arrays}
+        if self._start_memory is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, self._child_peak)
+            parent = _stack()[-2] if len(_stack()) > 1 else None
+            if parent is not None and parent._start_memory is not None:
+                parent._child_peak = max(parent._child_peak, peak)
+            record["alloc_bytes"] = current - self._start_memory
+            record["peak_alloc_bytes"] = peak - self._start_memory
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        _spans.append(record)
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        return False
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+#Context manager timing the code inside it. Extra keyword arguments are stored with the span (model names, parameters)
+def span(name, stage=None, **attributes):
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, stage, attributes)
+
+#Decorator version of span(): the span is named after the function unless a name is given, and records the size of
+#every array-like argument and of the return value
+def profiled(func=None, name=None, stage=None):
+    if func is None:
+        return functools.partial(profiled, name=name, stage=stage)
+    span_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        with Span(span_name, stage, {}) as current:
+            for i, arg in enumerate(args):
+                current.record_array("arg%d" % i, arg)
+            for key, arg in kwargs.items():
+                current.record_array(key, arg)
+            result = func(*args, **kwargs)
+            current.record_array("return", result)
+        return result
+    return wrapper
+
+#Total wall/CPU time and allocations per span name, slowest first
+def summary():
+    totals = {}
+    for record in _spans:
+        total = totals.setdefault(record["name"], {"name": record["name"], "stage": record["stage"], "count": 0,
+                                                   "wall_seconds": 0.0, "cpu_seconds": 0.0, "alloc_bytes": 0,
+                                                   "peak_alloc_bytes": 0})
+        total["count"] += 1
+        total["wall_seconds"] += record["wall_seconds"]
+        total["cpu_seconds"] += record["cpu_seconds"]
+        total["alloc_bytes"] += record.get("alloc_bytes", 0)
+        total["peak_alloc_bytes"] = max(total["peak_alloc_bytes"], record.get("peak_alloc_bytes", 0))
+    return sorted(totals.values(), key=lambda total: total["wall_seconds"], reverse=True)
+
+def print_summary(file=None):
+    file = sys.stderr if file is None else file
+    print("%-40s %-10s %6s %10s %10s %12s %12s" % ("span", "stage", "count", "wall (s)", "cpu (s)", "alloc MB",
+                                                    "peak MB"), file=file)
+    for total in summary():
+        print("%-40s %-10s %6d %10.3f %10.3f %12.1f %12.1f" % (
+            total["name"][:40], total["stage"] or "", total["count"], total["wall_seconds"], total["cpu_seconds"],
+            total["alloc_bytes"] / 1024**2, total["peak_alloc_bytes"] / 1024**2), file=file)
+
+#One JSON object per line, one line per span
+def export_json(path):
+    with open(path, "w") as output:
+        for record in _spans:
+            output.write(json.dumps(record) + "\n")
+
+#Chrome trace event format ("X" complete events, times in microseconds), for chrome://tracing or ui.perfetto.dev
+def export_chrome_trace(path):
+    pid = os.getpid()
+    events = []
+    for record in _spans:
+        args = dict(record["attributes"], cpu_seconds=record["cpu_seconds"])
+        for key in ("alloc_bytes", "peak_alloc_bytes", "error"):
+            if key in record:
+                args[key] = record[key]
+        for array_name, info in record["arrays"].items():
+            args[array_name] = info
+        events.append({"name": record["name"], "cat": record["stage"] or "span", "ph": "X", "pid": pid,
+                       "tid": record["thread"], "ts": record["start_ns"] / 1000.0,
+                       "dur": record["wall_seconds"] * 1e6, "args": args})
+    with open(path, "w") as output:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, output)
+
+def _export_at_exit(target):
+    if not _spans:
+        return
+    print_summary()
+    if target.endswith(".jsonl"):
+        export_json(target)
+    elif target.endswith(".json"):
+        export_chrome_trace(target)
+    else:
+        return
+    print("Profiling spans written to", target, file=sys.stderr)
+
+_target = os.environ.get("ML_PROFILE")
+if _target and _target != "0":
+    enable(memory=os.environ.get("ML_PROFILE_MEMORY", "1") != "0")
+    atexit.register(_export_at_exit, _target)
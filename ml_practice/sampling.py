@@ -0,0 +1,159 @@
+import numpy as np
+
+from ml_practice.housing import INCOME_BINS
+
+#Stratified train/test split on income_cat in one streaming pass, for inputs too big to load at once
+#
+#Housing.py builds income_cat with pd.cut() on the whole frame, runs StratifiedShuffleSplit and copies the two sets
+#with .loc. StreamingStratifiedSplit only looks at median_income, one chunk at a time (a pd.read_csv(chunksize=...)
+#iterator, DataFrames, Series or arrays), and returns row numbers instead of copies:
+#
+#   splitter = StreamingStratifiedSplit(test_size=0.2, random_state=42)
+#   for chunk in pd.read_csv(csv_path, usecols=["median_income"], chunksize=100000):
+#       splitter.update(chunk)
+#   train_index, test_index = splitter.split()             #Positions in the file, sorted (use with .iloc/np.take)
+#   print(splitter.compare_props())                        #The stratified-vs-random error table of Housing.py
+#
+#Every row gets a pseudo-random 64-bit key, a hash (splitmix64) of random_state and its row number (or of its own id,
+#see id_column), so the result doesn't depend on how the input is chunked. Two methods:
+#   - "reservoir": the test set of every income category is the round(test_size * n_category) rows with the smallest
+#                  keys (bottom-k / priority sampling: a reservoir sample whose size is only known at the end). The
+#                  category proportions are exact, like StratifiedShuffleSplit. Keeps a key (8 bytes) and a category
+#                  (1 byte) per row until split()
+#   - "hash":      a row is in the test set if its key is below test_size * 2^64, like test_set_check() with a
+#                  better hash. No state but the counts, each row's set is decided as soon as it is read and never
+#                  changes when data is appended or reordered (use id_column for stable ids), but the proportions are
+#                  only right on average (off by ~sqrt(test_size / n_category) relatively), fine for huge inputs
+#Rows whose median_income falls outside INCOME_BINS (or is missing) go in a category 0 of their own
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+#splitmix64 finalizer of every element of a uint64 array (wrapping arithmetic)
+def _splitmix64(x):
+    with np.errstate(over="ignore"):
+        z = x + _GOLDEN
+        z = (z ^ (z >> np.uint64(30))) * _MIX1
+        z = (z ^ (z >> np.uint64(27))) * _MIX2
+        return z ^ (z >> np.uint64(31))
+
+#Income category (1 to 5, like income_cat) of every value; 0 for values outside the bins and NaN
+def income_category(median_income, bins=INCOME_BINS):
+    values = np.asarray(median_income, dtype=np.float64)
+    category = np.searchsorted(np.asarray(bins, dtype=np.float64), values, side="left") #(b[i-1], b[i]] -> i
+    category[(category == 0) | (category == len(bins)) | np.isnan(values)] = 0
+    return category.astype(np.uint8)
+
+#Counts split so they sum to total, each close to total * weight (largest remainders get the leftover units)
+def _allocate(counts, fraction, total):
+    exact = counts * fraction
+    allocation = np.floor(exact).astype(np.int64)
+    leftover = int(total - allocation.sum())
+    if leftover > 0:
+        allocation[np.argsort(-(exact - allocation), kind="stable")[:leftover]] += 1
+    return np.minimum(allocation, counts)
+
+class StreamingStratifiedSplit:
+    #column: the column of DataFrame chunks to stratify on; id_column: a column of integer ids to hash instead of the
+    #row numbers (e.g. the "index" column of housing_with_id)
+    def __init__(self, test_size=0.2, random_state=42, method="reservoir", column="median_income", id_column=None,
+                 bins=INCOME_BINS):
+        if method not in ("reservoir", "hash"):
+            raise ValueError("method must be 'reservoir' or 'hash', got %r" % (method,))
+        if not 0 < test_size < 1:
+            raise ValueError("test_size must be between 0 and 1, got %r" % (test_size,))
+        self.test_size = test_size
+        self.random_state = random_state
+        self.method = method
+        self.column = column
+        self.id_column = id_column
+        self.bins = bins
+        self._salt = _splitmix64(np.array([random_state], dtype=np.uint64))[0]
+        self.n_rows = 0
+        self.counts = np.zeros(len(bins), dtype=np.int64) #Rows per category (category 0 included)
+        self._keys, self._categories = [], []              #"reservoir"
+        self._test_index = []                              #"hash"
+        self._hash_test_counts = np.zeros(len(bins), dtype=np.int64)
+        self._random_counts = np.zeros(len(bins), dtype=np.int64)
+        self._random_threshold = np.uint64(min(int(test_size * 2.0 ** 64), 2 ** 64 - 1))
+
+    def _keys_of(self, chunk, n):
+        if self.id_column is not None:
+            ids = np.asarray(chunk[self.id_column]).astype(np.int64).view(np.uint64)
+        else:
+            ids = np.arange(self.n_rows, self.n_rows + n, dtype=np.uint64)
+        return _splitmix64(ids ^ self._salt)
+
+    #Reads one chunk: a DataFrame (self.column is used), a Series or an array of median incomes
+    def update(self, chunk):
+        values = chunk[self.column] if hasattr(chunk, "columns") else chunk
+        categories = income_category(values, self.bins)
+        keys = self._keys_of(chunk, len(categories))
+        self.counts += np.bincount(categories, minlength=len(self.counts))
+        if self.method == "reservoir":
+            self._keys.append(keys)
+            self._categories.append(categories)
+        else:
+            test = keys < self._random_threshold
+            self._test_index.append(np.flatnonzero(test) + self.n_rows)
+            self._hash_test_counts += np.bincount(categories[test], minlength=len(self.counts))
+            #Baseline for compare_props(): a plain random sample with another hash of the same rows
+            self._random_counts += np.bincount(categories[_splitmix64(keys) < self._random_threshold],
+                                               minlength=len(self.counts))
+        self.n_rows += len(categories)
+        return self
+
+    def _reservoir_arrays(self):
+        if len(self._keys) > 1: #Concatenate once, later calls reuse the result
+            self._keys, self._categories = [np.concatenate(self._keys)], [np.concatenate(self._categories)]
+        if not self._keys:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint8)
+        return self._keys[0], self._categories[0]
+
+    #Number of test rows per category ("reservoir"), and in total: ceil(test_size * n_rows) like Scikit-Learn
+    def test_counts(self):
+        n_test = int(np.ceil(self.test_size * self.n_rows))
+        return _allocate(self.counts, self.test_size, n_test)
+
+    #train_index, test_index: sorted row numbers (positions over all the chunks read)
+    def split(self):
+        if self.method == "hash":
+            test_index = np.concatenate(self._test_index) if self._test_index else np.zeros(0, dtype=np.int64)
+        else:
+            keys, categories = self._reservoir_arrays()
+            test_index = [np.zeros(0, dtype=np.int64)]
+            for category, k in enumerate(self.test_counts()):
+                if k: #The k smallest keys of the category, in linear time
+                    rows = np.flatnonzero(categories == category)
+                    test_index.append(rows[np.argpartition(keys[rows], k - 1)[:k]])
+            test_index = np.sort(np.concatenate(test_index))
+        in_test = np.zeros(self.n_rows, dtype=bool)
+        in_test[test_index] = True
+        return np.flatnonzero(~in_test), test_index.astype(np.int64)
+
+    #Share of every income category in the whole input, the stratified test set and a purely random test set of
+    #the same size, with the relative errors, like compare_props in Housing.py. Only needs the per-category counts
+    def compare_props(self):
+        import pandas as pd
+
+        if self.method == "reservoir":
+            keys, categories = self._reservoir_arrays()
+            n_test = int(self.test_counts().sum())
+            random_test = np.argpartition(_splitmix64(keys), n_test - 1)[:n_test] if n_test else []
+            random_counts = np.bincount(categories[random_test], minlength=len(self.counts))
+            stratified_counts = self.test_counts()
+        else:
+            random_counts = self._random_counts
+            stratified_counts = self._hash_test_counts
+        labels = np.arange(len(self.counts))
+        keep = labels > 0 if self.counts[0] == 0 else labels >= 0
+        compare_props = pd.DataFrame({
+            "Overall": self.counts / max(self.n_rows, 1),
+            "Stratified": stratified_counts / max(stratified_counts.sum(), 1),
+            "Random": random_counts / max(random_counts.sum(), 1),
+        }, index=pd.Index(labels, name="income_cat"))[keep]
+        compare_props["Rand. %Error"] = 100 * compare_props["Random"] / compare_props["Overall"] - 100
+        compare_props["Strat. %Error"] = 100 * compare_props["Stratified"] / compare_props["Overall"] - 100
+        return compare_props
+
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import asyncio
+
+import numpy as np
+
+#Hyperparameter search that keeps every worker busy, for the RandomForestRegressor grid search of Housing.py
+#
+#GridSearchCV hands its (candidate, fold) fits to joblib in batches, in grid order: with n_estimators from 3 to 30 the
+#cheap fits finish early and the workers wait for the slow ones at the end. AsyncSearch runs the same fits on a
+#process pool driven by an asyncio loop, and gives a worker its next fit as soon as it is free, the most expensive
+#remaining fit first (the slow fits run alongside each other and the cheap ones fill the gaps at the end):
+#
+#   search = AsyncSearch(RandomForestRegressor(random_state=42), param_grid, cv=5, log_path="grid_search.jsonl")
+#   search.fit(housing_prepared, housing_labels)                 #Or: async for result in search.stream(X, y)
+#   search.best_params_, search.best_estimator_, search.cv_results_   #Like GridSearchCV
+#
+#   - Cost: the expected fit time of a candidate is n_estimators x the number of features tried per split (cost=
+#     to override it). Once a fold of a candidate is done, its measured time replaces the estimate for the other
+#     folds, and the time per cost unit of the fits done so far rescales the estimates of the others
+#   - Streaming: every (candidate, fold) result is returned as soon as it completes (stream(), or on_result in fit())
+#   - Resuming: each result is appended to log_path (JSON lines, flushed right away). An interrupted search started
+#     again with the same log_path only runs the fits that are not in it yet. Results are tagged with a hash of the
+#     estimator, the folds and the data, and those of another search in the same log are ignored
+#
+#The folds are KFold(cv) like GridSearchCV's for a regressor, and the scores the same neg_mean_squared_error, so
+#cv_results_ matches GridSearchCV's for a deterministic estimator (fixed random_state). X and y are sent to every worker
+#once, when the pool starts, not with every fit
+
+#Worker process state, set by _init_worker
+_worker = {}
+
+def _init_worker(estimator, X, y, splits):
+    _worker.update(estimator=estimator, X=X, y=y, splits=splits)
+
+def _mse(y, y_pred):
+    return float(np.mean((y - y_pred) ** 2))
+
+def _fit_and_score(params, fold):
+    from sklearn.base import clone
+
+    X, y = _worker["X"], _worker["y"]
+    train, test = _worker["splits"][fold]
+    start = time.perf_counter()
+    model = clone(_worker["estimator"]).set_params(**params).fit(X[train], y[train])
+    fit_time = time.perf_counter() - start
+    return {"test_score": -_mse(y[test], model.predict(X[test])),
+            "train_score": -_mse(y[train], model.predict(X[train])), "fit_time": fit_time}
+
+#Expected fit time, in arbitrary units, of a forest (or tree) with these params: trees x features tried per split
+def forest_cost(estimator, params, n_features):
+    params = {**estimator.get_params(), **params}
+    max_features = params.get("max_features")
+    if max_features is None:
+        max_features = n_features
+    elif max_features == "sqrt":
+        max_features = np.sqrt(n_features)
+    elif max_features == "log2":
+        max_features = np.log2(n_features)
+    elif isinstance(max_features, float):
+        max_features = max_features * n_features
+    return (params.get("n_estimators") or 1) * max(1.0, float(max_features))
+
+#Identifies the search a logged result belongs to: same estimator, number of folds and data
+def _fingerprint(estimator, cv, X, y):
+    import hashlib
+
+    digest = hashlib.sha1(("%r/%d" % (estimator, cv)).encode())
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()[:16]
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, default=repr)
+
+class AsyncSearch:
+    #param_grid: a dict or list of dicts, like GridSearchCV. n_jobs: worker processes (None/-1: every core).
+    #cost(estimator, params, n_features): expected fit time, default forest_cost. log_path: JSON lines log to resume
+    #from. backend: "processes", or "threads" (the tree builders release the GIL, and nothing is copied to workers)
+    def __init__(self, estimator, param_grid, cv=5, n_jobs=None, cost=forest_cost, log_path=None, refit=True,
+                 backend="processes"):
+        if backend not in ("processes", "threads"):
+            raise ValueError("backend must be 'processes' or 'threads', got %r" % (backend,))
+        from sklearn.model_selection import ParameterGrid
+
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.candidates = list(ParameterGrid(param_grid))
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.cost = cost
+        self.log_path = log_path
+        self.refit = refit
+        self.backend = backend
+
+    def _n_workers(self):
+        if self.n_jobs is None or self.n_jobs < 0:
+            return os.cpu_count() or 1
+        return max(1, self.n_jobs)
+
+    #Results of the log that belong to this search: {(candidate, fold): result}
+    def _read_log(self, fingerprint):
+        done = {}
+        if not self.log_path or not os.path.exists(self.log_path):
+            return done
+        keys = {_params_key(params): i for i, params in enumerate(self.candidates)}
+        with open(self.log_path) as log:
+            for line in log:
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                candidate = keys.get(_params_key(result["params"]))
+                if result["search"] == fingerprint and candidate is not None: #Not candidates removed from the grid
+                    done[candidate, result["fold"]] = dict(result, candidate=candidate)
+        return done
+
+    #Expected fit time of a candidate: its measured fit time if a fold is done, otherwise its cost rescaled by the
+    #time per cost unit of the fits done so far
+    def _estimate(self, candidate, costs, fit_times):
+        if fit_times.get(candidate):
+            return float(np.mean(fit_times[candidate]))
+        rates = [np.mean(times) / costs[c] for c, times in fit_times.items() if times and costs[c] > 0]
+        return costs[candidate] * (float(np.median(rates)) if rates else 1.0)
+
+    #Async generator of the (candidate, fold) results as they complete: dicts with candidate, params, fold,
+    #test_score, train_score and fit_time. Results already in the log are not yielded again
+    async def stream(self, X, y):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from sklearn.model_selection import KFold
+
+        X, y = np.asarray(X), np.asarray(y)
+        splits = list(KFold(self.cv).split(X))
+        fingerprint = _fingerprint(self.estimator, self.cv, X, y)
+        self.results_ = self._read_log(fingerprint)
+        costs = [self.cost(self.estimator, params, X.shape[1]) for params in self.candidates]
+        fit_times = {}
+        for (candidate, _), result in self.results_.items():
+            fit_times.setdefault(candidate, []).append(result["fit_time"])
+        pending = [(candidate, fold) for candidate in range(len(self.candidates)) for fold in range(self.cv)
+                   if (candidate, fold) not in self.results_]
+        if not pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        n_workers = min(self._n_workers(), len(pending))
+        #Daemon processes (e.g. multiprocessing.Pool workers) can't start a process pool
+        threads = self.backend == "threads" or multiprocessing.current_process().daemon
+        executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        pool = executor(n_workers, initializer=_init_worker, initargs=(self.estimator, X, y, splits))
+        log = open(self.log_path, "a") if self.log_path else None
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < n_workers:
+                    task = max(pending, key=lambda task: self._estimate(task[0], costs, fit_times))
+                    pending.remove(task)
+                    running[loop.run_in_executor(pool, _fit_and_score, self.candidates[task[0]], task[1])] = task
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    candidate, fold = running.pop(future)
+                    result = {"candidate": candidate, "params": self.candidates[candidate], "fold": fold,
+                              "search": fingerprint, **future.result()}
+                    self.results_[candidate, fold] = result
+                    fit_times.setdefault(candidate, []).append(result["fit_time"])
+                    if log:
+                        log.write(json.dumps(result, default=repr) + "\n")
+                        log.flush()
+                    yield result
+        finally:
+            if log:
+                log.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    #Runs the whole search (on_result(result) is called with every result as it completes), then fills in
+    #cv_results_, best_params_, best_score_ and best_estimator_ (refit on all the data if refit=True)
+    def fit(self, X, y, on_result=None):
+        async def run():
+            async for result in self.stream(X, y):
+                if on_result is not None:
+                    on_result(result)
+
+        asyncio.run(run())
+        self._summarize()
+        if self.refit:
+            from sklearn.base import clone
+
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+        return self
+
+    def _summarize(self):
+        def scores(name, candidate):
+            return [self.results_[candidate, fold][name] for fold in range(self.cv)]
+
+        candidates = range(len(self.candidates))
+        self.cv_results_ = {"params": self.candidates}
+        for name in ("test_score", "train_score", "fit_time"):
+            values = np.array([scores(name, candidate) for candidate in candidates])
+            for fold in range(self.cv):
+                if name != "fit_time":
+                    self.cv_results_["split%d_%s" % (fold, name)] = values[:, fold]
+            self.cv_results_["mean_" + name] = values.mean(axis=1)
+            self.cv_results_["std_" + name] = values.std(axis=1)
+        mean_test_score = self.cv_results_["mean_test_score"]
+        self.cv_results_["rank_test_score"] = (np.argsort(np.argsort(-mean_test_score, kind="stable")) + 1)
+        self.best_index_ = int(np.argmax(mean_test_score))
+        self.best_params_ = self.candidates[self.best_index_]
+        self.best_score_ = float(mean_test_score[self.best_index_])
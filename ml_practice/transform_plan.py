@@ -0,0 +1,224 @@
+import math
+import operator
+
+import numpy as np
+
+#The fitted housing full_pipeline compiled into a flat list of NumPy/plain-Python operations
+#
+#full_pipeline.transform() on one district goes through pandas column selection, the ColumnTransformer, and
+#SimpleImputer, CombinedAttributesAdder, StandardScaler and OneHotEncoder one after the other, each with its own input
+#validation: milliseconds for a single record. Once the pipeline is fitted, all it does is
+#   1.) pick the numerical input columns and replace missing values by the imputer's statistics_
+#   2.) append the ratios of CombinedAttributesAdder (rooms / households, population / households, bedrooms / rooms)
+#   3.) apply the affine map (x - mean_) / scale_ of the StandardScaler
+#   4.) look up the one-hot column of every category
+#compile_full_pipeline() reads those numbers out of the fitted transformers into a TransformPlan:
+#
+#   plan = compile_full_pipeline(full_pipeline)
+#   plan.transform_record({"longitude": -122.2, ..., "ocean_proximity": "NEAR BAY"})  #One record, a few microseconds
+#   plan.transform_record(row)                     #Same, from a sequence in plan.input_columns order
+#   plan.transform(X)                              #DataFrame or 2D array (input_columns order) of many records
+#   plan.transform_blocks(X)                       #Same, as a BlockMatrix: numerical block + category codes
+#
+#The output is the same, bit for bit, as full_pipeline.transform() (the same floating point operations in the same
+#order; check_plan() verifies it on some data), and a ratio with a zero denominator is NaN (0 / 0) or a ValueError
+#(infinite, which StandardScaler rejects) like in the pipeline. Numerical pipelines made of other steps, imputers with
+#indicators and one-hot encoders that drop or group categories are not supported: compile_full_pipeline() raises
+#ValueError for them
+
+#Function returning the tuple (record[key] for key in keys)
+def _getter(keys):
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda record: (record[key],)
+    return operator.itemgetter(*keys) if keys else lambda record: ()
+
+#numerator / denominator with NumPy's float64 results for a zero denominator (inf with the sign of the quotient, NaN
+#for 0 / 0 and NaN / 0), as CombinedAttributesAdder gets them on arrays, instead of ZeroDivisionError
+def _divide(numerator, denominator):
+    if denominator:
+        return numerator / denominator
+    if numerator == 0 or numerator != numerator:
+        return math.nan
+    return math.copysign(math.inf, numerator) * math.copysign(1.0, denominator)
+
+#StandardScaler.transform() rejects infinite values (NaN passes through), e.g. the ratios of a district with 0
+#households or 0 total_rooms: so does the plan, naming the feature
+def _infinity_error(plan, position):
+    names = plan.feature_names
+    name = names[position] if names is not None else "numerical feature %d" % position
+    return ValueError("Input contains infinity in %s (a ratio with a zero denominator?): StandardScaler, and so "
+                      "full_pipeline.transform(), rejects it too" % name)
+
+class TransformPlan:
+    def __init__(self, input_columns, num_index, operations, categorical, n_output, feature_names=None):
+        self.input_columns = list(input_columns) #Column order of array inputs (feature_names_in_ of the pipeline)
+        self.num_index = list(num_index)         #Positions of the numerical columns in input_columns
+        self.operations = operations             #[("fill", values) | ("ratios", [(i, j)...]) | ("affine", mean, scale)]
+        self.categorical = categorical           #[(input position, output offset, {category: column}, ignore_unknown)]
+        self.n_output = n_output
+        self.feature_names = list(feature_names) if feature_names is not None else None #Output column names
+        self._num_names = [self.input_columns[i] for i in self.num_index]
+        #Per-record path: itemgetters pick the values out of a dict (by name) or a sequence (by position), and the
+        #operations use plain Python floats, as indexing NumPy arrays element by element is slower
+        cat_positions = [position for position, _, _, _ in categorical]
+        self._dict_getters = (_getter(self._num_names), _getter([self.input_columns[i] for i in cat_positions]))
+        self._sequence_getters = (_getter(self.num_index), _getter(cat_positions))
+        self._record_operations = [operation if operation[0] == "ratios" else
+                                   (operation[0],) + tuple(np.asarray(arg).tolist() for arg in operation[1:])
+                                   for operation in operations]
+
+    #One record (dict keyed by column name, or sequence in input_columns order) to a 1D float64 array. None and NaN
+    #are missing values
+    def transform_record(self, record):
+        get_num, get_categories = self._dict_getters if isinstance(record, dict) else self._sequence_getters
+        num = get_num(record)
+        for operation in self._record_operations:
+            kind = operation[0]
+            if kind == "fill":
+                num = [fill if value is None or value != value else value for value, fill in zip(num, operation[1])]
+            elif kind == "ratios":
+                num = list(num) + [_divide(num[i], num[j]) for i, j in operation[1]]
+            else:
+                for position, value in enumerate(num):
+                    if value == math.inf or value == -math.inf:
+                        raise _infinity_error(self, position)
+                num = [(value - mean) / scale for value, mean, scale in zip(num, operation[1], operation[2])]
+        categories = get_categories(record)
+        output = list(num) + [0.0] * (self.n_output - len(num))
+        for category, (_, offset, lookup, ignore_unknown) in zip(categories, self.categorical):
+            column = lookup.get(category)
+            if column is not None:
+                output[offset + column] = 1.0
+            elif not ignore_unknown:
+                raise ValueError("Found unknown category %r" % (category,))
+        return np.array(output)
+
+    #Numerical features (n, n_dense) and one array of category codes (-1: unknown) per categorical attribute
+    def _batch(self, X):
+        if hasattr(X, "columns"):
+            num = X[self._num_names].to_numpy(dtype=np.float64)
+            categories = [X[self.input_columns[position]].to_numpy() for position, _, _, _ in self.categorical]
+        else:
+            X = np.asarray(X)
+            num = X[:, self.num_index].astype(np.float64)
+            categories = [X[:, position] for position, _, _, _ in self.categorical]
+        for operation in self.operations:
+            kind = operation[0]
+            if kind == "fill":
+                num = np.where(np.isnan(num), operation[1], num)
+            elif kind == "ratios":
+                num = np.c_[num, np.column_stack([num[:, i] / num[:, j] for i, j in operation[1]])]
+            else:
+                infinite = np.isinf(num).any(axis=0)
+                if infinite.any():
+                    raise _infinity_error(self, int(np.flatnonzero(infinite)[0]))
+                num = (num - operation[1]) / operation[2]
+        codes = []
+        for values, (_, _, lookup, ignore_unknown) in zip(categories, self.categorical):
+            columns = np.array([lookup.get(value, -1) for value in values.tolist()], dtype=np.intp)
+            if not ignore_unknown and (columns < 0).any():
+                raise ValueError("Found unknown categories %r" % (sorted(set(values[columns < 0].tolist())),))
+            codes.append(columns)
+        return num, codes
+
+    #Many records: a DataFrame (columns picked by name) or a 2D array in input_columns order. Returns (n, n_output)
+    def transform(self, X):
+        num, codes = self._batch(X)
+        output = np.zeros((len(num), self.n_output))
+        output[:, :num.shape[1]] = num
+        for columns, (_, offset, _, _) in zip(codes, self.categorical):
+            known = columns >= 0
+            output[np.flatnonzero(known), offset + columns[known]] = 1.0
+        return output
+
+    #Same input, but the output as a BlockMatrix (ml_practice/block_matrix.py): the numerical features and the
+    #category codes, without building the one-hot columns
+    def transform_blocks(self, X):
+        from ml_practice.block_matrix import BlockMatrix
+
+        num, codes = self._batch(X)
+        n_dense = num.shape[1]
+        return BlockMatrix(num, np.column_stack(codes) if codes else np.zeros((len(num), 0)),
+                           [len(lookup) for _, _, lookup, _ in self.categorical],
+                           dense_names=self.feature_names[:n_dense] if self.feature_names else None,
+                           categorical_names=[self.input_columns[position] for position, _, _, _ in self.categorical])
+
+    def __repr__(self):
+        return "TransformPlan(%d inputs -> %d outputs: %s)" % (len(self.input_columns), self.n_output,
+                                                                ", ".join(op[0] for op in self.operations))
+
+def _steps(transformer):
+    steps = getattr(transformer, "steps", None)
+    steps = [step for _, step in steps] if steps is not None else [transformer]
+    return [step for step in steps if step is not None and step != "passthrough"]
+
+#Operations of a fitted numerical Pipeline (SimpleImputer, CombinedAttributesAdder, StandardScaler steps)
+def _numerical_operations(transformer, n_columns):
+    from ml_practice.transformers import CombinedAttributesAdder, rooms_ix, bedrooms_ix, population_ix, households_ix
+
+    operations = []
+    for step in _steps(transformer):
+        name = type(step).__name__
+        if name == "SimpleImputer" and not step.add_indicator:
+            operations.append(("fill", np.asarray(step.statistics_, dtype=np.float64)))
+        elif isinstance(step, CombinedAttributesAdder):
+            ratios = [(rooms_ix, households_ix), (population_ix, households_ix)]
+            if step.add_bedrooms_per_room:
+                ratios.append((bedrooms_ix, rooms_ix))
+            operations.append(("ratios", ratios))
+            n_columns += len(ratios)
+        elif name == "StandardScaler":
+            mean = step.mean_ if step.with_mean else np.zeros(n_columns)
+            scale = step.scale_ if step.with_std else np.ones(n_columns)
+            operations.append(("affine", np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)))
+        else:
+            raise ValueError("Can't compile numerical step %r" % (step,))
+    return operations, n_columns
+
+#TransformPlan equivalent to a fitted ColumnTransformer with one numerical pipeline (the first transformer) and
+#OneHotEncoders, like full_pipeline in Housing.py. The pipeline must have been fitted on a DataFrame
+def compile_full_pipeline(full_pipeline):
+    input_columns = list(getattr(full_pipeline, "feature_names_in_", []))
+    if not input_columns:
+        raise ValueError("full_pipeline must be fitted on a DataFrame (it has no feature_names_in_)")
+    position = {column: i for i, column in enumerate(input_columns)}
+
+    num_index, operations, categorical, n_output = None, [], [], 0
+    for name, transformer, columns in full_pipeline.transformers_:
+        if transformer == "drop" or len(columns) == 0:
+            continue
+        columns = [input_columns[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        if type(transformer).__name__ == "OneHotEncoder":
+            if transformer.drop_idx_ is not None or getattr(transformer, "_infrequent_enabled", False):
+                raise ValueError("Can't compile OneHotEncoder %r: dropped or infrequent categories" % (name,))
+            for column, categories in zip(columns, transformer.categories_):
+                lookup = {category: i for i, category in enumerate(categories.tolist())}
+                categorical.append((position[column], n_output, lookup, transformer.handle_unknown != "error"))
+                n_output += len(categories)
+        elif num_index is None and n_output == 0: #The numerical columns come first in the output
+            num_index = [position[column] for column in columns]
+            operations, n_output = _numerical_operations(transformer, len(columns))
+        else:
+            raise ValueError("Can't compile transformer %r (%r)" % (name, transformer))
+    try: #Without the "num__"/"cat__" prefixes
+        feature_names = [name.split("__", 1)[-1] for name in full_pipeline.get_feature_names_out()]
+    except (AttributeError, ValueError):
+        feature_names = None
+    return TransformPlan(input_columns, num_index or [], operations, categorical, n_output, feature_names)
+
+#Raises AssertionError unless plan gives the same output as full_pipeline on the DataFrame X, with both the batch
+#and the per-record paths. Returns the largest absolute difference (0.0)
+def check_plan(plan, full_pipeline, X):
+    expected = full_pipeline.transform(X)
+    if hasattr(expected, "toarray"):
+        expected = expected.toarray()
+    batch = plan.transform(X)
+    records = np.array([plan.transform_record(record) for record in X.to_dict("records")])
+    arrays = plan.transform(X[plan.input_columns].to_numpy(dtype=object))
+    for name, output in (("transform", batch), ("transform_record", records), ("transform(array)", arrays)):
+        if output.shape != expected.shape or not np.array_equal(output, expected, equal_nan=True):
+            raise AssertionError("TransformPlan.%s differs from full_pipeline.transform: max difference %g"
+                                 % (name, np.nanmax(np.abs(output - expected)) if output.shape == expected.shape
+                                    else np.inf))
+    return float(np.nanmax(np.abs(batch - expected)))
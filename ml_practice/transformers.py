@@ -0,0 +1,48 @@
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+#Chapter 2 custom transformer (see Chapter_2/Housing.py for the walkthrough)
+#
+#It is kept out of ml_practice/housing.py because importing sklearn.base also loads SciPy and pandas, about 2 s in a
+#fresh interpreter (bench_import_combined_attributes_adder in benchmarks/bench_imports.py), and the loaders and split
+#helpers there don't need it. "from ml_practice import CombinedAttributesAdder" imports this module on first use
+
+#Column indices of the numerical housing attributes (housing.drop("ocean_proximity", axis=1)) used by
+#CombinedAttributesAdder
+rooms_ix, bedrooms_ix, population_ix, households_ix = 3, 4, 5, 6
+
+#Adds rooms_per_household, population_per_household and (optionally) bedrooms_per_room. TransformerMixin comes first,
+#as Scikit-Learn expects, so the estimator tags say it's a transformer
+class CombinedAttributesAdder(TransformerMixin, BaseEstimator):
+    def __init__(self, add_bedrooms_per_room=True): #No *args or **kargs
+        self.add_bedrooms_per_room = add_bedrooms_per_room
+
+    def fit(self, X, y=None):
+        #Column names of a DataFrame input, for get_feature_names_out() (set_output(transform="pandas"))
+        if hasattr(X, "columns"):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        elif hasattr(self, "feature_names_in_"):
+            del self.feature_names_in_
+        return self #Nothing else to do
+
+    def transform(self, X, y=None):
+        X = np.asarray(X)
+        room_per_household = X[:, rooms_ix] / X[:, households_ix]
+        population_per_household = X[:, population_ix] / X[:, households_ix]
+        if self.add_bedrooms_per_room:
+            bedrooms_per_room = X[:, bedrooms_ix] / X[:, rooms_ix]
+            return np.c_[X, room_per_household, population_per_household, bedrooms_per_room]
+        else:
+            return np.c_[X, room_per_household, population_per_household]
+
+    #Input column names followed by the added ones (input_features defaults to the fitted DataFrame's columns, then to
+    #x0, x1, ...)
+    def get_feature_names_out(self, input_features=None):
+        extra_attribs = ["rooms_per_hhold", "pop_per_hhold"]
+        if self.add_bedrooms_per_room:
+            extra_attribs.append("bedrooms_per_room")
+        if input_features is None:
+            input_features = getattr(self, "feature_names_in_", None)
+        if input_features is None:
+            input_features = ["x%d" % i for i in range(households_ix + 2)]
+        return np.asarray(list(input_features) + extra_attribs, dtype=object)
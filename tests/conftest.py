@@ -0,0 +1,10 @@
+import os
+import sys
+
+#The tests import ml_practice from the repository root and the chapter modules from their Chapter_N directory, like
+#the chapter scripts and the benchmarks do
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, "Chapter_4"), os.path.join(REPO_ROOT, "Chapter_5")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,20 @@
+import pytest
+
+from ml_practice import batch
+
+def _failing_stage(ctx):
+    raise ValueError("bad input in a stage")
+
+#An unknown stage is a usage error (exit code 2), reported before any output is written
+def test_unknown_stage_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch.main(["run", "linear_regression", "--stages", "no_such_stage", "--output", str(tmp_path / "run")])
+    assert exit_info.value.code == 2
+    assert "no_such_stage" in capsys.readouterr().err
+    assert not (tmp_path / "run").exists()
+
+#A ValueError raised inside a stage is not a usage error: it propagates with its traceback
+def test_stage_errors_propagate(tmp_path, monkeypatch):
+    monkeypatch.setitem(batch.PIPELINES, "failing", [batch.Stage("fail", _failing_stage)])
+    with pytest.raises(ValueError, match="bad input in a stage"):
+        batch.main(["run", "failing", "--figure-workers", "0", "--output", str(tmp_path / "run")])
@@ -0,0 +1,55 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+
+from ml_practice import CombinedAttributesAdder, make_full_pipeline
+
+#CombinedAttributesAdder must be a full Scikit-Learn transformer
+
+@pytest.fixture
+def housing_num():
+    rnd = np.random.RandomState(42)
+    households = rnd.randint(10, 1000, 50).astype(np.float64)
+    total_rooms = households * rnd.uniform(3, 7, 50)
+    return pd.DataFrame({
+        "longitude": rnd.uniform(-124, -114, 50),
+        "latitude": rnd.uniform(32, 42, 50),
+        "housing_median_age": rnd.randint(1, 52, 50).astype(np.float64),
+        "total_rooms": total_rooms,
+        "total_bedrooms": total_rooms * rnd.uniform(0.15, 0.3, 50),
+        "population": households * rnd.uniform(2, 4, 50),
+        "households": households,
+        "median_income": rnd.uniform(0.5, 15, 50),
+    })
+
+def test_instances_are_sklearn_transformers():
+    attr_adder = CombinedAttributesAdder(add_bedrooms_per_room=False)
+    assert type(attr_adder) is CombinedAttributesAdder
+    assert isinstance(attr_adder, BaseEstimator) and isinstance(attr_adder, TransformerMixin)
+    assert attr_adder.get_params() == {"add_bedrooms_per_room": False}
+    assert repr(attr_adder) == "CombinedAttributesAdder(add_bedrooms_per_room=False)"
+    assert type(clone(attr_adder)) is CombinedAttributesAdder
+    assert clone(attr_adder).get_params() == {"add_bedrooms_per_room": False}
+
+def test_transform(housing_num):
+    X = housing_num.values
+    extra = CombinedAttributesAdder().fit_transform(X)
+    assert extra.shape == (len(X), X.shape[1] + 3)
+    np.testing.assert_allclose(extra[:, -1], X[:, 4] / X[:, 3]) #bedrooms_per_room
+    assert CombinedAttributesAdder(add_bedrooms_per_room=False).fit_transform(X).shape == (len(X), X.shape[1] + 2)
+
+def test_set_output_pandas(housing_num):
+    num_pipeline = make_full_pipeline(list(housing_num)).transformers[0][1].set_output(transform="pandas")
+    housing_prepared = num_pipeline.fit_transform(housing_num)
+    assert isinstance(housing_prepared, pd.DataFrame)
+    assert list(housing_prepared.columns) == list(housing_num) + ["rooms_per_hhold", "pop_per_hhold",
+                                                                 "bedrooms_per_room"]
+
+def test_pickle_round_trip(housing_num):
+    full_pipeline = make_full_pipeline(list(housing_num), cat_attribs=())
+    housing_prepared = full_pipeline.fit_transform(housing_num)
+    np.testing.assert_array_equal(pickle.loads(pickle.dumps(full_pipeline)).transform(housing_num),
+                                  housing_prepared)
@@ -0,0 +1,36 @@
+import json
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+
+#Importing from ml_practice must stay cheap: no pandas or Scikit-Learn, and only a few milliseconds on top of NumPy.
+#Each check runs in a fresh interpreter, so nothing is imported already. CombinedAttributesAdder is the exception: it
+#is a Scikit-Learn estimator, so importing it imports Scikit-Learn
+IMPORT_BUDGET_SECONDS = 0.1 #On top of NumPy (about 130 ms by itself); ml_practice takes about 10 ms
+
+def _import(statement):
+    script = ("import sys, time, json\n"
+              "start = time.perf_counter()\n"
+              "import numpy\n"
+              "numpy_seconds = time.perf_counter() - start\n"
+              "start = time.perf_counter()\n"
+              "%s\n"
+              "seconds = time.perf_counter() - start\n"
+              "print(json.dumps({'seconds': seconds, 'numpy_seconds': numpy_seconds, 'modules': sorted(sys.modules)}))"
+              % statement)
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=REPO_ROOT)
+    return json.loads(output.decode().splitlines()[-1])
+
+def _heavy_modules(modules):
+    return [name for name in modules if name.split(".")[0] in ("sklearn", "pandas", "scipy", "matplotlib")]
+
+def test_split_helpers_import_is_light():
+    result = _import("from ml_practice import StreamingStratifiedSplit, split_train_test, test_set_check")
+    assert _heavy_modules(result["modules"]) == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+
+def test_package_import_is_light():
+    result = _import("import ml_practice; ml_practice.load_housing_data; ml_practice.income_cat")
+    assert _heavy_modules(result["modules"]) == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
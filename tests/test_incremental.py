@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from ml_practice import make_full_pipeline, synthetic_housing
+from ml_practice.incremental import IncrementalTrainer
+
+@pytest.fixture(scope="module")
+def housing():
+    housing = synthetic_housing(12000, random_state=0)
+    return housing, housing.pop("median_house_value")
+
+def _num_attribs(housing):
+    return list(housing.drop("ocean_proximity", axis=1))
+
+#The trees kept by partial_fit() must put the rows they were grown on in the same leaves (rows without missing
+#values, the others are imputed with the medians of their time)
+def test_forest_partial_fit_keeps_tree_leaves(housing):
+    housing, labels = housing
+    history = housing.iloc[:10000].dropna()
+    trainer = IncrementalTrainer(make_full_pipeline(_num_attribs(housing)),
+                                 RandomForestRegressor(n_estimators=20, random_state=0))
+    trainer.fit(history, labels.loc[history.index])
+    trees = list(trainer.model.estimators_)
+    leaves = [tree.apply(trainer.transform(history).astype(np.float32)) for tree in trees]
+
+    for start in range(10000, 12000, 600):
+        trainer.partial_fit(housing.iloc[start:start + 600], labels.iloc[start:start + 600])
+        X = trainer.transform(history).astype(np.float32)
+        kept = [i for i, tree in enumerate(trees) if any(tree is other for other in trainer.model.estimators_)]
+        assert kept and len(trainer.model.estimators_) == 20
+        for i in kept:
+            np.testing.assert_array_equal(trees[i].apply(X), leaves[i])
+
+#With LinearRegression the scaler and the coefficients follow all the rows, like a fit on all of them
+def test_linear_regression_partial_fit_matches_fit(housing):
+    housing, labels = housing
+    num_attribs = _num_attribs(housing)
+    trainer = IncrementalTrainer(make_full_pipeline(num_attribs), LinearRegression())
+    trainer.fit(housing.iloc[:10000], labels.iloc[:10000])
+    trainer.partial_fit(housing.iloc[10000:], labels.iloc[10000:])
+
+    std_scaler = trainer.full_pipeline.named_transformers_["num"].named_steps["std_scaler"]
+    full_pipeline = make_full_pipeline(num_attribs).fit(housing)
+    expected = full_pipeline.named_transformers_["num"].named_steps["std_scaler"]
+    assert std_scaler.n_samples_seen_ == expected.n_samples_seen_
+    np.testing.assert_allclose(std_scaler.mean_, expected.mean_, rtol=1e-3)
+    np.testing.assert_allclose(std_scaler.scale_, expected.scale_, rtol=1e-3)
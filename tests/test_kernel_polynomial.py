@@ -0,0 +1,29 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from Kernel_Polynomial import compare_polynomial_modes
+
+@pytest.fixture
+def data():
+    rnd = np.random.RandomState(42)
+    X = rnd.rand(400, 2)
+    return X, X[:, 0] ** 3 - X[:, 1] + 0.1 * rnd.randn(400)
+
+#compare_polynomial_modes() traces memory itself only when nothing else does (ml_practice.profiling spans start
+#tracemalloc for the whole run and must find it still on)
+def test_leaves_tracemalloc_off(data):
+    assert not tracemalloc.is_tracing()
+    rows = compare_polynomial_modes(*data, degree=3)
+    assert not tracemalloc.is_tracing()
+    assert all(row["peak_bytes"] > 0 for row in rows)
+
+def test_leaves_running_tracemalloc_on(data):
+    tracemalloc.start()
+    try:
+        rows = compare_polynomial_modes(*data, degree=3)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    assert all(row["peak_bytes"] > 0 for row in rows)
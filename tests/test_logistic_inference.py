@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from sklearn import datasets
+from sklearn.linear_model import LogisticRegression
+
+from Logistic_Inference import export_logistic, LogisticPredictor
+
+#LogisticPredictor against Scikit-Learn's predict_proba/predict, on the two models of Linear_Regression.py
+
+@pytest.fixture(scope="module")
+def iris():
+    return datasets.load_iris()
+
+def _log_reg(iris):
+    return LogisticRegression().fit(iris["data"][:, 3:], (iris["target"] == 2).astype(int)) #petal width
+
+def _softmax_reg(iris):
+    return LogisticRegression(solver="lbfgs", C=10).fit(iris["data"][:, (2, 3)], iris["target"])
+
+def _batch(n_features, dtype=np.float64, n_rows=20000):
+    X = np.random.RandomState(42).uniform(low=[0, 0], high=[8, 3.5], size=(n_rows, 2))
+    return X[:, 2 - n_features:].astype(dtype)
+
+def _load(model, tmp_path, **params):
+    path = str(tmp_path / "model.npz")
+    export_logistic(model, path)
+    return LogisticPredictor.load(path, **params)
+
+@pytest.mark.parametrize("make_model", [_log_reg, _softmax_reg], ids=["binary", "softmax"])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_matches_sklearn(iris, tmp_path, make_model, dtype):
+    model = make_model(iris)
+    #batch_size smaller than the batch, so several blocks (and a partial last one) are computed
+    predictor = _load(model, tmp_path, batch_size=4096)
+    X = _batch(model.coef_.shape[1], dtype)
+
+    proba = predictor.predict_proba(X)
+    assert proba.dtype == np.float32
+    assert proba.shape == (len(X), len(model.classes_))
+    np.testing.assert_allclose(proba, model.predict_proba(X), atol=1e-5)
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0, atol=1e-5)
+    assert (predictor.predict(X) == model.predict(X)).mean() > 0.9999
+
+@pytest.mark.parametrize("make_model", [_log_reg, _softmax_reg], ids=["binary", "softmax"])
+def test_single_row_and_extreme_scores(iris, tmp_path, make_model):
+    model = make_model(iris)
+    predictor = _load(model, tmp_path)
+    n_features = model.coef_.shape[1]
+
+    row = _batch(n_features)[0]
+    np.testing.assert_allclose(predictor.predict_proba(row), model.predict_proba(row.reshape(1, -1)), atol=1e-5)
+    #Scores far outside the float32 exp() range: no overflow, still probabilities
+    proba = predictor.predict_proba(np.full((2, n_features), 1e6) * [[1], [-1]])
+    assert np.isfinite(proba).all()
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0, atol=1e-5)
+
+def test_export_keeps_classes_and_link(iris, tmp_path):
+    predictor = _load(_softmax_reg(iris), tmp_path)
+    assert predictor.link == "softmax"
+    assert list(predictor.classes) == [0, 1, 2]
+    assert _load(_log_reg(iris), tmp_path).link == "logistic"
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import ElasticNet, Lasso, Ridge
+
+from Regularization_Path import regularization_path
+
+@pytest.fixture
+def data():
+    rnd = np.random.RandomState(42)
+    X = rnd.randn(80, 6)
+    y = X.dot([3.0, -2.0, 0.0, 0.5, 0.0, 1.0]) + 4.0 + rnd.randn(80)
+    return X, y
+
+#Every point of the path must be the solution a separately fitted Ridge/ElasticNet/Lasso finds, whatever the other
+#l1_ratios of the grid are (they share warm starts)
+@pytest.mark.parametrize("l1_ratios", [(0.5, 1.0), (1.0, 0.5), (0.0, 0.2, 0.5, 0.9, 1.0)])
+def test_path_matches_separate_fits(data, l1_ratios):
+    X, y = data
+    alphas, coefs, intercepts, cv_mse = regularization_path(X, y, [1.0, 0.3, 0.1, 0.01], l1_ratios=l1_ratios,
+                                                            max_iter=100000, tol=1e-12)
+    assert coefs.shape == (len(l1_ratios), len(alphas), X.shape[1]) and cv_mse.shape == (len(l1_ratios), len(alphas))
+    for i, l1_ratio in enumerate(l1_ratios):
+        for j, alpha in enumerate(alphas):
+            if l1_ratio == 0:
+                model = Ridge(alpha=alpha * len(X))
+            elif l1_ratio == 1:
+                model = Lasso(alpha=alpha, max_iter=100000, tol=1e-12)
+            else:
+                model = ElasticNet(alpha=alpha, l1_ratio=l1_ratio, max_iter=100000, tol=1e-12)
+            model.fit(X, y)
+            np.testing.assert_allclose(coefs[i, j], model.coef_, atol=1e-6)
+            np.testing.assert_allclose(intercepts[i, j], model.intercept_, atol=1e-6)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from ml_practice import check_plan, compile_full_pipeline, make_full_pipeline, synthetic_housing
+
+@pytest.fixture(scope="module")
+def fitted():
+    housing = synthetic_housing(2000, random_state=0).drop("median_house_value", axis=1)
+    full_pipeline = make_full_pipeline(list(housing.drop("ocean_proximity", axis=1))).fit(housing)
+    return housing, full_pipeline, compile_full_pipeline(full_pipeline)
+
+def test_plan_matches_pipeline(fitted):
+    housing, full_pipeline, plan = fitted
+    check_plan(plan, full_pipeline, housing.iloc[:50])
+
+#A district with no households or no rooms: 0 / 0 ratios are NaN, in the plan as in the pipeline
+def test_zero_over_zero_is_nan(fitted):
+    housing, full_pipeline, plan = fitted
+    district = housing.iloc[:1].copy()
+    district[["total_rooms", "total_bedrooms", "population", "households"]] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = full_pipeline.transform(district)[0]
+        batch = plan.transform(district)[0]
+    assert np.isnan(expected).sum() == 3
+    np.testing.assert_array_equal(plan.transform_record(district.iloc[0].to_dict()), expected)
+    np.testing.assert_array_equal(plan.transform_record(district.iloc[0].tolist()), expected)
+    np.testing.assert_array_equal(batch, expected)
+
+#Other ratios with a zero denominator are infinite, which full_pipeline.transform() rejects with ValueError: so does
+#the plan, record by record as well as in batches, instead of raising ZeroDivisionError
+@pytest.mark.parametrize("zeros, feature", [({"households": 0.0}, "rooms_per_hhold"),
+                                            ({"total_rooms": 0}, "bedrooms_per_room"),
+                                            ({"households": -0.0, "total_rooms": 0.0}, "pop_per_hhold")])
+def test_infinite_ratios_raise_value_error(fitted, zeros, feature):
+    housing, full_pipeline, plan = fitted
+    district = housing.iloc[:1].copy()
+    for column, value in zeros.items():
+        district[column] = value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        with pytest.raises(ValueError):
+            full_pipeline.transform(district)
+        for transform, X in ((plan.transform_record, district.iloc[0].to_dict()),
+                             (plan.transform_record, district.iloc[0].tolist()), (plan.transform, district)):
+            with pytest.raises(ValueError, match="infinity in %s" % feature):
+                transform(X)